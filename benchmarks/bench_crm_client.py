@@ -0,0 +1,104 @@
+"""
+Пропускная способность запросов get_book через CrmClient к локальной замене CRM,
+объединение одинаковых запросов и поведение circuit breaker.
+
+Запуск: python -m benchmarks.bench_crm_client --patients 10000 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fake_crm import CALLS_KEY, FakeCrmData, start_fake_crm
+from configuration.config_crm import CrmClient, CrmUnavailableError
+
+PORT = 8091
+
+
+def book_request(patient_id):
+    today = datetime.today()
+    return {
+        "command": "get_book",
+        "id": patient_id,
+        "beg_per": (today - timedelta(days=2)).strftime("%d.%m.%Y"),
+        "end_per": (today + timedelta(days=4)).strftime("%d.%m.%Y"),
+    }
+
+
+async def sync_throughput(client, data, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(patient):
+        async with semaphore:
+            try:
+                await client.request(book_request(patient["id"]))
+            except CrmUnavailableError:
+                pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fetch(patient) for patient in data.patients))
+    return time.perf_counter() - started
+
+
+async def coalescing(client, data, app):
+    phone = data.patients[0]["phone"]
+    before = app[CALLS_KEY]["get_user_data"]
+    await asyncio.gather(
+        *(client.request({"command": "get_user_data", "user": phone}) for _ in range(20))
+    )
+    return app[CALLS_KEY]["get_user_data"] - before
+
+
+async def breaker():
+    data = FakeCrmData(patients=10, doctors=1)
+    runner, app = await start_fake_crm(data, port=PORT + 1, error_rate=1.0)
+    client = CrmClient(f"http://127.0.0.1:{PORT + 1}/", "", "")
+    try:
+        for patient in data.patients:
+            try:
+                await client.request(book_request(patient["id"]))
+            except CrmUnavailableError:
+                pass
+        return client.breaker.state, app[CALLS_KEY]["get_book"]
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+async def run(args):
+    data = FakeCrmData(args.patients, args.doctors)
+    runner, app = await start_fake_crm(
+        data, port=PORT, latency=args.latency, jitter=args.latency / 2,
+        error_rate=args.error_rate,
+    )
+    client = CrmClient(f"http://127.0.0.1:{PORT}/", "", "")
+    try:
+        elapsed = await sync_throughput(client, data, args.concurrency)
+        print(
+            f"get_book для {args.patients} пациентов: {elapsed:.1f} с, "
+            f"{args.patients / elapsed:.0f} запросов/с (параллельно {args.concurrency})"
+        )
+        print(f"Счетчики клиента: {client.summary()}")
+
+        sent = await coalescing(client, data, app)
+        print(f"20 одинаковых одновременных get_user_data -> {sent} запрос(ов) к CRM")
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+    state, sent = await breaker()
+    print(f"CRM всегда отвечает 500: breaker={state}, дошло до CRM {sent} HTTP-запросов на 10 вызовов")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
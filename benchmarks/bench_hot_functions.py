@@ -0,0 +1,176 @@
+"""
+Микробенчмарки функций на путях планирования и рендера сообщений со сравнением
+с сохраненными замерами.
+
+Запуск:
+    python -m benchmarks.bench_hot_functions          # сравнение с benchmarks/baselines.json
+    python -m benchmarks.bench_hot_functions --save   # сохранить текущие замеры как базовые
+
+Код возврата 1, если какая-то функция стала медленнее базового замера больше чем на --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+from datetime import datetime
+
+from benchmarks.harness import bench
+from handlers.functions.admin_send_fun import replace_placeholders
+from handlers.functions.admins_fun import format_patient_info, parse_time
+from handlers.functions.scenario_templates import placeholder_values, render_message
+from scheduler.appointment_scheduler import calculate_send_time
+from scheduler.sched_tasks import split_message_to_two_parts
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+START = datetime(2024, 11, 5, 9, 30)
+TIMES = ["0", "0 10:00", "-24 10:00", "+2", "+24", "+48 18:30", "+72 09:00", "-48"]
+CONTENT = (
+    "Здравствуйте, {first_name}! Напоминаем, что {start_time} у вас прием у врача "
+    "{first_name_doctor} {last_name_doctor}. Пожалуйста, приходите за 15 минут до начала./n"
+)
+# Сценарий этапа: 20 сообщений, часть длиннее лимита подписи к видео
+MESSAGES = [
+    {
+        "id": index,
+        "type": "video" if index % 5 == 0 else "text",
+        "time": TIMES[index % len(TIMES)],
+        "url": "",
+        "content": CONTENT * (12 if index % 5 == 0 else 3),
+    }
+    for index in range(20)
+]
+LONG_TEXT = "Рекомендации после процедуры. " * 300
+PATIENT_INFO = {
+    "patient_name": "Иванова Анна Сергеевна",
+    "patient_phone": "+79001234567",
+    "stage": 3,
+    "doctor_name": "Орлов Сергей Иванович",
+}
+
+
+def cases(loop):
+    """Замеряемые функции: имя -> (функция без аргументов, число вызовов в повторе)."""
+
+    async def send_times():
+        for message in MESSAGES:
+            await calculate_send_time(START, message["time"])
+
+    def render():
+        # Как в set_scenario: значения флагов один раз на запись, затем рендер каждого сообщения
+        values = placeholder_values(START, "Анна", "Сергей", "Орлов")
+        for message in MESSAGES:
+            render_message(message, values)
+
+    return {
+        "calculate_send_time x20": (lambda: loop.run_until_complete(send_times()), 200),
+        "render_message x20": (render, 200),
+        "split_message_to_two_parts text": (
+            lambda: [split_message_to_two_parts(m["content"], 4096) for m in MESSAGES], 1000,
+        ),
+        "split_message_to_two_parts caption": (
+            lambda: [split_message_to_two_parts(m["content"], 1024) for m in MESSAGES], 1000,
+        ),
+        "split_message_to_two_parts long": (
+            lambda: split_message_to_two_parts(LONG_TEXT, 4096), 10000,
+        ),
+        "parse_time sort x20": (
+            lambda: sorted(MESSAGES, key=lambda message: parse_time(message["time"])), 2000,
+        ),
+        "replace_placeholders x20": (
+            lambda: [replace_placeholders(m["content"], "Анна", "Иванова") for m in MESSAGES], 1000,
+        ),
+        "format_patient_info": (lambda: format_patient_info(PATIENT_INFO), 50000),
+    }
+
+
+def current_machine():
+    """Описание машины, на которой сделан замер: замеры сравнимы только на одной машине."""
+    return (
+        f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU, "
+        f"Python {platform.python_version()}"
+    )
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baselines(path, results, machine):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "saved_at": datetime.now().isoformat(timespec="seconds"),
+                "machine": machine,
+                "results": results,
+            },
+            file, ensure_ascii=False, indent=2,
+        )
+        file.write("\n")
+    print(f"Базовые замеры сохранены в {path}")
+
+
+def report(results, baselines, threshold):
+    """
+    Таблица сравнения с базовыми замерами.
+
+    :return: Список функций, которые стали медленнее больше чем на threshold.
+    """
+    regressions = []
+    print(f"\n{'функция':<40} {'база, us':>12} {'сейчас, us':>12} {'изменение':>10}")
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:<40} {'-':>12} {current:>12.2f} {'новая':>10}")
+            continue
+        ratio = current / baseline
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "  быстрее"
+        print(f"{name:<40} {baseline:>12.2f} {current:>12.2f} {ratio:>9.2f}x{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", action="store_true", help="сохранить замеры как базовые")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое замедление (доля)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--machine", default=current_machine(), help="описание машины для --save")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = {
+            name: bench(name, func, number=number, repeat=args.repeat)
+            for name, (func, number) in cases(loop).items()
+        }
+    finally:
+        loop.close()
+
+    if args.save:
+        save_baselines(args.baselines, results, args.machine)
+        return
+
+    saved = load_baselines(args.baselines)
+    if not saved:
+        print(f"\nНет базовых замеров в {args.baselines}, сохраните их флагом --save")
+        return
+
+    print(f"\nБазовые замеры: {saved.get('machine', 'машина не указана')}, сейчас: {current_machine()}")
+    regressions = report(results, saved["results"], args.threshold)
+    if regressions:
+        print(f"\nРегрессии: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
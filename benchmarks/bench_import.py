@@ -0,0 +1,119 @@
+"""
+Время импорта и граф модулей воркера arq.
+
+Каждый замер - отдельный процесс python, импортирующий scheduler.main, как это
+делает `arq scheduler.main.WorkerSettings`. Проверяется, что воркер не тянет
+роутеры, клавиатуры и aiogram: бот воркера создается при запуске (create_bot),
+опросы и ошибки Bot API импортируются там, где используются.
+
+Запуск:
+    python -m benchmarks.bench_import                 # время, память, число модулей
+    python -m benchmarks.bench_import --importtime 15 # самые медленные импорты
+
+Код возврата 1, если импортирован запрещенный модуль или превышен --budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули бота, которые воркеру не нужны при импорте. aiogram сам по себе
+# загружает все типы Bot API, около 2 с из 2.8 с импорта до переноса
+FORBIDDEN_MODULES = (
+    "aiogram",
+    "configuration.bot_session",
+    "configuration.config_bot",
+    "handlers.patient",
+    "handlers.auth",
+    "handlers.admin_general",
+    "handlers.admin_changes",
+    "handlers.admin_send_scenarios",
+    "handlers.doctor",
+    "handlers.functions.auth_crm_fun",
+    "handlers.functions.survey_start",
+    "middlewares.middlewares",
+    "keyboards.admin_kb",
+    "keyboards.auth_kb",
+    "keyboards.doctor_kb",
+    "keyboards.patient_kb",
+    "states.states_patient",
+)
+# Предельное время импорта scheduler.main, с: 0.52 с на 1 vCPU с запасом на шум
+IMPORT_BUDGET = 1.0
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": sorted(sys.modules),
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+def probe(module):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise SystemExit(f"Не удалось импортировать {module}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, limit):
+    """Импорты с наибольшим накопленным временем по `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="scheduler.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="предельное время импорта, с")
+    parser.add_argument("--importtime", type=int, default=0, help="показать N самых медленных импортов")
+    args = parser.parse_args()
+
+    runs = [probe(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run["seconds"])
+    local = [name for name in best["modules"] if os.path.exists(os.path.join(ROOT, name.split(".")[0]))]
+    forbidden = [name for name in FORBIDDEN_MODULES if name in best["modules"]]
+
+    print(f"Импорт {args.module}: {best['seconds']:.3f} с (лучший из {args.repeat}), "
+          f"пиковая память {best['rss_kb'] / 1024:.0f} МБ")
+    print(f"Модулей: {len(best['modules'])}, из них проекта: {len(local)}")
+
+    if args.importtime:
+        print(f"\n{'накопленно, мс':>14}  модуль")
+        for cumulative, name in slowest_imports(args.module, args.importtime):
+            print(f"{cumulative / 1000:>14.1f}  {name}")
+
+    failed = False
+    if forbidden:
+        print(f"\nВоркер импортирует модули бота: {', '.join(forbidden)}")
+        failed = True
+    if best["seconds"] > args.budget:
+        print(f"\nИмпорт дольше бюджета {args.budget} с")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Сквозной бенчмарк планировщика: синхронизация с CRM -> set_appointments/set_scenario ->
+check_new_appointments -> отложенные задачи arq -> send_scenario_message.
+
+CRM и Telegram заменяются локальными серверами из benchmarks/fake_crm.py
+и benchmarks/fake_telegram.py, бд и Redis берутся из обычных переменных окружения.
+Тот же прогон с порогами из benchmarks/pipeline_thresholds.json выполняет
+tests/test_pipeline_benchmark.py (pytest -m benchmark).
+
+ВНИМАНИЕ: бенчмарк пересоздает все таблицы и очищает базу Redis. Запускайте
+только на отдельных Postgres и Redis, с флагом --reset:
+
+    python -m benchmarks.bench_pipeline --reset --patients 1000 --messages 3
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import NamedTuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from arq.worker import Worker
+from sqlalchemy import func, select
+
+from benchmarks.fake_crm import FakeCrmData, start_fake_crm
+from benchmarks.fake_telegram import FakeTelegram, start_fake_telegram
+from benchmarks.seed import reset_storage, seed
+from configuration.config_crm import crm_client
+from configuration.config_db import SessionLocal, engine
+from configuration.config_redis import get_arq_redis
+from database.models import Appointment
+from scheduler import sched_tasks
+from scheduler.appointment_scheduler import (
+    check_new_appointments,
+    plan_appointment,
+    update_appointments,
+)
+from scheduler.delivery import DeliveryLag
+
+CRM_PORT = 8093
+TELEGRAM_PORT = 8094
+FAKE_TOKEN = "123456:fake"
+
+QUEUE = "arq:queue"
+# Проверки после процедуры 4331 откладываются на 8 дней и в замер доставки не входят
+DELIVERY_HORIZON = 24 * 60 * 60
+
+
+class PipelineResult(NamedTuple):
+    patients: int
+    messages: int
+    sync_seconds: float
+    planning_jobs: int
+    planning_seconds: float
+    send_jobs: int
+    deferred_jobs: int
+    redis_bytes_per_job: float
+    delivered: int
+    rate_limited: int
+    delivery_seconds: float
+    finished: bool
+    unprocessed: int
+    lag_p50: float
+    lag_p95: float
+    lag_p99: float
+
+    @property
+    def planning_jobs_per_second(self):
+        return self.send_jobs / self.planning_seconds if self.planning_seconds else 0.0
+
+    @property
+    def delivery_jobs_per_second(self):
+        return self.delivered / self.delivery_seconds if self.delivery_seconds else 0.0
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+async def count_unprocessed():
+    async with SessionLocal() as session:
+        return await session.scalar(
+            select(func.count(Appointment.id)).where(Appointment.processed == False)
+        )
+
+
+async def used_memory(redis):
+    return (await redis.info("memory"))["used_memory"]
+
+
+def worker_hooks(telegram_url):
+    async def startup(ctx):
+        session = AiohttpSession(api=TelegramAPIServer.from_base(telegram_url))
+        ctx["bot"] = Bot(token=FAKE_TOKEN, session=session)
+
+    async def shutdown(ctx):
+        await ctx["bot"].session.close()
+
+    return startup, shutdown
+
+
+def horizon_score():
+    return int((time.time() + DELIVERY_HORIZON) * 1000)
+
+
+async def wait_for_deliveries(redis, timeout):
+    """Ожидание, пока в очереди не останется задач на ближайшие DELIVERY_HORIZON секунд."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        due = await redis.zcount(QUEUE, "-inf", horizon_score())
+        if due == 0:
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def run_pipeline(
+        redis, patients, doctors=20, messages=3, crm_latency=0.02, telegram_rate=30,
+        telegram_chat_rate=1, max_jobs=100, timeout=600,
+):
+    """
+    Прогон конвейера на пустых бд и Redis: заполнение, синхронизация с замененной CRM,
+    планирование и доставка воркером arq через замененный Bot API.
+
+    :param redis: ArqRedis пустой базы Redis.
+    :return: PipelineResult.
+    """
+    data = FakeCrmData(patients, doctors)
+    crm_runner, _ = await start_fake_crm(data, port=CRM_PORT, latency=crm_latency)
+    fake_telegram = FakeTelegram(global_rate=telegram_rate, chat_rate=telegram_chat_rate)
+    telegram_runner = await start_fake_telegram(fake_telegram, port=TELEGRAM_PORT)
+
+    crm_url = crm_client.base_url
+    crm_client.base_url = f"http://127.0.0.1:{CRM_PORT}/"
+    lag = DeliveryLag(size=10 ** 7)
+    default_lag = sched_tasks.delivery_lag
+    sched_tasks.delivery_lag = lag
+    ctx = {"redis": redis}
+
+    try:
+        await seed(data, messages)
+
+        started = time.perf_counter()
+        await update_appointments(ctx)
+        sync_seconds = time.perf_counter() - started
+        planning_jobs = await redis.zcard(QUEUE)
+        memory_after_sync = await used_memory(redis)
+
+        started = time.perf_counter()
+        await check_new_appointments(ctx)
+        planning_seconds = time.perf_counter() - started
+        send_jobs = await redis.zcard(QUEUE) - planning_jobs
+        deferred_jobs = await redis.zcount(QUEUE, f"({horizon_score()}", "+inf")
+        memory_after_planning = await used_memory(redis)
+
+        startup, shutdown = worker_hooks(f"http://127.0.0.1:{TELEGRAM_PORT}")
+        worker = Worker(
+            functions=[plan_appointment, sched_tasks.send_scenario_message],
+            redis_pool=redis,
+            on_startup=startup,
+            on_shutdown=shutdown,
+            handle_signals=False,
+            poll_delay=0.1,
+            max_jobs=max_jobs,
+        )
+        started = time.perf_counter()
+        worker_task = asyncio.create_task(worker.main())
+        finished = await wait_for_deliveries(redis, timeout)
+        delivery_seconds = time.perf_counter() - started
+        await worker.close()
+        worker_task.cancel()
+
+        lags = lag.snapshot()
+        return PipelineResult(
+            patients=patients,
+            messages=messages,
+            sync_seconds=sync_seconds,
+            planning_jobs=planning_jobs,
+            planning_seconds=planning_seconds,
+            send_jobs=send_jobs,
+            deferred_jobs=deferred_jobs,
+            redis_bytes_per_job=(memory_after_planning - memory_after_sync) / send_jobs if send_jobs else 0.0,
+            delivered=fake_telegram.counters.get("sendMessage:200", 0),
+            rate_limited=fake_telegram.counters.get("sendMessage:429", 0),
+            delivery_seconds=delivery_seconds,
+            finished=finished,
+            unprocessed=await count_unprocessed(),
+            lag_p50=percentile(lags, 0.5),
+            lag_p95=percentile(lags, 0.95),
+            lag_p99=percentile(lags, 0.99),
+        )
+    finally:
+        crm_client.base_url = crm_url
+        sched_tasks.delivery_lag = default_lag
+        await crm_client.close()
+        await crm_runner.cleanup()
+        await telegram_runner.cleanup()
+
+
+def print_report(result):
+    print(f"Пациентов: {result.patients}, сообщений в сценарии: {result.messages}")
+    print(f"Синхронизация с CRM: {result.sync_seconds:.1f} с "
+          f"({result.patients / result.sync_seconds:.0f} пациентов/с), задач планирования: {result.planning_jobs}")
+    print(f"Планирование: {result.planning_seconds:.1f} с, задач отправки: {result.send_jobs} "
+          f"({result.planning_jobs_per_second:.0f} задач/с), из них отложено дальше суток: {result.deferred_jobs}, "
+          f"необработанных записей: {result.unprocessed}")
+    print(f"Память Redis на ожидающую задачу: {result.redis_bytes_per_job:.0f} байт")
+    print(f"Доставка: {result.delivered} сообщений за {result.delivery_seconds:.1f} с "
+          f"({result.delivery_jobs_per_second:.0f} задач/с), ответов 429: {result.rate_limited}"
+          f"{'' if result.finished else ' (остановлено по таймауту)'}")
+    print(f"Задержка относительно _defer_until: p50={result.lag_p50:.2f} с, "
+          f"p95={result.lag_p95:.2f} с, p99={result.lag_p99:.2f} с")
+    print(f"Запросы к CRM: {crm_client.summary()}")
+
+
+async def run(args):
+    engine.echo = False
+    redis = get_arq_redis()
+    await reset_storage(redis)
+    result = await run_pipeline(
+        redis,
+        args.patients,
+        doctors=args.doctors,
+        messages=args.messages,
+        crm_latency=args.crm_latency,
+        telegram_rate=args.telegram_rate,
+        telegram_chat_rate=args.telegram_chat_rate,
+        max_jobs=args.max_jobs,
+        timeout=args.timeout,
+    )
+    print_report(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="подтверждение очистки бд и Redis")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--crm-latency", type=float, default=0.02)
+    parser.add_argument("--telegram-rate", type=float, default=30)
+    parser.add_argument("--telegram-chat-rate", type=float, default=1)
+    parser.add_argument("--max-jobs", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=600, help="предельное время доставки, с")
+    parser.add_argument("--verbose", action="store_true", help="не скрывать логи бота")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("бенчмарк очищает бд и Redis; подтвердите флагом --reset")
+    if not args.verbose:
+        # Логи на каждую запись и сообщение искажают замер
+        logging.disable(logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
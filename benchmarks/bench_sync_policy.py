@@ -0,0 +1,85 @@
+"""
+Оценка числа запросов к CRM в сутки при адаптивной синхронизации.
+
+Запуск: python -m benchmarks.bench_sync_policy
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from scheduler.sync_policy import (
+    SYNC_INTERVAL_ACTIVE,
+    next_sync_time,
+    sync_interval,
+)
+
+CLIENTS = 2000
+LEGACY_INTERVAL = timedelta(minutes=30)
+BUCKET = timedelta(minutes=5)
+NOW = datetime(2024, 11, 1, 0, 0)
+DAY = timedelta(days=1)
+
+
+def synthetic_clients(count, seed=1):
+    """Пациенты с одной записью: большинство без записей в ближайшие дни."""
+    rng = random.Random(seed)
+    clients = []
+    for tg_id in range(10 ** 9, 10 ** 9 + count):
+        if rng.random() < 0.1:
+            start = NOW + timedelta(hours=rng.uniform(0, 24))
+        else:
+            start = NOW + timedelta(days=rng.uniform(-30, 60))
+        clients.append((tg_id, start))
+    return clients
+
+
+def simulate(clients):
+    calls = Counter()
+    staleness = []
+    for tg_id, start in clients:
+        # Начальная фаза, как при заполнении next_sync_at в database/schema.py
+        moment = next_sync_time(tg_id, timedelta(hours=1), NOW)
+        while moment < NOW + DAY:
+            calls[int((moment - NOW) / BUCKET)] += 1
+            interval = sync_interval([start], False, moment)
+            following = next_sync_time(tg_id, interval, moment)
+            if moment <= start <= moment + timedelta(days=1):
+                staleness.append(following - moment)
+            moment = following
+    return calls, staleness
+
+
+def check():
+    now = NOW + timedelta(minutes=7)
+    for interval in (SYNC_INTERVAL_ACTIVE, timedelta(hours=6)):
+        for tg_id in range(100):
+            moment = next_sync_time(tg_id, interval, now)
+            assert now < moment <= now + interval, (tg_id, moment)
+    assert sync_interval([], True, NOW) == SYNC_INTERVAL_ACTIVE
+    assert sync_interval([NOW + timedelta(hours=3)], False, NOW) == SYNC_INTERVAL_ACTIVE
+    print("Проверка расписания синхронизации пройдена")
+
+
+def main():
+    check()
+
+    clients = synthetic_clients(CLIENTS)
+    calls, staleness = simulate(clients)
+    legacy_calls = CLIENTS * int(DAY / LEGACY_INTERVAL)
+    total = sum(calls.values())
+    buckets = [calls.get(index, 0) for index in range(int(DAY / BUCKET))]
+
+    print(f"{CLIENTS} пациентов, сутки")
+    print(f"Запросов к CRM: было {legacy_calls}, стало {total} (x{legacy_calls / total:.1f} меньше)")
+    print(
+        f"Запросов за 5 минут: было {CLIENTS} дважды в час, "
+        f"стало min={min(buckets)}, max={max(buckets)}"
+    )
+    print(
+        f"Свежесть для записей в ближайшие сутки: было до {LEGACY_INTERVAL}, "
+        f"стало до {max(staleness)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
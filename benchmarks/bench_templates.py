@@ -0,0 +1,85 @@
+"""
+Бенчмарк рендера сценариев.
+
+Запуск: python -m benchmarks.bench_templates
+"""
+from datetime import datetime, timedelta
+
+from benchmarks.harness import bench
+from handlers.functions.scenario_templates import placeholder_values, render_message
+
+SCENARIO_MESSAGES = [
+    {
+        "id": index,
+        "type": "text",
+        "time": f"+{index * 24} 10:00",
+        "url": "",
+        "content": (
+            "Здравствуйте, {first_name}! Напоминаем, что {start_time} у вас "
+            "прием у врача {first_name_doctor} {last_name_doctor}. " * 3
+        ),
+    }
+    for index in range(1, 21)
+]
+
+PATIENTS = 1000
+
+
+def legacy_replace_content(start_time, message, first_name, doctor_first, doctor_last):
+    """Прежняя реализация replace_content для сравнения."""
+    start_time_str = start_time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    start_time_datetime = None
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%d.%m.%Y %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            start_time_datetime = datetime.strptime(start_time_str, fmt)
+            break
+        except ValueError:
+            continue
+    formatted_start_time = (
+        f'{start_time_datetime.strftime("%d.%m")} в {start_time_datetime.strftime("%H:%M")}'
+    )
+    placeholders = {
+        "{first_name}": first_name,
+        "{first_name_doctor}": doctor_first,
+        "{last_name_doctor}": doctor_last,
+        "{start_time}": formatted_start_time,
+    }
+    message = dict(message)
+    content = message.get("content", "")
+    for placeholder, value in placeholders.items():
+        if placeholder in content:
+            content = content.replace(placeholder, value)
+    message["content"] = content
+    time_content = message.get("time", "")
+    for placeholder, value in placeholders.items():
+        if placeholder in time_content:
+            time_content = time_content.replace(placeholder, value)
+    message["time"] = time_content
+    return message
+
+
+def main():
+    start = datetime(2024, 11, 5, 9, 30)
+    patients = [
+        (f"Пациент{index}", start + timedelta(minutes=index)) for index in range(PATIENTS)
+    ]
+
+    def legacy():
+        for first_name, start_time in patients:
+            for message in SCENARIO_MESSAGES:
+                legacy_replace_content(start_time, message, first_name, "Анна", "Иванова")
+
+    def per_message():
+        for first_name, start_time in patients:
+            values = placeholder_values(start_time, first_name, "Анна", "Иванова")
+            for message in SCENARIO_MESSAGES:
+                render_message(message, values)
+
+    print(f"{len(SCENARIO_MESSAGES)} сообщений x {PATIENTS} пациентов")
+    legacy_us = bench("legacy replace_content", legacy, number=1, repeat=3)
+    render_us = bench("render_message", per_message, number=1, repeat=3)
+    print(f"Ускорение: x{legacy_us / render_us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
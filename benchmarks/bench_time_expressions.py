@@ -0,0 +1,98 @@
+"""
+Проверка и бенчмарк разбора времени отправки сообщений сценария.
+
+Запуск: python -m benchmarks.bench_time_expressions
+"""
+from datetime import datetime, time, timedelta
+
+from benchmarks.harness import bench
+from scheduler.time_expressions import (
+    IMMEDIATE_DELAY,
+    admin_time_to_expression,
+    compile_time_expression,
+    message_offset,
+    offset_to_dict,
+    send_time,
+)
+
+START = datetime(2024, 11, 5, 9, 30)
+NOW = datetime(2024, 11, 1, 12, 0)
+
+EXPECTED = {
+    "+24": datetime(2024, 11, 6, 9, 30),
+    "-24 10:00": datetime(2024, 11, 4, 10, 0),
+    "0 10:00": datetime(2024, 11, 5, 10, 0),
+    "0": NOW + IMMEDIATE_DELAY,
+}
+
+ADMIN_INPUT = {
+    "+1": "+24",
+    "-1 10:00": "-24 10:00",
+    "0 10:00": "0 10:00",
+    "0": "0",
+}
+
+
+def legacy_calculate_send_time(start_datetime, offset_time):
+    """Прежний разбор времени из calculate_send_time для сравнения."""
+    if " " in offset_time:
+        days_offset, time_of_day = offset_time.split()
+        moment = start_datetime + timedelta(hours=int(days_offset))
+        return datetime.combine(
+            moment.date(), datetime.strptime(time_of_day, "%H:%M").time()
+        )
+    elif offset_time == "0":
+        return datetime.now() + timedelta(seconds=5)
+    return start_datetime + timedelta(hours=int(offset_time))
+
+
+def check():
+    for expression, expected in EXPECTED.items():
+        offset = compile_time_expression(expression)
+        assert send_time(offset, START, NOW) == expected, expression
+        stored = {"time": expression, "offset": offset_to_dict(expression)}
+        assert message_offset(stored) == offset, expression
+
+    for text, expression in ADMIN_INPUT.items():
+        assert admin_time_to_expression(text) == expression, text
+
+    assert compile_time_expression("0 10:00").clock == time(10, 0)
+    for invalid in ("", "завтра", "+24 25:00", "+24 10:60", "24 10"):
+        try:
+            compile_time_expression(invalid)
+        except ValueError:
+            continue
+        raise AssertionError(f"Принято некорректное время: {invalid!r}")
+
+    print("Проверка форматов времени пройдена")
+
+
+def main():
+    check()
+
+    expressions = list(EXPECTED)
+    messages = [
+        {"time": expression, "offset": offset_to_dict(expression)}
+        for expression in expressions
+    ]
+    starts = [START + timedelta(minutes=index) for index in range(1000)]
+
+    def legacy():
+        for start in starts:
+            for expression in expressions:
+                legacy_calculate_send_time(start, expression)
+
+    def compiled():
+        # Как в plan_send_times: по каждой записи время всех сообщений сценария
+        for start in starts:
+            for message in messages:
+                send_time(message_offset(message), start, NOW)
+
+    print(f"{len(expressions)} сообщения x {len(starts)} записей")
+    legacy_us = bench("legacy calculate_send_time", legacy, number=1, repeat=5)
+    compiled_us = bench("compiled send_time", compiled, number=1, repeat=5)
+    print(f"Ускорение: x{legacy_us / compiled_us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
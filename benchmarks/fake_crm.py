@@ -0,0 +1,213 @@
+"""
+Локальная замена CRM для нагрузочных проверок синхронизации и авторизации.
+
+Поддерживает команды get_user_data, get_sotr и get_book. Данные генерируются
+для заданного числа пациентов и врачей, записанные ответы можно подставить
+из файла фикстур.
+
+Запуск: python -m benchmarks.fake_crm --patients 10000 --doctors 50 --latency 0.05 --error-rate 0.01
+Бот и воркер подключаются через переменную окружения URL=http://127.0.0.1:8081/
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+from database.constants_db import procedure_to_stage_number
+
+LAST_NAMES = ["Иванова", "Петрова", "Смирнова", "Кузнецова", "Попова", "Соколова"]
+FIRST_NAMES = ["Анна", "Мария", "Елена", "Ольга", "Наталья", "Ирина"]
+DOCTOR_LAST_NAMES = ["Орлов", "Волков", "Зайцев", "Морозов", "Новиков"]
+DOCTOR_FIRST_NAMES = ["Сергей", "Андрей", "Павел", "Дмитрий", "Алексей"]
+ROOMS = ["Кабинет 1", "Кабинет 2", "Операционная", "Процедурный"]
+
+
+class FakeCrmData:
+    """
+    Синтетические пациенты, врачи и записи. Генерация детерминирована по seed,
+    поэтому бенчмарк и сервер, запущенные отдельно, видят одни и те же данные.
+    """
+
+    def __init__(self, patients=1000, doctors=20, seed=1):
+        rng = random.Random(seed)
+        procedures = list(procedure_to_stage_number)
+
+        self.doctors = [
+            {
+                "id": 500000 + index,
+                "phone": f"+7910{index:07d}",
+                "last_name": DOCTOR_LAST_NAMES[index % len(DOCTOR_LAST_NAMES)],
+                "first_name": f"{DOCTOR_FIRST_NAMES[index % len(DOCTOR_FIRST_NAMES)]}{index}",
+                "middle_name": "Иванович",
+                "dolj": "Репродуктолог",
+            }
+            for index in range(doctors)
+        ]
+        self.patients = []
+        for index in range(patients):
+            doctor = self.doctors[index % doctors]
+            self.patients.append(
+                {
+                    "id": 100000 + index,
+                    "phone": f"+7900{index:07d}",
+                    "name": f"{LAST_NAMES[index % len(LAST_NAMES)]} "
+                            f"{FIRST_NAMES[index % len(FIRST_NAMES)]} Сергеевна",
+                    "doctor": doctor,
+                    "procedure": rng.choice(procedures),
+                    # Смещение записи относительно начала окна get_book, в минутах
+                    "offset": rng.randrange(0, 6 * 24 * 60, 15),
+                    "room": rng.choice(ROOMS),
+                }
+            )
+
+        self.patients_by_phone = {patient["phone"]: patient for patient in self.patients}
+        self.patients_by_id = {patient["id"]: patient for patient in self.patients}
+        self.doctors_by_phone = {doctor["phone"]: doctor for doctor in self.doctors}
+
+    def get_user_data(self, payload):
+        patient = self.patients_by_phone.get(payload.get("user"))
+        if not patient:
+            return {"result": {"code": 1, "err_msg": "Пользователь не найден"}}
+        return {"result": {"code": 0, "id": patient["id"], "name": patient["name"]}}
+
+    def get_sotr(self, payload):
+        doctor = self.doctors_by_phone.get(payload.get("phone"))
+        if not doctor:
+            return {"result": {"code": 1, "err_msg": "Сотрудник не найден"}}
+        full_name = f"{doctor['last_name']} {doctor['first_name']} {doctor['middle_name']}"
+        return {
+            "result": {
+                "code": 0,
+                "item": {"id": doctor["id"], "full_name": full_name, "dolj": doctor["dolj"]},
+            }
+        }
+
+    def get_book(self, payload):
+        patient = self.patients_by_id.get(payload.get("id"))
+        if not patient:
+            return {"result": {"code": 0, "items": []}}
+
+        beg_per = datetime.strptime(payload["beg_per"], "%d.%m.%Y")
+        start = beg_per + timedelta(minutes=patient["offset"])
+        doctor = patient["doctor"]
+        return {
+            "result": {
+                "code": 0,
+                "items": [
+                    {
+                        "t_name": f"Процедура {patient['procedure']}",
+                        "s_name": f"{doctor['last_name']} {doctor['first_name']} {doctor['middle_name']}",
+                        "dt_beg": start.strftime("%d.%m.%Y %H:%M"),
+                        "dt_end": (start + timedelta(minutes=30)).strftime("%d.%m.%Y %H:%M"),
+                        "z_name": patient["room"],
+                        "id_tov": patient["procedure"],
+                    }
+                ],
+            }
+        }
+
+
+def load_fixtures(path):
+    """
+    Записанные ответы CRM: {"команда": {"ключ запроса": ответ}}.
+    Ключ - телефон для get_user_data и get_sotr, id пациента для get_book.
+    """
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+FIXTURE_KEYS = {"get_user_data": "user", "get_sotr": "phone", "get_book": "id"}
+# Счетчик запросов по командам в приложении aiohttp
+CALLS_KEY = web.AppKey("calls", Counter)
+
+
+def create_app(data, latency=0.0, jitter=0.0, error_rate=0.0, fixtures=None, seed=1):
+    """
+    Приложение aiohttp с единственным POST-обработчиком, как у CRM.
+
+    :param data: FakeCrmData.
+    :param latency: Средняя задержка ответа в секундах.
+    :param jitter: Разброс задержки в секундах.
+    :param error_rate: Доля запросов, на которые отвечаем 500.
+    :param fixtures: Записанные ответы, имеют приоритет над синтетическими.
+    """
+    rng = random.Random(seed)
+    calls = Counter()
+    fixtures = fixtures or {}
+
+    async def handle(request):
+        payload = await request.json()
+        command = payload.get("command")
+        calls[command] += 1
+
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if rng.random() < error_rate:
+            calls["errors"] += 1
+            return web.json_response({"error": "injected"}, status=500)
+
+        recorded = fixtures.get(command, {}).get(str(payload.get(FIXTURE_KEYS.get(command))))
+        if recorded is not None:
+            return web.json_response(recorded)
+
+        handler = getattr(data, command, None) if command in FIXTURE_KEYS else None
+        if handler is None:
+            return web.json_response({"result": {"code": 1, "err_msg": "Неизвестная команда"}})
+        return web.json_response(handler(payload))
+
+    async def stats(request):
+        return web.json_response(dict(calls))
+
+    app = web.Application()
+    app[CALLS_KEY] = calls
+    app.router.add_post("/", handle)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+async def start_fake_crm(data, host="127.0.0.1", port=8081, **options):
+    """
+    Запуск сервера в текущем цикле событий (для бенчмарков).
+
+    :return: (runner, app); сервер останавливается через await runner.cleanup().
+    """
+    app = create_app(data, **options)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена CRM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", help="JSON с записанными ответами CRM")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    data = FakeCrmData(args.patients, args.doctors, args.seed)
+    app = create_app(
+        data,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+        seed=args.seed,
+    )
+    print(f"Fake CRM: {args.patients} пациентов, {args.doctors} врачей на {args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
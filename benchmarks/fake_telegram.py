@@ -0,0 +1,197 @@
+"""
+Локальная замена Telegram Bot API для бенчмарков обработчиков и воркера.
+
+Принимает sendMessage, sendVideo, sendPhoto, editMessageText, deleteMessage,
+getChat (и служебные getMe, getUpdates, deleteWebhook), ограничивает частоту
+отправки как Telegram (ответ 429 с retry_after) и записывает каждый вызов.
+
+Запуск: python -m benchmarks.fake_telegram --port 8082 --global-rate 30 --chat-rate 1
+Бот и воркер подключаются к ней через TELEGRAM_API_SERVER=http://127.0.0.1:8082
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+
+from aiohttp import web
+
+SEND_METHODS = {"sendMessage", "sendVideo", "sendPhoto", "editMessageText"}
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, не больше burst подряд."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait(self):
+        """
+        :return: 0, если токен есть, иначе через сколько секунд повторить. Токен не тратится.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return math.ceil((1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+
+class FakeTelegram:
+    """
+    Состояние сервера: лимиты, заблокированные чаты и журнал вызовов.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, latency=0.0, blocked=()):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.latency = latency
+        self.blocked = set(blocked)
+        self.calls = []
+        self.counters = Counter()
+        self.message_id = 0
+
+    def limit(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        # Токены тратятся, только если запрос пропускают оба лимита: отклоненный
+        # общим лимитом запрос не должен расходовать лимит чата
+        retry_after = max(bucket.wait(), self.global_bucket.wait())
+        if retry_after:
+            return retry_after
+        bucket.take()
+        self.global_bucket.take()
+        return 0
+
+    def message(self, chat_id, params):
+        self.message_id += 1
+        result = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+        }
+        if "text" in params:
+            result["text"] = params["text"]
+        if "caption" in params:
+            result["caption"] = params["caption"]
+        return result
+
+    def record(self, method, chat_id, status):
+        self.calls.append(
+            {"time": time.time(), "method": method, "chat_id": chat_id, "status": status}
+        )
+        self.counters[f"{method}:{status}"] += 1
+
+
+def error(code, description, **parameters):
+    body = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=code)
+
+
+# Состояние замены в приложении aiohttp
+FAKE_KEY = web.AppKey("fake", FakeTelegram)
+
+
+def create_app(fake):
+    async def handle(request):
+        method = request.match_info["method"]
+        params = dict(await request.post()) or dict(request.query)
+        chat_id = params.get("chat_id")
+        chat_id = int(chat_id) if chat_id and chat_id.lstrip("-").isdigit() else chat_id
+
+        if fake.latency:
+            await asyncio.sleep(fake.latency)
+
+        if method == "getMe":
+            token = request.match_info["token"]
+            return web.json_response(
+                {"ok": True, "result": {"id": int(token.split(":")[0]), "is_bot": True,
+                                        "first_name": "Fake", "username": "fake_bot"}}
+            )
+        if method == "getUpdates":
+            # Long polling без обновлений
+            await asyncio.sleep(min(float(params.get("timeout", 0) or 0), 1))
+            return web.json_response({"ok": True, "result": []})
+
+        if chat_id in fake.blocked:
+            fake.record(method, chat_id, 403)
+            return error(403, "Forbidden: bot was blocked by the user")
+
+        if method in SEND_METHODS:
+            retry_after = fake.limit(chat_id)
+            if retry_after:
+                fake.record(method, chat_id, 429)
+                return error(
+                    429, f"Too Many Requests: retry after {retry_after}",
+                    retry_after=retry_after,
+                )
+
+        fake.record(method, chat_id, 200)
+        if method in SEND_METHODS:
+            result = fake.message(chat_id, params)
+        elif method == "getChat":
+            result = {"id": chat_id, "type": "private", "first_name": "Пациент",
+                      "accent_color_id": 0, "max_reaction_count": 0}
+        else:
+            # deleteMessage, deleteWebhook, sendChatAction и прочие методы без результата
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def calls(request):
+        return web.json_response(
+            {"counters": dict(fake.counters), "calls": len(fake.calls)},
+            dumps=lambda body: json.dumps(body, ensure_ascii=False),
+        )
+
+    app = web.Application()
+    app[FAKE_KEY] = fake
+    app.router.add_post("/bot{token}/{method}", handle)
+    app.router.add_get("/bot{token}/{method}", handle)
+    app.router.add_get("/calls", calls)
+    return app
+
+
+async def start_fake_telegram(fake, host="127.0.0.1", port=8082):
+    """
+    Запуск сервера в текущем цикле событий (для бенчмарков).
+
+    :return: runner; сервер останавливается через await runner.cleanup().
+    """
+    runner = web.AppRunner(create_app(fake))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--chat-burst", type=float, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--blocked", type=int, nargs="*", default=[])
+    args = parser.parse_args()
+
+    fake = FakeTelegram(
+        args.global_rate, args.chat_rate, args.chat_burst, args.latency, args.blocked
+    )
+    print(f"Fake Telegram Bot API на {args.host}:{args.port}")
+    web.run_app(create_app(fake), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import timeit
+
+
+def bench(name, func, number=1000, repeat=5):
+    """
+    Замер времени выполнения функции.
+
+    :param name: Название замера для вывода.
+    :param func: Функция без аргументов.
+    :param number: Количество вызовов в одном повторе.
+    :param repeat: Количество повторов, берется лучший.
+    :return: Время одного вызова в микросекундах.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    per_call_us = best / number * 1_000_000
+    print(f"{name:<50} {per_call_us:>12.2f} us/call")
+    return per_call_us
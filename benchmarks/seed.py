@@ -0,0 +1,75 @@
+"""
+Заполнение отдельной бд данными из FakeCrmData для бенчмарков и проверки бюджетов запросов.
+"""
+from configuration.config_db import Base, SessionLocal, engine
+from database.constants_db import procedure_to_stage_number
+from database.models import Client, Doctor, Procedure, Scenario
+from database.scenario_cache import scenario_cache
+from database.schema import upgrade_schema
+
+TG_ID_BASE = 10 ** 9
+
+
+def phone_to_int(phone):
+    return int(phone.lstrip("+"))
+
+
+async def reset_storage(redis):
+    """Пересоздание всех таблиц и очистка базы Redis."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+    await redis.flushdb()
+    scenario_cache.invalidate()
+
+
+async def seed(data, messages):
+    """Врачи и пациенты из FakeCrmData, процедуры и сценарии из сообщений "0"."""
+    async with SessionLocal() as session:
+        async with session.begin():
+            for procedure_id in procedure_to_stage_number:
+                session.add(Procedure(id=procedure_id, name=f"Процедура {procedure_id}", id_group=1))
+            for stage in sorted(set(procedure_to_stage_number.values())):
+                session.add(
+                    Scenario(
+                        stage=stage,
+                        scenarios_msg={
+                            "messages": [
+                                {
+                                    "id": index,
+                                    "time": "0",
+                                    "type": "text",
+                                    "url": "",
+                                    "content": f"{{first_name}}, сообщение {index} этапа {stage}. "
+                                               f"Врач {{first_name_doctor}} {{last_name_doctor}} "
+                                               f"ждет вас {{start_time}}.",
+                                }
+                                for index in range(messages)
+                            ]
+                        },
+                    )
+                )
+            for doctor in data.doctors:
+                session.add(
+                    Doctor(
+                        first_name=doctor["first_name"],
+                        last_name=doctor["last_name"],
+                        middle_name=doctor["middle_name"],
+                        specialty=doctor["dolj"],
+                        phone_number=phone_to_int(doctor["phone"]),
+                        id_crm=doctor["id"],
+                    )
+                )
+            for index, patient in enumerate(data.patients):
+                last_name, first_name, _ = patient["name"].split()
+                session.add(
+                    Client(
+                        tg_id=TG_ID_BASE + index,
+                        first_name=first_name,
+                        last_name=last_name,
+                        phone_number=phone_to_int(patient["phone"]),
+                        id_crm=patient["id"],
+                        stage=1,
+                    )
+                )
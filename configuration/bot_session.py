@@ -0,0 +1,40 @@
+import time
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.client.telegram import TelegramAPIServer
+
+from configuration.metrics import telegram_duration, telegram_requests
+from configuration.settings import settings
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Число, результат и время запросов к Bot API по методам."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except Exception as e:
+            telegram_requests.inc(name, type(e).__name__)
+            raise
+        finally:
+            telegram_duration.observe(name, value=time.perf_counter() - started)
+        telegram_requests.inc(name, "ok")
+        return response
+
+
+def bot_session():
+    """
+    Сессия бота с учетом запросов в метриках. Если задан TELEGRAM_API_SERVER
+    (локальный Bot API или замена из benchmarks/fake_telegram.py), запросы идут на этот сервер.
+
+    Модуль не создает бота и диспетчер, поэтому его импортирует и воркер.
+    """
+    if settings.telegram_api_server:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_server))
+    else:
+        session = AiohttpSession()
+    session.middleware(TelegramMetricsMiddleware())
+    return session
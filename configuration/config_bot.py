@@ -1,16 +1,15 @@
-import os
-
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.redis import RedisStorage
-from dotenv import load_dotenv
+
+from configuration.bot_session import bot_session
+from configuration.config_redis import get_fsm_storage
+from configuration.settings import settings
 
 
-load_dotenv()
-bot = Bot(token=os.getenv("TOKEN"))
-storage = RedisStorage.from_url(os.getenv("REDIS_URL"))
+bot = Bot(token=settings.token, session=bot_session())
+storage = get_fsm_storage()
 dp = Dispatcher(storage=storage)
 
 
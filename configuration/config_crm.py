@@ -1,18 +1,275 @@
-import os
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
 import aiohttp
 
-from dotenv import load_dotenv
+from configuration.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Таймауты запросов к CRM по командам, в секундах. Авторизация ждет ответа
+# в обработчике, поэтому её таймауты короче, чем у синхронизации расписания
+COMMAND_TIMEOUTS = {
+    "get_user_data": 5,
+    "get_sotr": 5,
+    "get_book": 15,
+}
+DEFAULT_TIMEOUT = 10
+# Повторы при обрыве соединения или ответе 5xx (все команды только читают данные)
+CRM_RETRIES = 1
+CRM_RETRY_DELAY = 0.5
+# Circuit breaker: после CRM_FAILURE_THRESHOLD ошибок подряд запросы отклоняются
+# сразу в течение CRM_RESET_TIMEOUT секунд, затем пропускается один пробный
+CRM_FAILURE_THRESHOLD = settings.crm_failure_threshold
+CRM_RESET_TIMEOUT = settings.crm_reset_timeout
+
+
+class CrmUnavailableError(Exception):
+    """CRM не ответила вовремя, вернула ошибку сервера или отключена circuit breaker'ом."""
+
+
+class CircuitBreaker:
+    """
+    Защита от долгих ожиданий, пока CRM недоступна.
+
+    closed - запросы идут в CRM; open - запросы сразу отклоняются;
+    half-open - после паузы пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold=CRM_FAILURE_THRESHOLD, reset_timeout=CRM_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe:
+            self._probe = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("CRM снова доступна, circuit breaker закрыт")
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    def release_probe(self):
+        """Завершение пробного запроса, даже если его исход не записан (например, отмена)."""
+        self._probe = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"CRM недоступна после {self.failures} ошибок, circuit breaker открыт")
+            self.opened_at = time.monotonic()
+
+
+class CommandStats:
+    """Счетчики запросов одной команды CRM."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def observe(self, elapsed, error=False):
+        self.requests += 1
+        self.errors += error
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def as_dict(self):
+        average = self.total_time / self.requests if self.requests else 0.0
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "avg_ms": round(average * 1000, 1),
+            "max_ms": round(self.max_time * 1000, 1),
+        }
+
+
+class CrmClient:
+    """
+    Клиент CRM: одна сессия aiohttp на процесс, таймауты по командам,
+    circuit breaker и объединение одинаковых одновременных запросов.
+    """
+
+    def __init__(self, base_url, login, secret):
+        self.base_url = base_url
+        self.auth = aiohttp.BasicAuth(login or "", secret or "")
+        self.breaker = CircuitBreaker()
+        self.stats = defaultdict(CommandStats)
+        self._session = None
+        self._inflight = {}
 
-load_dotenv()
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(auth=self.auth)
+        return self._session
 
-username = os.getenv("USERNAME_CRM")
-password = os.getenv("PASSWORD_CRM")
-url = os.getenv("URL")
+    async def request(self, data):
+        """
+        Запрос к CRM. Одинаковые запросы, отправленные одновременно
+        (например, один телефон при авторизации), выполняются один раз.
+
+        :param data: Тело запроса с полем command.
+        :return: Ответ CRM (json).
+        :raises CrmUnavailableError: Если CRM недоступна.
+        """
+        key = json.dumps(data, sort_keys=True, ensure_ascii=False)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send(data))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats[data.get("command")].coalesced += 1
+        # shield: отмена одного ожидающего обработчика не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def _send(self, data):
+        command = data.get("command")
+        stats = self.stats[command]
+        timeout = aiohttp.ClientTimeout(total=COMMAND_TIMEOUTS.get(command, DEFAULT_TIMEOUT))
+
+        for attempt in range(CRM_RETRIES + 1):
+            if not self.breaker.allow():
+                stats.rejected += 1
+                raise CrmUnavailableError(f"CRM недоступна, запрос {command} отклонен")
+
+            started = time.monotonic()
+            try:
+                async with self._get_session().post(
+                    self.base_url, json=data, timeout=timeout
+                ) as response:
+                    if response.status >= 500:
+                        raise CrmUnavailableError(f"CRM вернула {response.status} на {command}")
+                    result = await response.json(content_type=None)
+            except asyncio.TimeoutError:
+                stats.observe(time.monotonic() - started, error=True)
+                self.breaker.record_failure()
+                # Повтор после таймаута только удвоил бы ожидание обработчика
+                raise CrmUnavailableError(f"Таймаут CRM на {command}")
+            except (aiohttp.ClientError, CrmUnavailableError) as e:
+                stats.observe(time.monotonic() - started, error=True)
+                self.breaker.record_failure()
+                if attempt == CRM_RETRIES:
+                    raise CrmUnavailableError(f"Ошибка CRM на {command}: {e}") from e
+                await asyncio.sleep(CRM_RETRY_DELAY)
+                continue
+            except Exception as e:
+                stats.observe(time.monotonic() - started, error=True)
+                self.breaker.record_failure()
+                # Ответ не разобран (например, HTML-страница 4xx или прокси), повтор не поможет
+                raise CrmUnavailableError(f"Некорректный ответ CRM на {command}: {e}") from e
+            finally:
+                # Иначе отмененный пробный запрос оставил бы breaker закрытым для всех
+                self.breaker.release_probe()
+
+            stats.observe(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    def summary(self):
+        """Счетчики по командам и состояние circuit breaker."""
+        return {
+            "breaker": self.breaker.state,
+            "commands": {command: stats.as_dict() for command, stats in self.stats.items()},
+        }
+
+    async def prewarm(self, timeout):
+        """
+        Открытие соединения с CRM до первой команды: HEAD к адресу CRM без команды,
+        соединение остается в пуле сессии. Ответ и ошибки не учитываются breaker'ом.
+        """
+        try:
+            async with self._get_session().head(
+                self.base_url, timeout=aiohttp.ClientTimeout(total=timeout)
+            ):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"CRM недоступна при прогреве: {e}")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+crm_client = CrmClient(settings.crm_url, settings.crm_username, settings.crm_password)
 
 
 async def get_information(data):
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            url, json=data, auth=aiohttp.BasicAuth(username, password)
-        ) as response:
-            return await response.json()
+    return await crm_client.request(data)
+
+
+async def get_user_data(phone):
+    """
+    Получает данные пациента по номеру телефона.
+
+    :param phone: Номер телефона пользователя.
+    :return: Ответ с данными пользователя, полученными от CRM.
+    """
+    data = {"command": "get_user_data", "user": phone}
+    return await get_information(data)
+
+
+async def get_sotr_data(phone):
+    """
+    Получает данные врача по номеру телефона.
+
+    :param phone: Номер телефона сотрудника.
+    :return: Ответ с данными сотрудника, полученными от внешнего сервиса.
+    """
+    data = {"command": "get_sotr", "phone": phone}
+    return await get_information(data)
+
+
+async def get_book_data(client_id):
+    """
+    Получает данные о записях пациента на основе его ID.
+
+    :param client_id: ID клиента.
+    :return: Ответ с данными о записях клиента на основе заданного периода.
+    """
+    today = datetime.today()
+    beg_per = (today - timedelta(days=2)).strftime("%d.%m.%Y")
+    end_per = (today + timedelta(days=4)).strftime("%d.%m.%Y")
+
+    data = {
+        "command": "get_book",
+        "id": client_id,
+        "beg_per": beg_per,
+        "end_per": end_per,
+    }
+
+    return await get_information(data)
@@ -1,13 +1,14 @@
-import os
-from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
-load_dotenv()
+from configuration.db_instrumentation import instrument_engine
+from configuration.settings import settings
 
-DATABASE_URI = f'postgresql+asyncpg://{os.getenv("POSTGRES_USER")}:{os.getenv("POSTGRES_PASSWORD")}@{os.getenv("POSTGRES_HOST")}:5432/{os.getenv("POSTGRES_DB")}'
+DATABASE_URI = settings.database_uri
 
-engine = create_async_engine(DATABASE_URI, echo=True)
+# DB_ECHO=1 включает вывод каждого запроса; медленные запросы пишутся в журнал slow_queries всегда
+engine = create_async_engine(DATABASE_URI, echo=settings.db_echo)
+instrument_engine(engine)
 SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
@@ -1,16 +1,95 @@
-import os
-import redis
-from dotenv import load_dotenv
+import redis.asyncio as aioredis
+from arq.connections import ArqRedis
 
-load_dotenv()
+from configuration.settings import settings
 
-redis_host = os.getenv("REDIS_HOST")
-redis_port = os.getenv("REDIS_PORT")
-redis_password = os.getenv("REDIS_PASSWORD")
+redis_url = settings.redis_url
+redis_host = settings.redis_host
+redis_port = settings.redis_port
+redis_password = settings.redis_password
+# Размер пула на процесс и время ожидания свободного соединения в секундах
+redis_max_connections = settings.redis_max_connections
+redis_pool_timeout = settings.redis_pool_timeout
+# Соединения, которые процесс держит помимо задач: подписка на сброс кэша
+# сценариев (занимает соединение постоянно) и опрос очереди arq
+RESERVED_CONNECTIONS = 2
+
+_pool = None
+_fsm_storage = None
+
+
+def get_redis_pool():
+    """
+    Общий асинхронный пул соединений с Redis для процесса.
+
+    Используется хранилищем состояний aiogram, пулом arq и кэшами приложения.
+    Соединения создаются лениво внутри запущенного event loop.
+    """
+    global _pool
+    if _pool is None:
+        if redis_url:
+            _pool = aioredis.BlockingConnectionPool.from_url(
+                redis_url,
+                max_connections=redis_max_connections,
+                timeout=redis_pool_timeout,
+            )
+        else:
+            _pool = aioredis.BlockingConnectionPool(
+                host=redis_host or "localhost",
+                port=int(redis_port or 6379),
+                password=redis_password,
+                db=0,
+                max_connections=redis_max_connections,
+                timeout=redis_pool_timeout,
+            )
+    return _pool
 
 
 # Подключение к Redis
 def get_redis_client():
-    return redis.StrictRedis(
-        host=redis_host, port=int(redis_port), password=redis_password, db=0
-    )
+    return aioredis.Redis(connection_pool=get_redis_pool())
+
+
+def get_arq_redis():
+    return ArqRedis(connection_pool=get_redis_pool())
+
+
+def get_fsm_storage():
+    """
+    Хранилище состояний aiogram. Общее для диспетчера бота и воркера,
+    которому не нужно создавать диспетчер, чтобы начать опрос пациента.
+    """
+    global _fsm_storage
+    if _fsm_storage is None:
+        # Импорт здесь: воркер, которому хранилище нужно только для опросов,
+        # не загружает aiogram при импорте
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        _fsm_storage = RedisStorage(redis=get_redis_client())
+    return _fsm_storage
+
+
+def ensure_pool_size(concurrent_jobs):
+    """
+    Увеличение пула до числа одновременных задач плюс RESERVED_CONNECTIONS.
+    С меньшим пулом задачи под нагрузкой ждут соединения до REDIS_POOL_TIMEOUT
+    и падают с ConnectionError.
+
+    :param concurrent_jobs: max_jobs воркера arq.
+    :return: Итоговый размер пула.
+    """
+    pool = get_redis_pool()
+    pool.max_connections = max(pool.max_connections, concurrent_jobs + RESERVED_CONNECTIONS)
+    return pool.max_connections
+
+
+def redis_pool_stats():
+    """
+    Состояние пула соединений: лимит, занятые и свободные соединения.
+    """
+    pool = get_redis_pool()
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": len(pool._in_use_connections),
+        "available": len(pool._available_connections),
+    }
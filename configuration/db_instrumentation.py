@@ -0,0 +1,182 @@
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from configuration.settings import settings
+
+slow_logger = logging.getLogger("slow_queries")
+
+# Запросы дольше порога пишутся в журнал медленных запросов
+SLOW_QUERY_MS = settings.slow_query_ms
+# Предел числа разных текстов запросов в сводке, чтобы она не росла без ограничений
+MAX_TRACKED_STATEMENTS = 500
+
+# Журнал запросов текущей задачи; None, если подсчет не включен
+_query_log: ContextVar["QueryLog | None"] = ContextVar("query_log", default=None)
+# Источник запросов: обработчик обновления или задача arq
+_query_source: ContextVar[dict] = ContextVar("query_source", default={})
+
+
+class QueryLog:
+    """SQL-запросы, выполненные внутри count_queries (каждый - отдельный поход в бд)."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+class StatementStats:
+    """Накопленное время выполнения одного текста запроса."""
+
+    __slots__ = ("count", "total", "max", "slow", "sources")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.sources = set()
+
+    def add(self, duration_ms, source):
+        self.count += 1
+        self.total += duration_ms
+        self.max = max(self.max, duration_ms)
+        if duration_ms >= SLOW_QUERY_MS:
+            self.slow += 1
+        if source:
+            self.sources.add(source)
+
+
+statement_stats: dict[str, StatementStats] = {}
+
+
+@contextmanager
+def count_queries():
+    """
+    Подсчет запросов к бд внутри блока. Контекст переменных передается
+    в greenlet SQLAlchemy, поэтому учитываются и запросы асинхронных сессий.
+
+    :return: QueryLog, заполняемый по мере выполнения запросов.
+    """
+    log = QueryLog()
+    token = _query_log.set(log)
+    try:
+        yield log
+    finally:
+        _query_log.reset(token)
+
+
+@contextmanager
+def query_source(**source):
+    """
+    Привязка запросов внутри блока к источнику: handler, job, user_id.
+    """
+    token = _query_source.set(source)
+    try:
+        yield
+    finally:
+        _query_source.reset(token)
+
+
+def traced_job(coroutine):
+    """
+    Обертка задачи arq: запросы задачи попадают в журнал с ее именем и job_id.
+    Имя функции сохраняется, поэтому задачи ставятся в очередь по прежнему имени.
+    """
+
+    @functools.wraps(coroutine)
+    async def wrapper(ctx, *args, **kwargs):
+        with query_source(job=coroutine.__name__, job_id=ctx.get("job_id")):
+            return await coroutine(ctx, *args, **kwargs)
+
+    return wrapper
+
+
+def source_label(source):
+    if "handler" in source:
+        return f"handler:{source['handler']}"
+    if "job" in source:
+        return f"job:{source['job']}"
+    return ""
+
+
+def redact(parameters):
+    """
+    Замена значений параметров запроса их типами: в журнал не попадают
+    телефоны, имена и тексты сообщений пациентов.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def record_statement(statement, parameters, executemany, duration_ms):
+    source = _query_source.get()
+    stats = statement_stats.get(statement)
+    if stats is None and len(statement_stats) < MAX_TRACKED_STATEMENTS:
+        stats = statement_stats[statement] = StatementStats()
+    if stats is not None:
+        stats.add(duration_ms, source_label(source))
+
+    if duration_ms < SLOW_QUERY_MS:
+        return
+    entry = {
+        "duration_ms": round(duration_ms, 1),
+        "statement": " ".join(statement.split()),
+        **source,
+    }
+    if executemany:
+        entry["rows"] = len(parameters)
+    else:
+        entry["params"] = redact(parameters)
+    slow_logger.warning(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+def slow_query_summary(limit=10):
+    """
+    Сводка по запросам с наибольшим суммарным временем с момента запуска процесса.
+
+    :param limit: Число запросов в сводке.
+    :return: Текст сводки.
+    """
+    top = sorted(statement_stats.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+    if not top:
+        return "Запросов к бд еще не было."
+
+    lines = [f"Порог медленного запроса: {SLOW_QUERY_MS:.0f} мс"]
+    for statement, stats in top:
+        lines.append(
+            f"{stats.total / 1000:.1f} с всего | {stats.count} раз | "
+            f"сред. {stats.total / stats.count:.1f} мс | макс. {stats.max:.1f} мс | "
+            f"медленных {stats.slow} | {', '.join(sorted(stats.sources)) or '-'}\n"
+            f"  {' '.join(statement.split())[:200]}"
+        )
+    return "\n".join(lines)
+
+
+def instrument_engine(engine):
+    """
+    Подключение обработчиков событий к движку (AsyncEngine).
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+        log = _query_log.get()
+        if log is not None:
+            log.statements.append(statement)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - context._query_start) * 1000
+        record_statement(statement, parameters, executemany, duration_ms)
@@ -0,0 +1,78 @@
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from configuration.settings import settings
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Сколько одинаковых предупреждений с одного места в коде пропускать за окно
+RATE_LIMIT_BURST = 5
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничение повторяющихся предупреждений и ошибок: с одной строки кода за
+    interval секунд проходит не больше burst записей, остальные отбрасываются.
+    Число отброшенных дописывается к первой записи следующего окна.
+    """
+
+    def __init__(self, interval, burst=RATE_LIMIT_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or record.levelno >= logging.CRITICAL:
+            return True
+
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        started, passed, suppressed = self._windows.get(key, (now, 0, 0))
+        if now - started >= self.interval:
+            if suppressed:
+                record.msg = f"{record.msg} (пропущено повторов: {suppressed})"
+            started, passed, suppressed = now, 0, 0
+
+        if passed >= self.burst:
+            self._windows[key] = (started, passed, suppressed + 1)
+            return False
+        self._windows[key] = (started, passed + 1, suppressed)
+        return True
+
+
+class ThreadQueueHandler(QueueHandler):
+    """
+    Передача записей в поток логирования без форматирования в вызывающем потоке:
+    очередь не покидает процесс, поэтому запись не нужно готовить к pickle.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=None):
+    """
+    Логирование процесса через очередь: обработчики и event loop только кладут
+    запись в очередь, форматирование и запись в поток вывода идут в отдельном потоке.
+
+    :param level: Уровень корневого логгера, по умолчанию LOG_LEVEL.
+    :return: QueueListener; при выходе из процесса он дописывает очередь и останавливается.
+    """
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = ThreadQueueHandler(records)
+    handler.addFilter(RateLimitFilter(settings.log_rate_limit_seconds))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level or settings.log_level)
+
+    listener = QueueListener(records, stream)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
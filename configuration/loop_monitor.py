@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from configuration.metrics import loop_blocks, loop_lag
+from configuration.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Период замера опоздания event loop в секундах
+LOOP_LAG_INTERVAL = settings.loop_lag_interval
+# Блокировка дольше порога логируется со стеком потока event loop
+LOOP_BLOCK_MS = settings.loop_block_ms
+# ASYNCIO_DEBUG=1: отладочный режим asyncio с предупреждениями о медленных колбэках
+ASYNCIO_DEBUG = settings.asyncio_debug
+
+
+class LoopMonitor:
+    """
+    Замер опоздания event loop и поиск блокирующих вызовов.
+
+    Задача в loop каждые LOOP_LAG_INTERVAL секунд отмечает пульс и пишет опоздание
+    таймера в гистограмму event_loop_lag_seconds. Сторожевой поток проверяет пульс:
+    если loop не отвечает дольше LOOP_BLOCK_MS, в лог пишется стек потока loop
+    в момент блокировки - по нему видно, какая корутина выполняет синхронную работу.
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, block_ms=LOOP_BLOCK_MS):
+        self.interval = interval
+        self.block_threshold = block_ms / 1000
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._stopped = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if ASYNCIO_DEBUG:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.block_threshold
+            logging.getLogger("asyncio").setLevel(logging.WARNING)
+            logger.info(f"Отладочный режим asyncio, порог медленного колбэка {self.block_threshold} с")
+
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _measure(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            loop_lag.observe(value=max(now - started - self.interval, 0))
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.block_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.block_threshold or reported == heartbeat:
+                continue
+            # Одна запись на каждую блокировку, а не на каждую проверку
+            reported = heartbeat
+            loop_blocks.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "стек недоступен"
+            logger.warning(f"Event loop заблокирован дольше {blocked * 1000:.0f} мс:\n{stack}")
+
+
+def start_loop_monitor():
+    """
+    Запуск монитора в текущем event loop.
+
+    :return: LoopMonitor, который нужно остановить через stop().
+    """
+    monitor = LoopMonitor()
+    monitor.start()
+    return monitor
@@ -0,0 +1,260 @@
+import bisect
+import functools
+import logging
+import time
+
+from aiohttp import web
+from arq import Retry
+
+from configuration.config_redis import redis_pool_stats
+from configuration.settings import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = settings.metrics_host
+METRICS_PORT = settings.metrics_port
+# Свой порт у воркера: бот и воркер на одной машине не делят METRICS_PORT
+WORKER_METRICS_PORT = settings.worker_metrics_port
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class Counter:
+    """Счетчик с метками, например запросы к Telegram по методу и результату."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """Текущее значение, например глубина очереди arq на момент запроса /metrics."""
+
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        self.values[label_values] = value
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин, как в Prometheus.
+    Квантили для /perf оцениваются по корзинам линейной интерполяцией.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # метки -> [счетчики корзин (последняя - +Inf), сумма, количество]
+        self.values = {}
+
+    def observe(self, *label_values, value):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def quantile(self, label_values, share):
+        counts, _, total = self.values[label_values]
+        rank = share * total
+        seen = 0
+        lower = 0.0
+        for index, count in enumerate(counts):
+            if index == len(self.buckets):
+                return self.buckets[-1]
+            upper = self.buckets[index]
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+    def samples(self):
+        for label_values, (counts, total_sum, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = format_labels((*self.labels, "le"), (*label_values, bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total_sum}"
+            yield f"{self.name}_count{labels} {total}"
+
+
+class Registry:
+    """Метрики процесса и асинхронные сборщики, обновляющие их перед выдачей."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    async def render(self):
+        for collector in self.collectors:
+            try:
+                await collector()
+            except Exception as e:
+                logger.warning(f"Ошибка сборщика метрик {collector.__name__}: {e}")
+
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_duration = registry.register(
+    Histogram("bot_handler_duration_seconds", "Время обработки обновления", ("handler", "status"))
+)
+job_duration = registry.register(
+    Histogram("arq_job_duration_seconds", "Время выполнения задачи arq", ("job", "status"))
+)
+telegram_requests = registry.register(
+    Counter("telegram_requests_total", "Запросы к Telegram Bot API", ("method", "status"))
+)
+telegram_duration = registry.register(
+    Histogram("telegram_request_duration_seconds", "Время запроса к Telegram Bot API", ("method",))
+)
+queue_depth = registry.register(Gauge("arq_queue_depth", "Задач в очереди arq, включая отложенные"))
+delivery_lag_seconds = registry.register(
+    Histogram("delivery_lag_seconds", "Задержка отправки относительно запланированного времени",
+              buckets=LAG_BUCKETS)
+)
+loop_lag = registry.register(
+    Histogram("event_loop_lag_seconds", "Опоздание пробуждения event loop относительно таймера",
+              buckets=LOOP_LAG_BUCKETS)
+)
+startup_seconds = registry.register(
+    Gauge("process_startup_seconds", "Время этапов запуска процесса", ("process", "stage"))
+)
+loop_blocks = registry.register(
+    Counter("event_loop_blocks_total", "Блокировки event loop дольше LOOP_BLOCK_MS")
+)
+redis_pool_connections = registry.register(
+    Gauge("redis_pool_connections", "Соединения пула Redis процесса: занятые, свободные и лимит", ("state",))
+)
+
+
+async def collect_redis_pool():
+    stats = redis_pool_stats()
+    redis_pool_connections.set("in_use", value=stats["in_use"])
+    redis_pool_connections.set("available", value=stats["available"])
+    redis_pool_connections.set("max", value=stats["max_connections"])
+
+
+registry.add_collector(collect_redis_pool)
+
+
+def timed_job(coroutine):
+    """
+    Обертка задачи arq: время выполнения по имени задачи и результату (ok, retry, error).
+    """
+
+    @functools.wraps(coroutine)
+    async def wrapper(ctx, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await coroutine(ctx, *args, **kwargs)
+            status = "ok"
+            return result
+        except Retry:
+            status = "retry"
+            raise
+        finally:
+            job_duration.observe(coroutine.__name__, status, value=time.perf_counter() - started)
+
+    return wrapper
+
+
+def percentile_summary(histogram, title):
+    """
+    Строки p50/p95 по всем меткам гистограммы, отсортированные по числу наблюдений.
+    """
+    series = sorted(histogram.values.items(), key=lambda item: item[1][2], reverse=True)
+    if not series:
+        return []
+    lines = [title]
+    for label_values, (_, _, total) in series:
+        lines.append(
+            f"{' '.join(map(str, label_values)) or '-'}: {total} | "
+            f"p50 {histogram.quantile(label_values, 0.5) * 1000:.0f} мс | "
+            f"p95 {histogram.quantile(label_values, 0.95) * 1000:.0f} мс"
+        )
+    return lines
+
+
+def perf_summary():
+    """Сводка p50/p95 по обработчикам и методам Telegram для команды /perf."""
+    lines = percentile_summary(handler_duration, "Обработчики:")
+    telegram_lines = percentile_summary(telegram_duration, "Запросы к Telegram:")
+    if telegram_lines:
+        lines += ["", *telegram_lines]
+    errors = [
+        f"{method} {status}: {count}"
+        for (method, status), count in telegram_requests.values.items()
+        if status != "ok"
+    ]
+    if errors:
+        lines += ["", "Ошибки Telegram:", *errors]
+    return "\n".join(lines) or "Метрик пока нет."
+
+
+async def metrics_handler(request):
+    return web.Response(text=await registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    HTTP-сервер с /metrics в формате Prometheus рядом с ботом или воркером.
+    Если порт занят, бот и воркер продолжают работу без сервера метрик.
+
+    :return: AppRunner, который нужно остановить через cleanup(), или None.
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Сервер метрик не запущен на {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Метрики доступны на {host}:{port}: /metrics")
+    return runner
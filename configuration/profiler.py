@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from configuration.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Каталог для файлов профилей и период выборки стека в миллисекундах
+PROFILE_DIR = settings.profile_dir
+PROFILE_INTERVAL_MS = settings.profile_interval_ms
+MAX_PROFILE_SECONDS = 600
+TOP_FUNCTIONS = 5
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.relpath(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame):
+    """
+    Стек потока в формате folded: корень слева, кадры через ';'.
+    Кадры event loop до колбэка задачи отбрасываются.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "_run" and code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+            break
+        frames.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    """
+    Выборочный профилировщик обработчиков и задач.
+
+    Во время сессии доля percent обновлений или задач отмечается в track(). Поток
+    каждые PROFILE_INTERVAL_MS снимает стек потока event loop и, если выполняется
+    отмеченная задача asyncio, засчитывает стек ее обработчику. Ожидание ввода-вывода
+    в выборку не попадает: профиль показывает, на что уходит время event loop.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.percent = 0
+        self._tracked = {}
+        self._samples = defaultdict(Counter)
+        self._loop = None
+        self._loop_thread_id = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def should_sample(self):
+        return self.active and random.random() * 100 < self.percent
+
+    @contextmanager
+    def track(self, label):
+        task = asyncio.current_task()
+        self._tracked[task] = label
+        try:
+            yield
+        finally:
+            self._tracked.pop(task, None)
+
+    def start(self, percent):
+        self.percent = percent
+        self._samples = defaultdict(Counter)
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self.active = True
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Остановка сессии. Поток выборки завершается до возврата, поэтому
+        возвращенные выборки больше не меняются.
+        """
+        self.active = False
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._tracked.clear()
+        return self._samples
+
+    def _sample(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self._stopped.wait(interval):
+            task = asyncio.current_task(self._loop)
+            label = self._tracked.get(task)
+            if label is None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._samples[label][fold_stack(frame)] += 1
+
+
+profiler = SamplingProfiler()
+
+
+@contextmanager
+def profiled(label):
+    """Отметка обработчика или задачи для профилировщика, если сессия идет и выпала выборка."""
+    if profiler.should_sample():
+        with profiler.track(label):
+            yield
+    else:
+        yield
+
+
+def profiled_job(coroutine):
+    """Обертка задачи arq для выборочного профилирования по имени задачи."""
+
+    @functools.wraps(coroutine)
+    async def wrapper(ctx, *args, **kwargs):
+        with profiled(coroutine.__name__):
+            return await coroutine(ctx, *args, **kwargs)
+
+    return wrapper
+
+
+def write_folded(samples, process):
+    """
+    Запись профилей в формате folded stacks (flamegraph.pl, speedscope):
+    по файлу на обработчик или задачу.
+
+    :return: Каталог с файлами.
+    """
+    directory = os.path.join(PROFILE_DIR, f"{process}-{datetime.now():%Y%m%d-%H%M%S}")
+    os.makedirs(directory, exist_ok=True)
+    for label, stacks in samples.items():
+        with open(os.path.join(directory, f"{label}.folded"), "w", encoding="utf-8") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+    return directory
+
+
+def top_functions(stacks, limit=TOP_FUNCTIONS):
+    """Функции с наибольшим накопленным временем: кадр считается один раз на выборку."""
+    cumulative = Counter()
+    for stack, count in stacks.items():
+        for name in set(stack.split(";")):
+            cumulative[name] += count
+    return cumulative.most_common(limit)
+
+
+def profile_report(samples, directory):
+    if not samples:
+        return "За время профилирования отмеченные обработчики не занимали event loop."
+
+    interval = PROFILE_INTERVAL_MS / 1000
+    lines = [f"Профили: {directory}"]
+    ordered = sorted(samples.items(), key=lambda item: sum(item[1].values()), reverse=True)
+    for label, stacks in ordered:
+        lines.append(f"\n{label}: {sum(stacks.values()) * interval:.2f} с")
+        for name, count in top_functions(stacks):
+            lines.append(f"  {count * interval:.2f} с  {name}")
+    return "\n".join(lines)
+
+
+async def profile_session(seconds, percent, process):
+    """
+    Профилирование доли percent обновлений или задач в течение seconds секунд.
+
+    :param seconds: Длительность сессии, не больше MAX_PROFILE_SECONDS.
+    :param percent: Доля профилируемых обновлений или задач в процентах.
+    :param process: Имя процесса для каталога с профилями (bot, worker).
+    :return: Текст отчета для админа.
+    """
+    if profiler.active:
+        return "Профилирование уже идет."
+
+    seconds = min(seconds, MAX_PROFILE_SECONDS)
+    logger.info(f"Профилирование {process}: {seconds} с, {percent}% обновлений и задач")
+    profiler.start(percent)
+    started = time.monotonic()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        samples = profiler.stop()
+    directory = await asyncio.to_thread(write_folded, samples, process)
+    logger.info(f"Профилирование {process} завершено за {time.monotonic() - started:.0f} с: {directory}")
+    return profile_report(samples, directory)
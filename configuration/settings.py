@@ -0,0 +1,103 @@
+import os
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+
+def env_flag(name):
+    return os.getenv(name, "0") == "1"
+
+
+class Settings(NamedTuple):
+    """
+    Настройки бота и воркера из переменных окружения и файла .env.
+    Читаются один раз при первом импорте модуля, описание переменных - в README.
+    """
+
+    token: str | None
+    telegram_api_server: str | None
+    support_group_id: str | None
+
+    crm_username: str | None
+    crm_password: str | None
+    crm_url: str | None
+    crm_failure_threshold: int
+    crm_reset_timeout: float
+
+    postgres_user: str | None
+    postgres_password: str | None
+    postgres_host: str | None
+    postgres_db: str | None
+    db_echo: bool
+    slow_query_ms: float
+
+    redis_url: str | None
+    redis_host: str | None
+    redis_port: str | None
+    redis_password: str | None
+    redis_max_connections: int
+    redis_pool_timeout: float
+
+    telegram_send_rate: float
+    delivery_window: int
+    pipeline_jitter: int
+
+    metrics_host: str
+    metrics_port: int
+    worker_metrics_port: int
+    loop_lag_interval: float
+    loop_block_ms: float
+    asyncio_debug: bool
+    profile_dir: str
+    profile_interval_ms: float
+    log_level: str
+    log_rate_limit_seconds: float
+
+    @property
+    def database_uri(self):
+        return (
+            f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}"
+            f"@{self.postgres_host}:5432/{self.postgres_db}"
+        )
+
+
+def load_settings():
+    load_dotenv()
+    return Settings(
+        token=os.getenv("TOKEN"),
+        telegram_api_server=os.getenv("TELEGRAM_API_SERVER"),
+        support_group_id=os.getenv("SUPPORT_GROUP_ID"),
+        crm_username=os.getenv("USERNAME_CRM"),
+        crm_password=os.getenv("PASSWORD_CRM"),
+        crm_url=os.getenv("URL"),
+        crm_failure_threshold=int(os.getenv("CRM_FAILURE_THRESHOLD", 5)),
+        crm_reset_timeout=float(os.getenv("CRM_RESET_TIMEOUT", 30)),
+        postgres_user=os.getenv("POSTGRES_USER"),
+        postgres_password=os.getenv("POSTGRES_PASSWORD"),
+        postgres_host=os.getenv("POSTGRES_HOST"),
+        postgres_db=os.getenv("POSTGRES_DB"),
+        db_echo=env_flag("DB_ECHO"),
+        slow_query_ms=float(os.getenv("SLOW_QUERY_MS", 200)),
+        redis_url=os.getenv("REDIS_URL"),
+        redis_host=os.getenv("REDIS_HOST"),
+        redis_port=os.getenv("REDIS_PORT"),
+        redis_password=os.getenv("REDIS_PASSWORD"),
+        redis_max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+        redis_pool_timeout=float(os.getenv("REDIS_POOL_TIMEOUT", 10)),
+        telegram_send_rate=float(os.getenv("TELEGRAM_SEND_RATE", 25)),
+        delivery_window=int(os.getenv("DELIVERY_WINDOW_SECONDS", 1800)),
+        pipeline_jitter=int(os.getenv("PIPELINE_JITTER_SECONDS", 60)),
+        metrics_host=os.getenv("METRICS_HOST", "127.0.0.1"),
+        metrics_port=int(os.getenv("METRICS_PORT", 8000)),
+        worker_metrics_port=int(os.getenv("WORKER_METRICS_PORT", 8001)),
+        loop_lag_interval=float(os.getenv("LOOP_LAG_INTERVAL", 0.5)),
+        loop_block_ms=float(os.getenv("LOOP_BLOCK_MS", 500)),
+        asyncio_debug=env_flag("ASYNCIO_DEBUG"),
+        profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+        profile_interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", 5)),
+        log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        log_rate_limit_seconds=float(os.getenv("LOG_RATE_LIMIT_SECONDS", 60)),
+    )
+
+
+settings = load_settings()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+
+from configuration.metrics import startup_seconds
+
+logger = logging.getLogger(__name__)
+
+# Сколько соединений с Redis открыть заранее (пул Postgres прогревается целиком)
+REDIS_PREWARM_CONNECTIONS = 5
+CRM_PREWARM_TIMEOUT = 3
+
+
+class StartupTimer:
+    """
+    Разбивка времени запуска процесса по этапам для лога и метрики process_startup_seconds.
+
+    :param process: Имя процесса (bot, worker).
+    :param started: time.monotonic() в начале импорта точки входа.
+    """
+
+    def __init__(self, process, started):
+        self.process = process
+        self.started = started
+        self._last = started
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.monotonic()
+        self.stages.append((stage, now - self._last))
+        startup_seconds.set(self.process, stage, value=now - self._last)
+        self._last = now
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        stages = ", ".join(f"{stage} {seconds:.3f} с" for stage, seconds in self.stages)
+        startup_seconds.set(self.process, "total", value=self.elapsed())
+        return f"Запуск {self.process}: {stages}; всего {self.elapsed():.3f} с"
+
+
+async def warm_postgres(engine):
+    """Одновременное открытие всех соединений пула, чтобы первые запросы не ждали подключения."""
+
+    async def connect():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(connect() for _ in range(engine.pool.size())))
+
+
+async def warm_redis(redis):
+    await asyncio.gather(*(redis.ping() for _ in range(REDIS_PREWARM_CONNECTIONS)))
+
+
+async def warm_crm(crm_client):
+    await crm_client.prewarm(timeout=CRM_PREWARM_TIMEOUT)
+
+
+async def prewarm(**warmers):
+    """
+    Параллельный прогрев пулов соединений. Ошибки не прерывают запуск:
+    недоступный сервис проявится при первом запросе, как и без прогрева.
+
+    :param warmers: Имя пула -> корутина прогрева.
+    :return: Строка с временем прогрева каждого пула.
+    """
+
+    async def timed(name, warmer):
+        started = time.monotonic()
+        try:
+            await warmer
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть {name}: {e}")
+        return f"{name} {time.monotonic() - started:.3f} с"
+
+    results = await asyncio.gather(*(timed(name, warmer) for name, warmer in warmers.items()))
+    return ", ".join(results)
@@ -8,6 +8,7 @@ from database.models import (
     UserScenario,
     Scenario,
 )
+from database.scenario_cache import invalidate_scenarios, scenario_cache
 
 
 async def get_all_scenarios():
@@ -16,35 +17,32 @@ async def get_all_scenarios():
 
     :return: Словарь с результатом или None в случае ошибки.
     """
-    async with SessionLocal() as session:
-        try:
-
-            scenarios_query = await session.execute(select(Scenario))
-            scenarios = scenarios_query.scalars().all()
+    try:
+        scenarios = await scenario_cache.get_all()
 
-            if not scenarios:
-                return None
+        if not scenarios:
+            return None
 
-            result = sorted(
-                [
-                    {
-                        "scenario_id": scenario.id,
-                        "name_stage": (
-                            scenario.scenarios_msg.get("name_stage", "")
-                            if scenario.scenarios_msg
-                            else "Без названия"
-                        ),
-                    }
-                    for scenario in scenarios
-                ],
-                key=lambda x: x["scenario_id"],  # Сортировка по ID этапа
-            )
+        result = sorted(
+            [
+                {
+                    "scenario_id": scenario.id,
+                    "name_stage": (
+                        scenario.scenarios_msg.get("name_stage", "")
+                        if scenario.scenarios_msg
+                        else "Без названия"
+                    ),
+                }
+                for scenario in scenarios
+            ],
+            key=lambda x: x["scenario_id"],  # Сортировка по ID этапа
+        )
 
-            return {"result": {"items": result, "code": 0}}
+        return {"result": {"items": result, "code": 0}}
 
-        except Exception as e:
-            logger.exception(f"Ошибка при получении сценариев: {e}")
-            return None
+    except Exception as e:
+        logger.exception(f"Ошибка при получении сценариев: {e}")
+        return None
 
 
 async def find_patient_scenarios(phone_number):
@@ -162,6 +160,8 @@ async def update_users_scenario(
                 scenario.scenarios_msg = scenarios_data
 
             await session.commit()
+            if table_name == "general":
+                await invalidate_scenarios()
 
             return {"status": "success", "message": "Сценарий успешно обновлен."}
         except Exception as e:
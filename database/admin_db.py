@@ -11,6 +11,7 @@ from database.models import (
     Appointment,
 )
 from configuration.config_db import SessionLocal
+from database.scenario_cache import invalidate_scenarios, scenario_cache
 
 
 async def get_info_patient_number_surname(info, by_what):
@@ -230,6 +231,8 @@ async def update_users_scenario(
                     scenario.scenarios_msg = scenarios_data
 
                 await session.commit()
+                if table_name == "general":
+                    await invalidate_scenarios()
 
                 return {"status": "success", "message": "Сценарий успешно обновлен."}
             except Exception as e:
@@ -241,36 +244,32 @@ async def get_all_scenarios():
     """
     Получение всех сценариев из базы данных.
     """
-    async with SessionLocal() as session:
-        async with session.begin():
-            try:
-                stmt = select(Scenario)
-                result = await session.execute(stmt)
-                scenarios = result.scalars().all()
-
-                if not scenarios:
-                    return None
+    try:
+        scenarios = await scenario_cache.get_all()
+
+        if not scenarios:
+            return None
+
+        items = sorted(
+            [
+                {
+                    "scenario_id": scenario.id,
+                    "name_stage": (
+                        scenario.scenarios_msg.get("name_stage", "Без названия")
+                        if scenario.scenarios_msg
+                        else "Без названия"
+                    ),
+                }
+                for scenario in scenarios
+            ],
+            key=lambda x: x["scenario_id"],
+        )
 
-                items = sorted(
-                    [
-                        {
-                            "scenario_id": scenario.id,
-                            "name_stage": (
-                                scenario.scenarios_msg.get("name_stage", "Без названия")
-                                if scenario.scenarios_msg
-                                else "Без названия"
-                            ),
-                        }
-                        for scenario in scenarios
-                    ],
-                    key=lambda x: x["scenario_id"],
-                )
+        return {"result": {"items": items, "code": 0}}
 
-                return {"result": {"items": items, "code": 0}}
-
-            except Exception as e:
-                logger.exception(f"Ошибка при получении сценариев: {e}")
-                return None
+    except Exception as e:
+        logger.exception(f"Ошибка при получении сценариев: {e}")
+        return None
 
 
 async def get_scenario_data(scenario_name):
@@ -345,9 +344,11 @@ async def save_edited_message(scenario_id, unique_messages):
             if not scenario or not scenario.scenarios_msg:
                 raise Exception("Сценарий не найден или не содержит данных")
 
-            scenario.scenarios_msg["messages"] = unique_messages
+            scenario.scenarios_msg = {**scenario.scenarios_msg, "messages": unique_messages}
             await session.commit()
 
+    await invalidate_scenarios()
+
 
 async def save_edited_time(scenario_id, message_id, new_time, unique_messages):
     # Находим нужное сообщение и обновляем время
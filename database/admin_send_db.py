@@ -1,5 +1,6 @@
 from sqlalchemy.future import select
-from database.models import Client, Appointment, Doctor, Scenario
+from database.models import Client, Appointment, Doctor
+from database.scenario_cache import scenario_cache
 from configuration.config_db import SessionLocal
 import logging
 
@@ -63,36 +64,33 @@ async def get_general_scenarios():
 
     :return: Словарь с результатом (список сценариев) или None в случае ошибки.
     """
-    async with SessionLocal() as session:
-        try:
-
-            scenarios_query = await session.execute(select(Scenario))
-            scenarios = scenarios_query.scalars().all()
-
-            if not scenarios:
-                return None
-
-            result = sorted(
-                [
-                    {
-                        "scenario_id": scenario.id,
-                        "name_stage": (
-                            scenario.scenarios_msg.get("name_stage", "Без названия")
-                            if scenario.scenarios_msg
-                            else "Без названия"
-                        ),
-                    }
-                    for scenario in scenarios
-                ],
-                key=lambda x: x["scenario_id"],  # Сортировка по ID этапа
-            )
-
-            return {"result": {"items": result, "code": 0}}
-
-        except Exception as e:
-            logger.exception(f"Ошибка при получении сценариев: {e}")
+    try:
+        scenarios = await scenario_cache.get_all()
+
+        if not scenarios:
             return None
 
+        result = sorted(
+            [
+                {
+                    "scenario_id": scenario.id,
+                    "name_stage": (
+                        scenario.scenarios_msg.get("name_stage", "Без названия")
+                        if scenario.scenarios_msg
+                        else "Без названия"
+                    ),
+                }
+                for scenario in scenarios
+            ],
+            key=lambda x: x["scenario_id"],  # Сортировка по ID этапа
+        )
+
+        return {"result": {"items": result, "code": 0}}
+
+    except Exception as e:
+        logger.exception(f"Ошибка при получении сценариев: {e}")
+        return None
+
 
 async def get_general_scenario_data(scenario_name):
     """
@@ -101,21 +99,19 @@ async def get_general_scenario_data(scenario_name):
     :param scenario_name: Имя этапа, по которому ищем сценарий.
     :return: Данные сценария (JSON), если найден, иначе None.
     """
-    async with SessionLocal() as session:
-        try:
-            scenarios_query = await session.execute(select(Scenario))
-            scenarios = scenarios_query.scalars().all()
+    try:
+        scenarios = await scenario_cache.get_all()
 
-            if not scenarios:
-                return None
+        if not scenarios:
+            return None
 
-            for scenario in scenarios:
-                name_stage = scenario.scenarios_msg.get("name_stage", "")
-                if name_stage == scenario_name:
-                    return scenario.scenarios_msg
+        for scenario in scenarios:
+            name_stage = scenario.scenarios_msg.get("name_stage", "")
+            if name_stage == scenario_name:
+                return scenario.scenarios_msg
 
-            return None
+        return None
 
-        except Exception as e:
-            logger.exception(f"Ошибка при получении данных сценария: {e}")
-            return None
+    except Exception as e:
+        logger.exception(f"Ошибка при получении данных сценария: {e}")
+        return None
@@ -3,11 +3,14 @@ import re
 
 from sqlalchemy.future import select
 
+from configuration.config_crm import get_book_data
 from configuration.config_db import SessionLocal
+from configuration.config_redis import get_arq_redis
 from database.constants_db import logger
 from database.constants_db import procedure_to_stage_number
-from database.models import Client, Doctor, Admin, Scenario, UserScenario, Appointment, Video
-from handlers.functions.auth_crm_fun import get_book_data, replace_content
+from database.models import Client, Doctor, Admin, UserScenario, Appointment, Video
+from database.scenario_cache import scenario_cache
+from handlers.functions.scenario_templates import placeholder_values, render_message
 
 
 async def get_client_info(tg_id):
@@ -153,17 +156,22 @@ async def set_appointments(crm_id, chat_id):
 
     :param crm_id - id пациента из crm
     :param chat_id - тг-id пациента
+    :return - True, если записи или этап пациента изменились
+    :raises CrmUnavailableError - если CRM не ответила или отключена circuit breaker'ом
     """
+    changed = False
+    failed = 0
+    # Запрос к CRM до открытия транзакции: соединение с бд не занято на время ожидания
+    scheduler_data = await get_book_data(crm_id)
+    if (
+            not scheduler_data
+            or "result" not in scheduler_data
+            or "items" not in scheduler_data["result"]
+    ):
+        return changed
+
     async with SessionLocal() as session:
         async with session.begin():
-            scheduler_data = await get_book_data(crm_id)
-            if (
-                    not scheduler_data
-                    or "result" not in scheduler_data
-                    or "items" not in scheduler_data["result"]
-            ):
-                return
-
             appointments = scheduler_data["result"]["items"]
             for appointment in appointments:
                 try:
@@ -232,6 +240,7 @@ async def set_appointments(crm_id, chat_id):
                         existing_appointment.end_time = end_time
                         existing_appointment.room_name = z_name
                         existing_appointment.processed = process
+                        appointment_id = existing_appointment.id
                     else:
                         new_appointment = Appointment(
                             client_id=client.id,
@@ -243,15 +252,43 @@ async def set_appointments(crm_id, chat_id):
                             processed=process,
                         )
                         session.add(new_appointment)
+                        await session.flush()
+                        appointment_id = new_appointment.id
 
                     client.stage = stage
+                    changed = True
                     await session.commit()
                     await set_scenario(
                         stage, chat_id, client.first_name, doctor.id, start_time
                     )
+                    if not process:
+                        await enqueue_appointment_planning(appointment_id, id_tov)
 
                 except Exception as e:
-                    print(f"Ошибка при обработке записи {appointment}: {e}")
+                    failed += 1
+                    error = e
+
+    if failed:
+        logger.warning(f"Не обработано записей пациента {crm_id}: {failed}, последняя ошибка: {error}")
+    return changed
+
+
+async def enqueue_appointment_planning(appointment_id, procedure_id):
+    """
+    Постановка планирования сценария по записи в очередь сразу после синхронизации.
+    Если постановка не удалась, запись подхватит плановая проверка новых записей.
+
+    :param appointment_id - id записи в бд
+    :param procedure_id - id процедуры (входит в id задачи, чтобы смена процедуры планировалась заново)
+    """
+    try:
+        await get_arq_redis().enqueue_job(
+            "plan_appointment",
+            appointment_id,
+            _job_id=f"plan_appointment:{appointment_id}:{procedure_id}",
+        )
+    except Exception as e:
+        logger.exception(f"Ошибка постановки планирования записи {appointment_id}: {e}")
 
 
 async def set_scenario(stage, tg_id, client_first_name, doctor_id, start_time):
@@ -276,9 +313,8 @@ async def set_scenario(stage, tg_id, client_first_name, doctor_id, start_time):
                 existing_scenario = existing_scenario_result.scalar_one_or_none()
 
                 # Получаем сценарий по stage
-                scenario_query = select(Scenario).where(Scenario.stage == stage)
-                scenario_result = await session.execute(scenario_query)
-                scenario = scenario_result.scalar_one_or_none()
+                stage_scenarios = await scenario_cache.get_by_stage(stage)
+                scenario = stage_scenarios[0] if stage_scenarios else None
 
                 if not scenario:
                     raise ValueError(f"Сценарий с stage {stage} не найден")
@@ -291,37 +327,39 @@ async def set_scenario(stage, tg_id, client_first_name, doctor_id, start_time):
                 if not doctor:
                     doctor = None
 
-                # Обновляем сообщения в сценарии
-                messages = scenario.scenarios_msg["messages"]
+                # Все видео врача для этапа загружаются одним запросом
+                videos = await get_videos_doctors(
+                    session, doctor.id_crm if doctor else None, stage
+                )
 
-                for message in messages:
-                    message_id = message.get("id")
+                # Дата и имена нормализуются один раз на запись
+                values = placeholder_values(
+                    start_time,
+                    client_first_name,
+                    doctor.first_name if doctor else "",
+                    doctor.last_name if doctor else "",
+                )
 
-                    updated_message = await replace_content(
-                        start_time,
-                        message,
-                        client_first_name,
-                        doctor.first_name if doctor else "",
-                        doctor.last_name if doctor else "",
-                    )
+                # Обновляем сообщения в сценарии
+                messages = []
+                for message in scenario.scenarios_msg["messages"]:
+                    updated_message = render_message(message, values)
 
-                    url = await get_videos_doctors(tg_id, doctor.id_crm if doctor else None, stage, message_id)
+                    url = videos.get(message.get("id"))
+                    if url is not None:
+                        updated_message["url"] = url
+                    messages.append(updated_message)
 
-                    for idx, msg in enumerate(messages):
-                        if msg["id"] == message_id:
-                            messages[idx] = updated_message
-                            if url is not None:
-                                messages[idx]["url"] = url
-                            break
+                user_scenarios = {**scenario.scenarios_msg, "messages": messages}
 
                 if existing_scenario:
                     # Обновляем существующий сценарий
-                    existing_scenario.scenarios = scenario.scenarios_msg
+                    existing_scenario.scenarios = user_scenarios
                     existing_scenario.stage_msg = stage
                 else:
                     # Создаем новый сценарий
                     user_scenario = UserScenario(
-                        scenarios=scenario.scenarios_msg, stage_msg=stage, clients_id=tg_id
+                        scenarios=user_scenarios, stage_msg=stage, clients_id=tg_id
                     )
                     session.add(user_scenario)
 
@@ -340,69 +378,45 @@ async def get_null_scenarios(stage, first_name):
     :param stage - этап пациента (0)
     :param first_name - Имя пациента
     """
-    async with SessionLocal() as session:
-        async with session.begin():
-            try:
-                query = select(Scenario).where(Scenario.stage == stage)
-                result = await session.execute(query)
-                scenario = result.scalar_one_or_none()
-
-                if not scenario:
-                    raise ValueError(f"Сценарий с stage {stage} не найден")
+    try:
+        stage_scenarios = await scenario_cache.get_by_stage(stage)
+        scenario = stage_scenarios[0] if stage_scenarios else None
 
-                # Убедимся, что scenarios_msg не пустое
-                if not scenario.scenarios_msg:
-                    raise ValueError(f"Поле scenarios_msg пусто для stage {stage}")
+        if not scenario:
+            raise ValueError(f"Сценарий с stage {stage} не найден")
 
-                messages = scenario.scenarios_msg["messages"]
+        # Убедимся, что scenarios_msg не пустое
+        if not scenario.scenarios_msg:
+            raise ValueError(f"Поле scenarios_msg пусто для stage {stage}")
 
-                # Обрабатываем каждое сообщение
-                for message in messages:
-                    message_id = message.get("id")
+        values = placeholder_values(None, first_name, None, None)
+        messages = [
+            render_message(message, values)
+            for message in scenario.scenarios_msg["messages"]
+        ]
+        return {**scenario.scenarios_msg, "messages": messages}
+    except Exception:
+        raise ValueError("Ошибка получения 0 сценария")
 
-                    # Вызываем функцию для замены содержимого
-                    updated_message = await replace_content(
-                        None, message, first_name, None, None
-                    )
-
-                    # Обновляем сообщение в списке
-                    for idx, msg in enumerate(messages):
-                        if msg["id"] == message_id:
-                            messages[idx] = updated_message
-                            break
-                return scenario.scenarios_msg
-            except Exception:
-                raise ValueError("Ошибка получения 0 сценария")
 
-
-async def get_videos_doctors(tg_client, doctor_crm_id, stage, message_id):
+async def get_videos_doctors(session, doctor_crm_id, stage):
     """
-    Полуение индивидуальных видео с врачами, для отправки их пациентам
+    Получение индивидуальных видео с врачом для всего этапа, для отправки их пациентам
 
-    :param tg_client - тг-id пациента
+    :param session - открытая сессия бд
     :param doctor_crm_id - crm id доктора
     :param stage - этап/id сценария, по которому производится поиск
-    :param message_id - номер сообщения, которым отправляется это видео
+    :return - словарь {номер сообщения: ссылка на видео}
     """
-    async with SessionLocal() as session:
-        async with session.begin():
-            client_query = select(Client).where(Client.tg_id == tg_client)
-            client_result = await session.execute(client_query)
-            client = client_result.scalars().first()
-
-            if not client:
-                logger.exception(f"Клиент с тг-id не найден: {tg_client}")
-                return None
-
-            id_video = f"{stage}.{message_id}.{doctor_crm_id}"
+    if doctor_crm_id is None:
+        return {}
 
-            video_query = select(Video).where(Video.for_scenarios == id_video)
-            video_result = await session.execute(video_query)
-            video = video_result.scalars().first()
-
-            if not video:
-                logger.exception(f"Видео с id не было найдено: {id_video}")
-                return None
+    video_query = select(Video.message_id, Video.video_link).where(
+        Video.stage == stage, Video.doctor_crm_id == doctor_crm_id
+    )
+    video_result = await session.execute(video_query)
+    videos = {message_id: video_link for message_id, video_link in video_result.all()}
 
-            url_video = video.video_link
-            return url_video
+    if not videos:
+        logger.warning(f"Видео врача {doctor_crm_id} для этапа {stage} не найдены")
+    return videos
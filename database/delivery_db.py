@@ -0,0 +1,202 @@
+from datetime import datetime
+
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+
+from configuration.config_db import SessionLocal
+from configuration.config_redis import get_redis_client
+from database.constants_db import logger
+from database.models import Client, FailedDelivery
+
+# Множество tg_id неактивных пациентов, чтобы не ходить в бд на каждое обновление
+INACTIVE_CLIENTS_KEY = "clients:inactive"
+# Служебный элемент множества: его нет, только если множество не собрано из бд
+# или потеряно при перезапуске Redis
+INACTIVE_CLIENTS_LOADED = 0
+# Сколько недоставленных сообщений за раз читается из бд при повторной отправке
+REPLAY_BATCH = 100
+
+
+async def save_failed_delivery(
+        telegram_id, message_id, content, url, message_type, id_survey, error, attempts
+):
+    """
+    Сохранение сообщения, которое не удалось доставить, для повторной отправки админом.
+
+    :param telegram_id - тг-id пациента
+    :param message_id - id сообщения в сценарии
+    :param error - текст ошибки Telegram
+    :param attempts - число сделанных попыток
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                session.add(
+                    FailedDelivery(
+                        telegram_id=telegram_id,
+                        message_id=message_id,
+                        content=content,
+                        url=url,
+                        message_type=message_type,
+                        id_survey=id_survey,
+                        error=error,
+                        attempts=attempts,
+                        created_at=datetime.now(),
+                    )
+                )
+                logger.warning(
+                    f"Сообщение {message_id} для {telegram_id} не доставлено: {error}"
+                )
+            except Exception as e:
+                logger.exception(f"Ошибка при сохранении недоставленного сообщения: {e}")
+
+
+async def get_failed_deliveries(limit=20):
+    """
+    Недоставленные сообщения, которые еще не отправлялись повторно.
+
+    :param limit - максимальное число сообщений в выборке
+    :return - (общее количество, список последних сообщений)
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                pending = FailedDelivery.replayed_at.is_(None)
+                total = await session.scalar(
+                    select(func.count(FailedDelivery.id)).where(pending)
+                )
+                result = await session.execute(
+                    select(FailedDelivery)
+                    .where(pending)
+                    .order_by(FailedDelivery.id.desc())
+                    .limit(limit)
+                )
+                return total, result.scalars().all()
+
+            except Exception as e:
+                logger.exception(f"Ошибка при получении недоставленных сообщений: {e}")
+                return 0, []
+
+
+async def get_failed_deliveries_for_replay(after_id=0, limit=REPLAY_BATCH):
+    """
+    Очередная пачка недоставленных сообщений для повторной отправки.
+
+    :param after_id - id последнего сообщения предыдущей пачки
+    :param limit - размер пачки
+    :return - список сообщений в виде словарей: id и аргументы send_scenario_message
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                result = await session.execute(
+                    select(
+                        FailedDelivery.id,
+                        FailedDelivery.telegram_id,
+                        FailedDelivery.message_id,
+                        FailedDelivery.content,
+                        FailedDelivery.url,
+                        FailedDelivery.message_type,
+                        FailedDelivery.id_survey,
+                    )
+                    .where(FailedDelivery.replayed_at.is_(None), FailedDelivery.id > after_id)
+                    .order_by(FailedDelivery.id)
+                    .limit(limit)
+                )
+                return [dict(row) for row in result.mappings().all()]
+
+            except Exception as e:
+                logger.exception(f"Ошибка при получении сообщений для повторной отправки: {e}")
+                return []
+
+
+async def mark_failed_deliveries_replayed(delivery_ids):
+    """
+    Отметка сообщений, поставленных в очередь повторно: из /failed они пропадают.
+
+    :param delivery_ids - id строк failed_deliveries
+    """
+    if not delivery_ids:
+        return
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                await session.execute(
+                    update(FailedDelivery)
+                    .where(FailedDelivery.id.in_(delivery_ids), FailedDelivery.replayed_at.is_(None))
+                    .values(replayed_at=datetime.now())
+                    .execution_options(synchronize_session=False)
+                )
+            except Exception as e:
+                logger.exception(f"Ошибка при отметке повторно отправленных сообщений: {e}")
+
+
+async def set_client_active(tg_id, active):
+    """
+    Отметка пациента активным или неактивным (заблокировал бота, чат не найден).
+
+    :param tg_id - тг-id пациента
+    :param active - новое значение флага
+    :return - True, если флаг изменился
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                result = await session.execute(
+                    update(Client)
+                    .where(Client.tg_id == tg_id, Client.is_active != active)
+                    .values(is_active=active)
+                    .execution_options(synchronize_session=False)
+                )
+                changed = result.rowcount > 0
+            except Exception as e:
+                logger.exception(f"Ошибка при обновлении активности пациента {tg_id}: {e}")
+                return False
+
+    try:
+        redis = get_redis_client()
+        if active:
+            await redis.srem(INACTIVE_CLIENTS_KEY, tg_id)
+        else:
+            await redis.sadd(INACTIVE_CLIENTS_KEY, tg_id)
+    except Exception as e:
+        logger.exception(f"Ошибка при обновлении списка неактивных пациентов: {e}")
+
+    if changed:
+        logger.info(f"Пациент {tg_id} {'снова активен' if active else 'недоступен'}")
+    return changed
+
+
+async def load_inactive_clients():
+    """
+    Сборка множества неактивных пациентов из clients.is_active.
+
+    :return - множество tg_id неактивных пациентов
+    """
+    async with SessionLocal() as session:
+        result = await session.execute(select(Client.tg_id).where(Client.is_active.is_(False)))
+        inactive = set(result.scalars().all())
+
+    async with get_redis_client().pipeline(transaction=True) as pipe:
+        pipe.delete(INACTIVE_CLIENTS_KEY)
+        pipe.sadd(INACTIVE_CLIENTS_KEY, INACTIVE_CLIENTS_LOADED, *inactive)
+        await pipe.execute()
+    logger.info(f"Список неактивных пациентов загружен из бд: {len(inactive)}")
+    return inactive
+
+
+async def is_client_inactive(tg_id):
+    """
+    Проверка, что пациент отмечен недоступным. Если множества в Redis нет,
+    оно собирается из бд. При ошибке считаем пациента активным.
+    """
+    try:
+        inactive, loaded = await get_redis_client().smismember(
+            INACTIVE_CLIENTS_KEY, [tg_id, INACTIVE_CLIENTS_LOADED]
+        )
+        if loaded:
+            return bool(inactive)
+        return tg_id in await load_inactive_clients()
+    except Exception as e:
+        logger.exception(f"Ошибка при проверке активности пациента {tg_id}: {e}")
+        return False
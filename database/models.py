@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import (
+    text,
     BigInteger,
     Integer,
     ForeignKey,
@@ -8,6 +9,7 @@ from sqlalchemy import (
     Boolean,
     Text,
     JSON,
+    Index,
 )
 
 from configuration.config_db import Base
@@ -37,6 +39,8 @@ class Appointment(Base):
     end_time: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
     room_name: Mapped[str] = mapped_column(String(100), nullable=False)
     processed: Mapped[bool] = mapped_column(Boolean, nullable=True, default=False)
+    # Время, когда воркер взял запись в планирование
+    claimed_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
 
     client: Mapped["Client"] = relationship("Client", back_populates="appointments")
     doctor: Mapped["Doctor"] = relationship("Doctor", back_populates="appointments")
@@ -44,6 +48,14 @@ class Appointment(Base):
         "Procedure", back_populates="appointments"
     )
 
+    __table_args__ = (
+        Index(
+            "ix_appointments_unprocessed",
+            "id",
+            postgresql_where=text("processed = false"),
+        ),
+    )
+
 
 class Client(Base):
     __tablename__ = "clients"
@@ -58,6 +70,14 @@ class Client(Base):
     id_crm: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     survey_result: Mapped[str | None] = mapped_column(Text, nullable=True)
     surveys_answers: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Время, когда воркер взял клиента в синхронизацию с CRM
+    synced_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    # Время следующей синхронизации, зависит от близости записи (scheduler/sync_policy.py)
+    next_sync_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    # False, если пациент заблокировал бота или чат недоступен
+    is_active: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=True, server_default=text("true")
+    )
 
     # Связи
     appointments: Mapped[list["Appointment"]] = relationship(
@@ -114,6 +134,23 @@ class PatientQuestion(Base):
     )
 
 
+class FailedDelivery(Base):
+    __tablename__ = "failed_deliveries"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    content: Mapped[str | None] = mapped_column(Text, nullable=True)
+    url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    message_type: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    id_survey: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    # Время повторной постановки в очередь админом
+    replayed_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+
+
 class Procedure(Base):
     __tablename__ = "procedures"
 
@@ -175,3 +212,9 @@ class Video(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     video_link: Mapped[str] = mapped_column(Text, nullable=False)
     for_scenarios: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Структурированный ключ вместо строки "stage.message.doctor"
+    stage: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    doctor_crm_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    __table_args__ = (Index("ix_video_stage_doctor", "stage", "doctor_crm_id"),)
@@ -0,0 +1,126 @@
+import asyncio
+import uuid
+from typing import NamedTuple
+
+from sqlalchemy.future import select
+
+from configuration.config_db import SessionLocal
+from configuration.config_redis import get_redis_client
+from database.constants_db import logger
+from database.models import Scenario
+
+# Канал, через который бот и воркер сообщают друг другу об изменении сценариев
+INVALIDATION_CHANNEL = "scenarios:invalidate"
+RECONNECT_DELAY = 5
+
+
+class CachedScenario(NamedTuple):
+    id: int
+    stage: int
+    procedure_id: int | None
+    scenarios_msg: dict | None
+
+
+class ScenarioCache:
+    """
+    Кэш общих сценариев в памяти процесса.
+
+    Сценарии меняются только админом, поэтому таблица загружается целиком
+    одним запросом и хранится до инвалидации. Данные кэша нельзя изменять
+    на месте: сообщения рендерятся в новые словари.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._by_id = None
+        self._by_stage = None
+        self._lock = asyncio.Lock()
+
+    async def _snapshot(self):
+        by_id, by_stage = self._by_id, self._by_stage
+        if by_id is not None:
+            return by_id, by_stage
+
+        async with self._lock:
+            if self._by_id is not None:
+                return self._by_id, self._by_stage
+
+            version = self.version
+            async with SessionLocal() as session:
+                result = await session.execute(select(Scenario).order_by(Scenario.id))
+                scenarios = [
+                    CachedScenario(
+                        id=scenario.id,
+                        stage=scenario.stage,
+                        procedure_id=scenario.procedure_id,
+                        scenarios_msg=scenario.scenarios_msg,
+                    )
+                    for scenario in result.scalars().all()
+                ]
+
+            by_id = {scenario.id: scenario for scenario in scenarios}
+            by_stage = {}
+            for scenario in scenarios:
+                by_stage.setdefault(scenario.stage, []).append(scenario)
+
+            # Если во время загрузки пришла инвалидация, результат не сохраняем
+            if version == self.version:
+                self._by_id, self._by_stage = by_id, by_stage
+                logger.info(f"Кэш сценариев загружен, версия {version}")
+            return by_id, by_stage
+
+    async def get_all(self):
+        by_id, _ = await self._snapshot()
+        return list(by_id.values())
+
+    async def get_by_id(self, scenario_id):
+        by_id, _ = await self._snapshot()
+        return by_id.get(scenario_id)
+
+    async def get_by_stage(self, stage):
+        _, by_stage = await self._snapshot()
+        return by_stage.get(stage, [])
+
+    def invalidate(self):
+        self.version += 1
+        self._by_id = None
+        self._by_stage = None
+
+
+scenario_cache = ScenarioCache()
+# pid не подходит: в контейнерах бот и воркер оба могут иметь pid 1
+process_marker = uuid.uuid4().hex
+
+
+async def invalidate_scenarios():
+    """
+    Сброс кэша сценариев в текущем процессе и уведомление остальных процессов.
+    """
+    scenario_cache.invalidate()
+    try:
+        await get_redis_client().publish(INVALIDATION_CHANNEL, process_marker)
+    except Exception as e:
+        logger.exception(f"Ошибка при отправке инвалидации кэша сценариев: {e}")
+
+
+async def listen_for_invalidation():
+    """
+    Подписка на изменения сценариев из других процессов (бот и воркер).
+    """
+    while True:
+        try:
+            async with get_redis_client().pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # После переподключения могли пропустить уведомления
+                scenario_cache.invalidate()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["data"].decode() != process_marker:
+                        scenario_cache.invalidate()
+                        logger.info("Кэш сценариев сброшен по уведомлению")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Ошибка подписки на изменения сценариев: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
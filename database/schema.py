@@ -0,0 +1,158 @@
+import hashlib
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database.constants_db import logger
+
+# create_all не добавляет колонки в уже существующие таблицы, поэтому
+# изменения схемы описываются идемпотентными DDL-запросами
+SCHEMA_UPGRADES = [
+    "ALTER TABLE video ADD COLUMN IF NOT EXISTS stage BIGINT",
+    "ALTER TABLE video ADD COLUMN IF NOT EXISTS message_id INTEGER",
+    "ALTER TABLE video ADD COLUMN IF NOT EXISTS doctor_crm_id BIGINT",
+    "CREATE INDEX IF NOT EXISTS ix_video_stage_doctor ON video (stage, doctor_crm_id)",
+    # Видео добавляются в таблицу вне бота с одним ключом for_scenarios вида
+    # "stage.message.doctor", поэтому колонки заполняет триггер при каждой записи
+    r"""
+    CREATE OR REPLACE FUNCTION video_split_for_scenarios() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.for_scenarios ~ '^\d+\.\d+\.\d+$' THEN
+            NEW.stage := split_part(NEW.for_scenarios, '.', 1)::bigint;
+            NEW.message_id := split_part(NEW.for_scenarios, '.', 2)::integer;
+            NEW.doctor_crm_id := split_part(NEW.for_scenarios, '.', 3)::bigint;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER video_split_for_scenarios
+    BEFORE INSERT OR UPDATE OF for_scenarios ON video
+    FOR EACH ROW EXECUTE FUNCTION video_split_for_scenarios()
+    """,
+    "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS synced_at TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_unprocessed ON appointments (id) WHERE processed = false",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS next_sync_at TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_clients_next_sync_at ON clients (next_sync_at)",
+    # Первую синхронизацию существующих клиентов распределяем по часу,
+    # чтобы после обновления не опросить CRM по всем клиентам разом
+    """
+    UPDATE clients
+    SET next_sync_at = now()::timestamp + (abs(hashtext(tg_id::text)) % 3600) * interval '1 second'
+    WHERE next_sync_at IS NULL
+    """,
+]
+
+# Дозаполнение данных выполняется при каждом запуске, а не только при смене схемы:
+# строки без заполненных колонок могут появиться и между обновлениями, например
+# при восстановлении из дампа или записи в обход бота. Запросы затрагивают
+# только незаполненные строки, поэтому на актуальной базе ничего не меняют
+DATA_BACKFILLS = [
+    # Видео с ключом for_scenarios, записанные при отключенном триггере
+    # (pg_restore с session_replication_role = replica) или до его появления
+    r"""
+    UPDATE video
+    SET stage = split_part(for_scenarios, '.', 1)::bigint,
+        message_id = split_part(for_scenarios, '.', 2)::integer,
+        doctor_crm_id = split_part(for_scenarios, '.', 3)::bigint
+    WHERE stage IS NULL AND for_scenarios ~ '^\d+\.\d+\.\d+$'
+    """,
+]
+
+
+async def upgrade_schema(conn):
+    """
+    Применение изменений схемы к существующей базе данных.
+
+    :param conn: Асинхронное соединение SQLAlchemy (внутри транзакции).
+    """
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
+    logger.info("Схема базы данных обновлена")
+
+
+async def backfill_data(conn):
+    """
+    Дозаполнение колонок, которые не заполнились при записи строк.
+
+    :param conn: Асинхронное соединение SQLAlchemy (внутри транзакции).
+    """
+    for statement in DATA_BACKFILLS:
+        result = await conn.execute(text(statement))
+        if result.rowcount:
+            logger.info(f"Дозаполнено строк: {result.rowcount}")
+
+
+# Отпечаток схемы, с которой последний раз запускались create_all и SCHEMA_UPGRADES
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+# Ключ advisory lock, чтобы одновременно запущенные процессы не применяли DDL параллельно
+SCHEMA_LOCK_KEY = 4_810_217
+
+
+def schema_fingerprint(metadata):
+    """
+    Отпечаток схемы: DDL всех таблиц и индексов моделей и список SCHEMA_UPGRADES.
+    Меняется при любом изменении моделей или добавлении запроса в SCHEMA_UPGRADES.
+    """
+    dialect = postgresql.dialect()
+    parts = []
+    for table in metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: str(index.name)):
+            parts.append(str(CreateIndex(index).compile(dialect=dialect)))
+    parts.extend(SCHEMA_UPGRADES)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+async def stored_schema_version(conn):
+    exists = await conn.scalar(text("SELECT to_regclass('schema_version') IS NOT NULL"))
+    if not exists:
+        return None
+    return await conn.scalar(text("SELECT version FROM schema_version WHERE id = 1"))
+
+
+async def ensure_schema(conn, metadata):
+    """
+    Создание таблиц и применение SCHEMA_UPGRADES, только если схема в базе
+    не совпадает с текущими моделями. Иначе запуск обходится без DDL и чтения
+    каталога. DATA_BACKFILLS выполняются в обоих случаях.
+
+    :param conn: Асинхронное соединение SQLAlchemy (внутри транзакции).
+    :param metadata: Base.metadata с зарегистрированными моделями.
+    :return: True, если схема обновлялась.
+    """
+    version = schema_fingerprint(metadata)
+    if await stored_schema_version(conn) == version:
+        logger.info(f"Схема базы данных актуальна ({version}), DDL пропущен")
+        await backfill_data(conn)
+        return False
+
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    # Пока ждали блокировку, схему мог обновить другой процесс
+    if await stored_schema_version(conn) == version:
+        await backfill_data(conn)
+        return False
+
+    await conn.run_sync(metadata.create_all)
+    await upgrade_schema(conn)
+    await backfill_data(conn)
+    await conn.execute(text(SCHEMA_VERSION_DDL))
+    await conn.execute(
+        text(
+            "INSERT INTO schema_version (id, version, applied_at) VALUES (1, :version, now()) "
+            "ON CONFLICT (id) DO UPDATE SET version = excluded.version, applied_at = excluded.applied_at"
+        ),
+        {"version": version},
+    )
+    logger.info(f"Схема базы данных обновлена до версии {version}")
+    return True
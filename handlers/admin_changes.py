@@ -1,5 +1,3 @@
-import re
-
 from aiogram import Router, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
@@ -171,8 +169,7 @@ async def hangle_input_content(message: Message, state: FSMContext):
     type = data.get("type")
     url = data.get("url")
     time = message.text
-    time_pattern = r"^[+-]?\d+(\s\d{1,2}:\d{2})?$"
-    if re.match(time_pattern, time):
+    if hf.edit_time(time or ""):
         await message.answer(
             f"Ваше сообщение будет содержать следующий контент:"
         )
@@ -506,8 +503,7 @@ async def hangle_input_content(message: Message, state: FSMContext):
     type = data.get("type")
     url = data.get("url")
     time = message.text
-    time_pattern = r"^[+-]?\d+(\s\d{1,2}:\d{2})?$"
-    if re.match(time_pattern, time):
+    if hf.edit_time(time or ""):
         await message.answer(
             f"Ваше сообщение будет содержать следующий контент:"
         )
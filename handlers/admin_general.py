@@ -1,16 +1,26 @@
+import asyncio
+
 from aiogram import Router, F
-from aiogram.filters import StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 
 import handlers.functions.admins_fun as hf
 import keyboards.admin_kb as kb
 import keyboards.constants as kc
+from configuration.db_instrumentation import slow_query_summary
+from configuration.metrics import perf_summary
+from configuration.profiler import MAX_PROFILE_SECONDS, profile_session
 from database.admin_db import (
     find_all_doctors,
     find_all_patients,
     logger,
 )
+from database.delivery_db import (
+    get_failed_deliveries,
+    get_failed_deliveries_for_replay,
+    mark_failed_deliveries_replayed,
+)
 from states.states_admin import (
     AdminStates_global,
     AdminStates_find,
@@ -21,6 +31,8 @@ global all_doctors, prompt_message, all_patients
 all_doctors = None
 all_patients = None
 choice_action = "Выберите нужное действие"
+# Ссылки на фоновые сессии профилирования, чтобы задачи не собрал сборщик мусора
+profile_tasks = set()
 
 
 async def start_admin(message: Message, state: FSMContext):
@@ -198,3 +210,105 @@ async def information_by_last_name(message: Message, state: FSMContext):
 async def information_by_phone(message: Message, state: FSMContext):
     information = message.text
     await hf.find_information(message, state, information, "phone_number")
+
+
+@admin_router.message(AdminStates_global.menu, Command("failed"))
+async def show_failed_deliveries(message: Message):
+    """Список последних сообщений, которые не удалось доставить пациентам."""
+    total, deliveries = await get_failed_deliveries()
+    if not total:
+        await message.answer("Недоставленных сообщений нет.")
+        return
+
+    lines = [
+        f"{delivery.created_at:%d.%m %H:%M} | {delivery.telegram_id} | "
+        f"сообщение {delivery.message_id} | {(delivery.error or '')[:100]}"
+        for delivery in deliveries
+    ]
+    await message.answer(
+        f"Недоставленных сообщений: {total}\n\n"
+        + "\n".join(lines)
+        + "\n\nОтправить все повторно: /replay_failed"
+    )
+
+
+@admin_router.message(AdminStates_global.menu, Command("replay_failed"))
+async def replay_failed_deliveries(message: Message, arqredis):
+    """
+    Повторная постановка недоставленных сообщений в очередь отправки.
+
+    Сообщение отмечается повторно отправленным только после постановки в очередь,
+    а id задачи привязан к строке failed_deliveries: повторный /replay_failed
+    после сбоя не отправит пациенту дубль.
+    """
+    replayed = 0
+    after_id = 0
+    try:
+        while deliveries := await get_failed_deliveries_for_replay(after_id):
+            enqueued = []
+            try:
+                for delivery in deliveries:
+                    delivery_id = delivery.pop("id")
+                    await arqredis.enqueue_job(
+                        "send_scenario_message", _job_id=f"replay:{delivery_id}", **delivery
+                    )
+                    enqueued.append(delivery_id)
+            finally:
+                await mark_failed_deliveries_replayed(enqueued)
+                replayed += len(enqueued)
+            after_id = enqueued[-1]
+    except Exception as e:
+        logger.exception(f"Ошибка при повторной постановке сообщений в очередь: {e}")
+        await message.answer(
+            f"Повторно поставлено в очередь: {replayed}. "
+            "Остальные не отправлены из-за ошибки, они остались в /failed."
+        )
+        return
+
+    logger.info(f"Админ {message.chat.id} повторно отправил {replayed} сообщений")
+    await message.answer(f"Повторно поставлено в очередь: {replayed}")
+
+
+@admin_router.message(AdminStates_global.menu, Command("slow_queries"))
+async def show_slow_queries(message: Message):
+    """Запросы к бд с наибольшим суммарным временем в процессе бота."""
+    await message.answer(slow_query_summary()[:4096])
+
+
+@admin_router.message(AdminStates_global.menu, Command("perf"))
+async def show_perf(message: Message):
+    """p50/p95 времени обработчиков и запросов к Telegram в процессе бота."""
+    await message.answer(perf_summary()[:4096])
+
+
+async def send_profile_report(message: Message, seconds: int, percent: float):
+    report = await profile_session(seconds, percent, "bot")
+    await message.answer(f"Бот.\n{report}"[:4096])
+
+
+@admin_router.message(AdminStates_global.menu, Command("profile"))
+async def start_profiling(message: Message, command: CommandObject, arqredis):
+    """
+    Профилирование бота и воркера: /profile [секунды] [процент обновлений и задач].
+    Отчеты о самых затратных функциях приходят в этот чат по окончании.
+    """
+    args = (command.args or "").split()
+    try:
+        seconds = int(args[0]) if args else 30
+        percent = float(args[1]) if len(args) > 1 else 10
+    except ValueError:
+        await message.answer("Формат: /profile 30 10 - 30 секунд, 10% обновлений и задач")
+        return
+    # Сравнения с nan ложны, поэтому nan и inf в проценте тоже отклоняются
+    if not 1 <= seconds <= MAX_PROFILE_SECONDS or not 0 <= percent <= 100:
+        await message.answer(
+            f"Длительность - от 1 до {MAX_PROFILE_SECONDS} секунд, процент - от 0 до 100."
+        )
+        return
+
+    task = asyncio.create_task(send_profile_report(message, seconds, percent))
+    profile_tasks.add(task)
+    task.add_done_callback(profile_tasks.discard)
+    await arqredis.enqueue_job("profile_worker", seconds, percent, message.chat.id)
+    logger.info(f"Админ {message.chat.id} запустил профилирование на {seconds} с, {percent}%")
+    await message.answer(f"Профилирование запущено на {seconds} с для {percent}% обновлений и задач.")
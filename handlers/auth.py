@@ -8,6 +8,7 @@ from aiogram.types import ContentType, Message, CallbackQuery
 import logging
 
 from configuration.config_bot import bot
+from configuration.config_crm import CrmUnavailableError
 from handlers.doctor import handle_auth_doctor
 from handlers.functions.auth_crm_fun import (
     get_user_data,
@@ -151,6 +152,13 @@ async def process_contact(message: Message, state: FSMContext):
                     "который привязан к учетной записи в формате +7XXXXXXXXXX."
                 )
                 await state.set_state(AuthStates.waiting_for_manual_phone)
+    except CrmUnavailableError as e:
+        logger.error(f"CRM недоступна в process_contact: {e}")
+        await processing_msg.delete()
+        await message.answer(
+            "Сервис временно недоступен. Пожалуйста, повторите попытку через несколько минут, "
+            "отправив /start."
+        )
     except Exception as e:
         logger.error(f"Ошибка в process_contact: {e}")
         await processing_msg.delete()
@@ -8,15 +8,17 @@ from sqlalchemy.future import select
 from database.admin_send_db import get_general_scenarios
 from database.admin_send_db import find_id_doctor
 from database.db_helpers import get_url
+from database.delivery_db import set_client_active
 from database.models import Client
-from database.auth_db import replace_content
+from handlers.functions.scenario_templates import placeholder_values, render_message
 
 from database.constants_db import stage_number_to_name
 from aiogram.fsm.storage.base import StorageKey
 
 from handlers.admin_general import back_to
 from handlers.functions.admins_fun import format_scenarios
-from handlers.patient import switch_survey
+from handlers.functions.survey_start import switch_survey
+from scheduler.delivery import is_unreachable
 from scheduler.sched_tasks import split_message_to_two_parts
 
 from states.states_admin import SendScenarioStates
@@ -24,7 +26,7 @@ from states.states_admin import SendScenarioStates
 import logging
 
 
-from configuration.config_bot import dp
+from configuration.config_redis import get_fsm_storage
 
 import re
 from aiogram.types import Message
@@ -66,10 +68,8 @@ async def send_message_list(message: Message, state: FSMContext):
         await message.answer("В данном сценарии нет сообщений.")
         return
 
-    updated_messages = []
-    for msg in messages:
-        updated_message = await replace_content(None, msg, first_name, None, last_name)
-        updated_messages.append(updated_message)
+    values = placeholder_values(None, first_name, None, last_name)
+    updated_messages = [render_message(msg, values) for msg in messages]
 
     await format_scenarios(message.chat.id, "", [{"messages": updated_messages}])
 
@@ -119,6 +119,14 @@ async def process_phone_number(message: Message, state: FSMContext):
                 )
                 return
 
+            if not client.is_active:
+                await message.answer(
+                    "Пациент заблокировал бота или удалил чат, сообщение не будет доставлено. "
+                    "Отправка станет доступна, когда пациент снова напишет боту.",
+                    reply_markup=kb.back_to_messages_kb(),
+                )
+                return
+
             tg_id = client.tg_id
             stage = client.stage or "Неизвестен"
             name_stage = stage_number_to_name.get(stage, "Неизвестен")
@@ -249,10 +257,10 @@ async def process_message_number(message: Message, state: FSMContext, id):
             case "survey":
                 id_survey = message_to_send.get("id_survey")
                 state_with = FSMContext(
-                    storage=dp.storage,
+                    storage=get_fsm_storage(),
                     key=StorageKey(chat_id=tg_id, user_id=tg_id, bot_id=bot.id),
                 )
-                await switch_survey(state_with, tg_id, id_survey)
+                await switch_survey(bot, state_with, tg_id, id_survey)
             case _:
                 await message.answer(
                     "Неизвестный тип сообщения. Пожалуйста, выберите правильное сообщение."
@@ -265,6 +273,14 @@ async def process_message_number(message: Message, state: FSMContext, id):
         await state.set_state(SendScenarioStates.waiting_for_more_messages)
 
     except Exception as e:
+        if is_unreachable(e):
+            await set_client_active(tg_id, False)
+            await message.answer(
+                "Пациент заблокировал бота или удалил чат, сообщение не доставлено.",
+                reply_markup=kb.back_to_messages_kb(),
+            )
+            return
+
         logger.exception(f"Ошибка при отправке сообщения: {e}")
         await message.answer(
             "Произошла ошибка при отправке сообщения. Попробуйте отправить другое сообщение.",
@@ -1,5 +1,4 @@
 import logging
-import re
 from typing import Optional, List
 
 from aiogram.types import (
@@ -20,6 +19,11 @@ from configuration.config_bot import bot
 from database.admin_changes import get_scenario_data, update_users_scenario
 from database.admin_db import get_info_patient_number_surname
 from database.constants_db import stage_number_to_name
+from scheduler.time_expressions import (
+    admin_time_to_expression,
+    compile_time_expression,
+    offset_to_dict,
+)
 from states.states_admin import (
     AdminStates_global,
     AdminStates_find,
@@ -96,39 +100,17 @@ async def format_message(chat_id, index, message):
 
 def parse_time(time_str):
     """
-    Парсит время из строки в формат времени в секундах.
-    Возможные форматы:
+    Ключ сортировки сообщений сценария по времени отправки, в секундах.
+    Возможные форматы (в часах относительно процедуры):
     - "+/-24" — относительное время в часах от события.
     - "+/-24 10:00" — смещение в часах и точное время.
-    - "0 10:00" — точное время в формате день и часы:минуты.
-    - "0" — отправляется в день события (считается временем события).
+    - "0 10:00" — точное время в день события.
+    - "0" — отправляется сразу (считается временем события).
     """
-
-    match = re.match(r"([+-]?\d+)(?:\s+(\d{1,2}):(\d{2}))?", time_str)
-    if match:
-        day_offset = int(match.group(1))  # Смещение дней
-        hours = (
-            int(match.group(2)) if match.group(2) else 0
-        )  # Если часы не указаны, установить 0
-        minutes = (
-            int(match.group(3)) if match.group(3) else 0
-        )  # Если минуты не указаны, установить 0
-
-        return day_offset * 86400 + hours * 3600 + minutes * 60
-
-    elif time_str.startswith("+") or time_str.startswith("-"):
-        try:
-            return int(time_str) * 3600
-        except ValueError:
-            raise ValueError(f"Ошибка в формате времени: {time_str}")
-
-    elif " " in time_str:
-        day, clock_time = time_str.split()
-        day_offset = int(day)
-        hours, minutes = map(int, clock_time.split(":"))
-        return day_offset * 86400 + hours * 3600 + minutes * 60
-
-    return 0
+    try:
+        return compile_time_expression(time_str).sort_key
+    except ValueError:
+        return 0
 
 
 async def format_scenarios(chat_id, current_part, scenarios, max_message_length=4096):
@@ -266,10 +248,13 @@ async def edditing_content(
         valid = True
         return valid
     elif choice == kc.buttons_time_or_msg["time"]:
-        # Регулярное выражение для проверки формата времени
-        time_pattern = r"([+-]?\d+)(?:\s+(\d{1,2}):(\d{2}))?"
+        try:
+            admin_time_to_expression(edditing_text)
+            time_is_valid = True
+        except ValueError:
+            time_is_valid = False
 
-        if re.match(time_pattern, edditing_text):
+        if time_is_valid:
             await message.answer(
                 f"Изменяю время отправки на следующее: {edditing_text}"
             )
@@ -348,27 +333,11 @@ def edit_time(editing_text):
     """
     Приведение времени к корректному формату времени
     """
-    # Разделяем введённое время на две части
-    time_parts = editing_text.split()
     try:
-        # Сохраняем знак и преобразуем значение с учетом знака
-        first_time = time_parts[0]
-        if first_time[0] in ["+", "-"]:
-            sign = first_time[0]
-            number_part = int(first_time[1:]) * 24
-            first_time = f"{sign}{number_part}"
-        else:
-            first_time = str(int(first_time) * 24)
-
-        second_time = time_parts[1] if len(time_parts) > 1 else ""
-        if first_time == "0" or second_time == "":
-            full_time = f"{first_time}"
-        else:
-            full_time = f"{first_time} {second_time}"
-        return full_time
-    except (ValueError, IndexError):
+        return admin_time_to_expression(editing_text)
+    except ValueError:
         logger.error(f"Ошибка в формате времени")
-        return {"status": "error", "message": "Invalid time format"}
+        return None
 
 
 async def changin_scenario_in_bd(scenarios, number, editing_text, by_what, table_name):
@@ -408,9 +377,10 @@ async def changin_scenario_in_bd(scenarios, number, editing_text, by_what, table
             elif by_what == kc.buttons_time_or_msg["time"]:
                 edit_message = edit_time(editing_text.text)
                 if not edit_message:
-                    return edit_message
+                    return {"status": "error", "message": "Invalid time format"}
                 else:
                     message["time"] = edit_message
+                    message["offset"] = offset_to_dict(edit_message)
 
             scenario["messages"].sort(key=lambda msg: parse_time(msg["time"]))
 
@@ -461,11 +431,16 @@ async def add_message_to_scenario(
     for scenario in scenarios["result"]["items"]:
         if scenario["scenario_id"] == scenario_id:
 
+            new_time = edit_time(time)
+            if not new_time:
+                return {"status": "error", "message": "Invalid time format"}
+
             # Формируем новое сообщение
             new_message = {
                 "id": None,
                 "content": edit_content,
-                "time": edit_time(time),
+                "time": new_time,
+                "offset": offset_to_dict(new_time),
                 "type": type,
             }
             if url:
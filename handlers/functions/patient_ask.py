@@ -1,6 +1,5 @@
 import re
 import logging
-import os
 from aiogram import types
 from aiogram.fsm.context import FSMContext
 import html
@@ -11,12 +10,11 @@ from database.questions_db import (
     get_patient_name_by_tg_id,
 )
 from configuration.config_db import SessionLocal
-from dotenv import load_dotenv
+from configuration.settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 
-load_dotenv()
 logger = logging.getLogger(__name__)
-support_group_id = os.getenv("SUPPORT_GROUP_ID")
+support_group_id = settings.support_group_id
 
 
 def markdown_escape(text: str) -> str:
@@ -0,0 +1,109 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+PLACEHOLDER_PATTERN = re.compile(
+    r"\{(first_name|first_name_doctor|last_name_doctor|start_time)\}"
+)
+
+START_TIME_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+)
+
+
+@lru_cache(maxsize=4096)
+def compile_template(text):
+    """
+    Разбор текста сценария на литералы и слоты для подстановки.
+
+    :param text: Текст сообщения с флагами в {}.
+    :return: Кортеж, где на четных позициях литералы, на нечетных - имена флагов.
+    """
+    return tuple(PLACEHOLDER_PATTERN.split(text))
+
+
+def render_template(parts, values):
+    """
+    Подстановка значений в скомпилированный шаблон за один проход.
+
+    Флаги, для которых нет значения, остаются в тексте как есть.
+
+    :param parts: Результат compile_template.
+    :param values: Словарь {имя флага: значение}.
+    :return: Готовый текст.
+    """
+    if len(parts) == 1:
+        return parts[0]
+
+    rendered = []
+    for index, part in enumerate(parts):
+        if index % 2:
+            value = values.get(part)
+            rendered.append(value if value is not None else f"{{{part}}}")
+        else:
+            rendered.append(part)
+    return "".join(rendered)
+
+
+def format_start_time(start_time):
+    """
+    Приведение времени начала процедуры к виду "дд.мм в чч:мм".
+
+    :param start_time: datetime или строка в одном из START_TIME_FORMATS.
+    :return: Отформатированная строка или None, если время не распознано.
+    """
+    if start_time is None:
+        return None
+
+    if isinstance(start_time, datetime):
+        start_time_datetime = start_time
+    else:
+        start_time_datetime = None
+        for fmt in START_TIME_FORMATS:
+            try:
+                start_time_datetime = datetime.strptime(start_time, fmt)
+                break
+            except ValueError:
+                continue
+
+        if not start_time_datetime:
+            return None
+
+    return start_time_datetime.strftime("%d.%m в %H:%M")
+
+
+def placeholder_values(
+        start_time, first_name_clients, first_name_doctor, last_name_doctor
+):
+    """
+    Значения флагов для одной записи пациента. Дата нормализуется один раз.
+    """
+    return {
+        "first_name": first_name_clients,
+        "first_name_doctor": first_name_doctor,
+        "last_name_doctor": last_name_doctor,
+        "start_time": format_start_time(start_time),
+    }
+
+
+def render_message(message, values):
+    """
+    Подстановка флагов в текст и время сообщения сценария.
+
+    :param message: Сообщение сценария (не изменяется). Пустые content и time (None)
+        рендерятся как пустая строка.
+    :param values: Результат placeholder_values.
+    :return: Новое сообщение с подставленными значениями.
+    """
+    rendered = dict(message)
+    rendered["content"] = render_template(
+        compile_template(message.get("content") or ""), values
+    )
+    if "time" in message:
+        rendered["time"] = render_template(
+            compile_template(message["time"] or ""), values
+        )
+    return rendered
+
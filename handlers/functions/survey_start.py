@@ -0,0 +1,178 @@
+"""
+Начало опросов пациента: первое сообщение опроса и переход в его состояние.
+
+Вызывается и обработчиками бота, и воркером при отправке сообщения сценария
+с типом survey, поэтому модуль не импортирует роутеры и экземпляр бота:
+бот передается параметром. Ответы на опросы обрабатывает handlers.patient.
+"""
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.types import ReplyKeyboardRemove
+
+import keyboards.patient_kb as kb
+from database.constants_db import preparations
+from database.survey_db import get_survey_by_id
+from states.states_patient import PatientStates
+
+
+async def survey_info(bot: Bot, state: FSMContext, chat_id):
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Пожалуйста напишите ответ текстом и отправьте или выберите ответ в меню:",
+        reply_markup=kb.no_question_keyboard(),
+    )
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Какой информации Вам не хватает в данный момент о предстоящей программе лечения? Есть ли у Вас какие-либо вопросы или беспокойства?",
+    )
+    await state.set_state(PatientStates.info_survey)
+
+
+async def survey_with_answers(bot: Bot, state: FSMContext, chat_id, survey_id):
+    all_survey = await get_survey_by_id(survey_id)
+    survey = all_survey["result"]["file"]
+    description = survey["description"]
+    title = survey["title"]
+
+    await state.update_data(
+        survey=survey,
+        current_question_index=0,
+        point=0,
+        title=title,
+        bad_answers={"title": title, "answers": []},
+    )
+
+    await bot.send_message(
+        chat_id=chat_id, text=description, reply_markup=ReplyKeyboardRemove()
+    )
+    # Первый вопрос; следующие задает handlers.patient.ask_next_question по ответам
+    question = survey["questions"][0]
+    await state.set_state(PatientStates.ask_survey)
+    await bot.send_message(
+        chat_id=chat_id,
+        text=f"{question['question_text']}",
+        reply_markup=await kb.inline_survey(question["answers"]),
+    )
+
+
+async def survey_preparation(bot: Bot, state: FSMContext, chat_id):
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Пожалуйста, выберите препарат, который назначил вам врач",
+        reply_markup=ReplyKeyboardRemove(),
+    )
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Список препаратов:",
+        reply_markup=await kb.inline_preparations(preparations),
+    )
+    await state.update_data(chat_id=chat_id)
+    await state.set_state(PatientStates.survey_preparation)
+
+
+async def survey_injection(bot: Bot, state: FSMContext, chat_id):
+    title = "Вам удалось поставить укол?"
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Вам удалось поставить укол?",
+        reply_markup=kb.yes_or_no(),
+    )
+    await state.update_data(
+        title=title,
+        bad_answers={"title": title, "answers": []},
+    )
+    await state.set_state(PatientStates.survey_injection)
+
+
+# Опрос про эмоциональное состояние
+async def survey_emotion(bot: Bot, state: FSMContext, chat_id, survey_id):
+    survey_all = await get_survey_by_id(survey_id)
+    survey = survey_all["result"]["file"]
+    description = survey["description"]
+    title = survey["title"]
+
+    part1_questions = survey["parts"]["part1"]["questions"]
+    part2_questions = survey["parts"]["part2"]["questions"]
+    all_questions = (
+        part1_questions + part2_questions
+    )  # Объединяем вопросы в один список
+
+    await state.update_data(
+        survey=survey,
+        all_questions=all_questions,
+        part1_count=len(part1_questions),
+        part2_count=len(part2_questions),
+        current_question_index=0,
+        point_part1=0,  # Очки для первой части
+        point_part2=0,  # Очки для второй части
+        title=title,
+        bad_answers={"title": title, "answers": []},
+    )
+
+    await bot.send_message(
+        chat_id=chat_id, text=description, reply_markup=ReplyKeyboardRemove()
+    )
+    # Первый вопрос; следующие задает handlers.patient.ask_next_question_emotion
+    question = all_questions[0]
+    await state.set_state(PatientStates.ask_survey_emotion)
+    await bot.send_message(
+        chat_id=chat_id,
+        text=question["question_text"],
+        reply_markup=await kb.inline_survey(question["answers"]),
+    )
+
+
+async def survey_not_record(bot: Bot, state: FSMContext, chat_id):
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Вам удалось записаться на консультацию по ведению беременности?",
+        reply_markup=kb.yes_or_no(),
+    )
+
+    await state.set_state(PatientStates.survey_not_record)
+
+
+async def survey_all_good(bot: Bot, state: FSMContext, chat_id):
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Все ли у вас хорошо?",
+        reply_markup=kb.yes_or_no(),
+    )
+
+    await state.set_state(PatientStates.survey_all_good)
+
+
+async def switch_survey(bot: Bot, state: FSMContext, tg_id, survey_id):
+    """
+    Начало опроса по его номеру из сценария.
+
+    :param bot: Бот, от имени которого отправляется опрос.
+    :param state: Состояние пациента в хранилище aiogram.
+    :param tg_id: Telegram ID пациента.
+    :param survey_id: Номер опроса (1-7).
+    """
+    survey_list = {
+        1: "survey_info",
+        2: "survey_preparation",
+        3: "survey_injection",
+        4: "survey_after_procedure",
+        5: "survey_emotion",
+        6: "survey_not_record",
+        7: "survey_all_good",
+    }
+    out_survey = survey_list[int(survey_id)]
+    match out_survey:
+        case "survey_info":
+            await survey_info(bot, state, tg_id)
+        case "survey_preparation":
+            await survey_preparation(bot, state, tg_id)
+        case "survey_injection":
+            await survey_injection(bot, state, tg_id)
+        case "survey_after_procedure":
+            await survey_with_answers(bot, state, tg_id, 1)
+        case "survey_emotion":
+            await survey_emotion(bot, state, tg_id, 2)
+        case "survey_not_record":
+            await survey_not_record(bot, state, tg_id)
+        case "survey_all_good":
+            await survey_all_good(bot, state, tg_id)
@@ -1,5 +1,4 @@
 import logging
-import os
 import asyncio
 
 from aiogram import types, Router, F
@@ -8,12 +7,13 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, ReplyKeyboardRemove, URLInputFile
 from aiogram.enums import ChatType
-from dotenv import load_dotenv
 
 from configuration.config_bot import bot
+from configuration.settings import settings
 
 import keyboards.patient_kb as kb
 import keyboards.constants as kc
+import handlers.functions.survey_start as survey_start
 from database.admin_send_db import find_id_doctor
 from database.db_helpers import get_url
 from database.questions_db import (
@@ -25,7 +25,6 @@ from database.questions_db import (
 )
 from database.survey_db import (
     add_to_result_in_survey,
-    get_survey_by_id,
     get_client_name_by_tg_id,
     get_doctor_by_client_tg_id,
     add_survey_answers,
@@ -41,18 +40,17 @@ from middlewares.middlewares import TestMiddleware
 from configuration.config_db import SessionLocal
 from database.schedule import get_schedule_by_tg_id
 
-from database.constants_db import preparations, stage_number_to_name
+from database.constants_db import stage_number_to_name
 
 
 patient_router = Router()
 patient_tg_id = 0
 
-load_dotenv()
 send_lock = asyncio.Lock()
 patient_router.message.middleware(TestMiddleware())
 logger = logging.getLogger(__name__)
 choose_action = "Выберите действие"
-support_group_id = os.getenv("SUPPORT_GROUP_ID")
+support_group_id = settings.support_group_id
 
 
 @patient_router.message(Command("patient"))
@@ -280,24 +278,6 @@ async def handle_support_message(message: types.Message, state: FSMContext):
         logger.exception(f"Ошибка: {e}")
 
 
-async def survey_info(state: FSMContext, chat_id):
-    global patient_tg_id
-    if patient_tg_id is None:
-        user_data = await state.get_data()
-        patient_tg_id = user_data.get("tg_id")
-
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Пожалуйста напишите ответ текстом и отправьте или выберите ответ в меню:",
-        reply_markup=kb.no_question_keyboard(),
-    )
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Какой информации Вам не хватает в данный момент о предстоящей программе лечения? Есть ли у Вас какие-либо вопросы или беспокойства?",
-    )
-    await state.set_state(PatientStates.info_survey)
-
-
 @patient_router.message(PatientStates.info_survey)
 async def send_to_doctor(message: types.Message, state: FSMContext):
 
@@ -324,26 +304,6 @@ async def send_to_doctor(message: types.Message, state: FSMContext):
     await state.set_state(PatientStates.menu)
 
 
-async def survey_with_answers(state: FSMContext, chat_id, survey_id):
-    all_survey = await get_survey_by_id(survey_id)
-    survey = all_survey["result"]["file"]
-    description = survey["description"]
-    title = survey["title"]
-
-    await state.update_data(
-        survey=survey,
-        current_question_index=0,
-        point=0,
-        title=title,
-        bad_answers={"title": title, "answers": []},
-    )
-
-    await bot.send_message(
-        chat_id=chat_id, text=description, reply_markup=ReplyKeyboardRemove()
-    )
-    await ask_next_question(state, None, chat_id=chat_id)
-
-
 async def ask_next_question(
     state: FSMContext,
     message_or_query: types.Message | types.CallbackQuery | None = None,
@@ -425,21 +385,6 @@ async def test_survey_ask(query: CallbackQuery, state: FSMContext):
     await ask_next_question(state, query)
 
 
-async def survey_preparation(state: FSMContext, chat_id):
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Пожалуйста, выберите препарат, который назначил вам врач",
-        reply_markup=ReplyKeyboardRemove(),
-    )
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Список препаратов:",
-        reply_markup=await kb.inline_preparations(preparations),
-    )
-    await state.update_data(chat_id=chat_id)
-    await state.set_state(PatientStates.survey_preparation)
-
-
 @patient_router.callback_query(PatientStates.survey_preparation)
 async def send_video(query: CallbackQuery, state: FSMContext):
 
@@ -471,20 +416,6 @@ async def send_video(query: CallbackQuery, state: FSMContext):
         await state.set_state(PatientStates.menu)
 
 
-async def survey_injection(state: FSMContext, chat_id):
-    title = "Вам удалось поставить укол?"
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Вам удалось поставить укол?",
-        reply_markup=kb.yes_or_no(),
-    )
-    await state.update_data(
-        title=title,
-        bad_answers={"title": title, "answers": []},
-    )
-    await state.set_state(PatientStates.survey_injection)
-
-
 @patient_router.message(
     PatientStates.survey_injection, F.text == kc.buttons_patient_yes_or_no["yes"]
 )
@@ -527,37 +458,6 @@ async def send_to_doctor_reason(message: types.Message, state: FSMContext):
     await state.set_state(PatientStates.menu)
 
 
-# Опрос про эмоциональное состояние
-async def survey_emotion(state: FSMContext, chat_id, survey_id):
-    survey_all = await get_survey_by_id(survey_id)
-    survey = survey_all["result"]["file"]
-    description = survey["description"]
-    title = survey["title"]
-
-    part1_questions = survey["parts"]["part1"]["questions"]
-    part2_questions = survey["parts"]["part2"]["questions"]
-    all_questions = (
-        part1_questions + part2_questions
-    )  # Объединяем вопросы в один список
-
-    await state.update_data(
-        survey=survey,
-        all_questions=all_questions,
-        part1_count=len(part1_questions),
-        part2_count=len(part2_questions),
-        current_question_index=0,
-        point_part1=0,  # Очки для первой части
-        point_part2=0,  # Очки для второй части
-        title=title,
-        bad_answers={"title": title, "answers": []},
-    )
-
-    await bot.send_message(
-        chat_id=chat_id, text=description, reply_markup=ReplyKeyboardRemove()
-    )
-    await ask_next_question_emotion(state, chat_id=chat_id)
-
-
 async def ask_next_question_emotion(
     state: FSMContext,
     message_or_query: types.Message | types.CallbackQuery | None = None,
@@ -737,16 +637,6 @@ async def emotion_survey_ask(query: CallbackQuery, state: FSMContext):
         await ask_next_question_emotion(state, query)
 
 
-async def survey_not_record(state: FSMContext, chat_id):
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Вам удалось записаться на консультацию по ведению беременности?",
-        reply_markup=kb.yes_or_no(),
-    )
-
-    await state.set_state(PatientStates.survey_not_record)
-
-
 @patient_router.message(
     PatientStates.survey_not_record, F.text == kc.buttons_patient_yes_or_no["yes"]
 )
@@ -795,16 +685,6 @@ async def survey_not_record_no(message: types.Message, state: FSMContext):
     await state.set_state(PatientStates.menu)
 
 
-async def survey_all_good(state: FSMContext, chat_id):
-    await bot.send_message(
-        chat_id=chat_id,
-        text="Все ли у вас хорошо?",
-        reply_markup=kb.yes_or_no(),
-    )
-
-    await state.set_state(PatientStates.survey_all_good)
-
-
 @patient_router.message(
     PatientStates.survey_all_good, F.text == kc.buttons_patient_yes_or_no["yes"]
 )
@@ -919,65 +799,37 @@ async def send_to_call_center(out_text):
 
 
 # Функции переключения на нужный опрос
-async def switch_survey(state, tg_id, survey_id):
-    survey_list = {
-        1: "survey_info",
-        2: "survey_preparation",
-        3: "survey_injection",
-        4: "survey_after_procedure",
-        5: "survey_emotion",
-        6: "survey_not_record",
-        7: "survey_all_good",
-    }
-    out_survey = survey_list[int(survey_id)]
-    match out_survey:
-        case "survey_info":
-            await survey_info(state, tg_id)
-        case "survey_preparation":
-            await survey_preparation(state, tg_id)
-        case "survey_injection":
-            await survey_injection(state, tg_id)
-        case "survey_after_procedure":
-            await survey_with_answers(state, tg_id, 1)
-        case "survey_emotion":
-            await survey_emotion(state, tg_id, 2)
-        case "survey_not_record":
-            await survey_not_record(state, tg_id)
-        case "survey_all_good":
-            await survey_all_good(state, tg_id)
-
-
 # Команды для отладки
 @patient_router.message(Command("survey_info"))
 async def func_survey_info(message: types.Message, state: FSMContext):
-    await survey_info(state, chat_id=message.chat.id)
+    await survey_start.survey_info(message.bot, state, chat_id=message.chat.id)
 
 
 @patient_router.message(Command("survey_preparation"))
 async def func_survey_info(message: types.Message, state: FSMContext):
-    await survey_preparation(state, chat_id=message.chat.id)
+    await survey_start.survey_preparation(message.bot, state, chat_id=message.chat.id)
 
 
 @patient_router.message(Command("survey_injection"))
 async def func_survey_info(message: types.Message, state: FSMContext):
-    await survey_injection(state, chat_id=message.chat.id)
+    await survey_start.survey_injection(message.bot, state, chat_id=message.chat.id)
 
 
 @patient_router.message(Command("survey_after"))
 async def func_survey_info(message: types.Message, state: FSMContext):
-    await survey_with_answers(state, chat_id=message.chat.id, survey_id=1)
+    await survey_start.survey_with_answers(message.bot, state, chat_id=message.chat.id, survey_id=1)
 
 
 @patient_router.message(Command("survey_emotion"))
 async def func_survey_info(message: types.Message, state: FSMContext):
-    await survey_emotion(state, chat_id=message.chat.id, survey_id=2)
+    await survey_start.survey_emotion(message.bot, state, chat_id=message.chat.id, survey_id=2)
 
 
 @patient_router.message(Command("survey_not_record"))
 async def func_survey_not_record(message: types.Message, state: FSMContext):
-    await survey_not_record(state, chat_id=message.chat.id)
+    await survey_start.survey_not_record(message.bot, state, chat_id=message.chat.id)
 
 
 @patient_router.message(Command("survey_all_good"))
 async def func_survey_all_good(message: types.Message, state: FSMContext):
-    await survey_all_good(state, chat_id=message.chat.id)
+    await survey_start.survey_all_good(message.bot, state, chat_id=message.chat.id)
@@ -1,12 +1,20 @@
 import asyncio
+import logging
+import time
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 from typing import Callable, Dict, Any, Awaitable
-from aiogram.types import Message
+from aiogram.types import Message, Update
 
+from configuration.db_instrumentation import query_source
+from configuration.metrics import handler_duration, startup_seconds
+from configuration.profiler import profiled
+from database.delivery_db import is_client_inactive, set_client_active
 from keyboards.constants import buttons_patient_question
 
+logger = logging.getLogger(__name__)
+
 
 class TestMiddleware(BaseMiddleware):
     async def __call__(
@@ -29,3 +37,102 @@ class TestMiddleware(BaseMiddleware):
 
         result = await handler(event, data)
         return result
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """
+    Снова отмечает пациента активным, когда от него приходит любое обновление.
+    Если пациент заблокировал бота (my_chat_member со статусом kicked),
+    отмечает его недоступным.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if isinstance(event, Update) and user:
+            member_update = event.my_chat_member
+            if member_update and member_update.new_chat_member.status == "kicked":
+                await set_client_active(user.id, False)
+            elif await is_client_inactive(user.id):
+                await set_client_active(user.id, True)
+
+        return await handler(event, data)
+
+
+class QuerySourceMiddleware(BaseMiddleware):
+    """
+    Привязывает запросы к бд, выполненные обработчиком, к его имени и пользователю,
+    чтобы медленные запросы в журнале было видно по обработчикам.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        with query_source(
+            handler=data["handler"].callback.__name__,
+            user_id=user.id if user else None,
+        ):
+            return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время обработки обновлений по обработчикам и результату (ok, error)."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            handler_duration.observe(
+                data["handler"].callback.__name__, status, value=time.perf_counter() - started
+            )
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Отмечает выборку обновлений для профилировщика во время сессии /profile."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with profiled(data["handler"].callback.__name__):
+            return await handler(event, data)
+
+
+class FirstUpdateMiddleware(BaseMiddleware):
+    """Пишет в лог, через сколько секунд после старта процесса пришло первое обновление."""
+
+    def __init__(self, startup_timer):
+        self.startup_timer = startup_timer
+        self.seen = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.seen:
+            self.seen = True
+            first_update = self.startup_timer.elapsed()
+            startup_seconds.set("bot", "first_update", value=first_update)
+            logger.info(f"Первое обновление через {first_update:.2f} с после запуска")
+        return await handler(event, data)
@@ -1,10 +1,16 @@
 import asyncio
 import logging
+import time
+
+# Начало запуска процесса: от него считается время до первого обновления
+PROCESS_STARTED = time.monotonic()
+
 from aiogram.fsm.storage.base import StorageKey
-from arq import create_pool
 
 from configuration.config_db import Base, engine
 from configuration.config_bot import bot, dp, storage
+from configuration.config_crm import crm_client
+from configuration.config_redis import get_arq_redis
 from handlers.admin_send_scenarios import admin_send_script
 from handlers.auth import auth_router
 
@@ -14,33 +20,79 @@ from handlers.admin_changes import admin_changes_router
 from handlers.patient import patient_router
 from aiogram.fsm.context import FSMContext
 
-from scheduler.main import WorkerSettings
 from database.models import *
+from database.schema import ensure_schema
+from database.scenario_cache import listen_for_invalidation
+from configuration.logging_setup import setup_logging
+from configuration.loop_monitor import start_loop_monitor
+from configuration.metrics import start_metrics_server
+from configuration.startup import StartupTimer, prewarm, warm_crm, warm_postgres, warm_redis
+from middlewares.middlewares import (
+    ActivityMiddleware,
+    FirstUpdateMiddleware,
+    HandlerMetricsMiddleware,
+    ProfilingMiddleware,
+    QuerySourceMiddleware,
+)
+
+logger = logging.getLogger(__name__)
 
 
 async def on_startup():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await ensure_schema(conn, Base.metadata)
 
 
 async def main():
+    startup_timer = StartupTimer("bot", PROCESS_STARTED)
+    startup_timer.mark("импорт")
+
     admin_router.include_router(admin_changes_router)
     admin_router.include_router(admin_send_script)
     auth_router.include_router(doctor_router)
     auth_router.include_router(patient_router)
     auth_router.include_router(admin_router)
     dp.include_router(auth_router)
+    dp.update.outer_middleware(FirstUpdateMiddleware(startup_timer))
+    dp.update.outer_middleware(ActivityMiddleware())
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(HandlerMetricsMiddleware())
+        observer.middleware(QuerySourceMiddleware())
+        observer.middleware(ProfilingMiddleware())
 
-    redis_pool = await create_pool(WorkerSettings.redis_settings)
+    redis_pool = get_arq_redis()
+    startup_timer.mark("роутеры")
 
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Проверка схемы, прогрев пулов и сброс вебхука не зависят друг от друга
+    _, warmed, _ = await asyncio.gather(
+        on_startup(),
+        prewarm(
+            postgres=warm_postgres(engine),
+            redis=warm_redis(redis_pool),
+            crm=warm_crm(crm_client),
+        ),
+        bot.delete_webhook(drop_pending_updates=True),
+    )
+    startup_timer.mark("схема, пулы и вебхук")
+    logger.info(f"Прогрев соединений: {warmed}")
 
-    await on_startup()
-    await dp.start_polling(bot, arqredis=redis_pool)
+    scenario_listener = asyncio.create_task(listen_for_invalidation())
+    metrics_runner = await start_metrics_server()
+    loop_monitor = start_loop_monitor()
+    startup_timer.mark("мониторинг")
+    logger.info(startup_timer.summary())
+    try:
+        await dp.start_polling(bot, arqredis=redis_pool)
+    finally:
+        scenario_listener.cancel()
+        loop_monitor.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await crm_client.close()
 
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
+    setup_logging()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
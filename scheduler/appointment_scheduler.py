@@ -1,23 +1,33 @@
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
+from configuration.config_crm import CrmUnavailableError, crm_client
 from database.auth_db import set_appointments
 from scheduler.scenario_helpers import (
     get_telegram_id,
     get_users_scenarios,
     mark_appointment_as_processed,
-    get_new_appointments,
-    list_clients,
+    claim_new_appointments,
+    claim_clients_for_sync,
+    get_appointment,
+    release_sync_claims,
+    schedule_next_sync,
 )
+from scheduler.delivery import delivery_delay
 from scheduler.sched_tasks import (
     schedule_scenario_message,
     check_after_4331_procedure,
 )
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from scheduler.time_expressions import (
+    compile_time_expression,
+    message_offset,
+    parse_start_time,
+    send_time,
 )
 
+logger = logging.getLogger(__name__)
+
 
 async def calculate_send_time(start_time, offset_time):
     """
@@ -27,31 +37,51 @@ async def calculate_send_time(start_time, offset_time):
     :param offset_time - время, в которое необходимо отправить сообщение (из сценария)
     """
     try:
-        if isinstance(start_time, datetime):
-            start_datetime = start_time
-        elif isinstance(start_time, str):
-            start_datetime = datetime.fromisoformat(start_time)
-        else:
-            logging.error(f"Invalid type for start_time: {type(start_time)}")
-            return None
-
-        if " " in offset_time:
-            days_offset, time_of_day = offset_time.split()
-            time_offset = int(days_offset)
-            send_time = start_datetime + timedelta(hours=time_offset)
-            return datetime.combine(
-                send_time.date(), datetime.strptime(time_of_day, "%H:%M").time()
-            )
-        elif offset_time == "0":
-            return datetime.now() + timedelta(seconds=5)
-        else:
-            time_offset = int(offset_time)
-            return start_datetime + timedelta(hours=time_offset)
+        start_time = parse_start_time(start_time)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid start_time in calculate_send_time: {e}")
+        return None
+
+    try:
+        return send_time(compile_time_expression(offset_time), start_time)
     except ValueError as e:
-        logging.error(f"Invalid time format in calculate_send_time: {e}")
+        logger.error(f"Invalid time format in calculate_send_time: {e}")
         return None
 
 
+async def plan_send_times(redis, messages, start_time):
+    """
+    Время отправки сообщений сценария для одной записи.
+
+    Сообщения с фиксированным временем у всех пациентов этапа приходятся на одну
+    минуту, поэтому совпавшие отправки расходятся по окну доставки. Сдвиг не
+    переносит сообщение пациента раньше предыдущего, порядок сохраняется.
+
+    :param messages - сообщения сценария пациента
+    :param start_time - время начала процедуры (None, если не распознано)
+    :return - список (сообщение, время отправки) по возрастанию времени
+    """
+    now = datetime.now()
+    planned = []
+    for message in messages:
+        try:
+            offset = message_offset(message)
+            planned.append((send_time(offset, start_time, now), offset.immediate, message))
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping message {message['id']} due to invalid time format")
+
+    send_times = []
+    latest = None
+    for message_send_time, immediate, message in sorted(planned, key=lambda item: item[0]):
+        if not immediate:
+            message_send_time += await delivery_delay(redis, message_send_time)
+            if latest is not None:
+                message_send_time = max(message_send_time, latest)
+        latest = message_send_time
+        send_times.append((message, message_send_time))
+    return send_times
+
+
 async def handle_new_appointment(ctx, appointment):
     """
     Подготовка контента для отправки
@@ -64,65 +94,113 @@ async def handle_new_appointment(ctx, appointment):
     if not telegram_id:
         return
 
+    try:
+        start_time = parse_start_time(appointment["start_time"])
+    except (TypeError, ValueError) as e:
+        # Сообщения "0" не зависят от времени записи и отправляются, остальные пропускаются
+        logger.error(f"Некорректное время начала записи {appointment['id']}: {e}")
+        start_time = None
+
     scenarios = await get_users_scenarios(telegram_id)
     if scenarios and "messages" in scenarios and scenarios["messages"]:
-        for message in scenarios["messages"]:
-            send_time = await calculate_send_time(
-                appointment["start_time"], message["time"]
-            )
-            if send_time:
-                message_type = message.get("type")
-                id_survey = message.get("id_survey")
-                if procedure_id == 4331:
-                    await check_after_4331_procedure(ctx, telegram_id, appointment["client_id"],
-                                                     appointment["start_time"])
-                else:
-                    await schedule_scenario_message(
-                        ctx,
-                        telegram_id,
-                        message["id"],
-                        send_time,
-                        message["content"],
-                        message["url"],
-                        message_type,
-                        id_survey=id_survey if id_survey else -1,
-                    )
-
+        for message, message_send_time in await plan_send_times(
+                ctx["redis"], scenarios["messages"], start_time
+        ):
+            message_type = message.get("type")
+            id_survey = message.get("id_survey")
+            if procedure_id == 4331:
+                if start_time is not None:
+                    await check_after_4331_procedure(ctx, telegram_id, appointment["client_id"], start_time)
             else:
-                logging.warning(
-                    f"Skipping message {message['id']} due to invalid time format"
+                await schedule_scenario_message(
+                    ctx,
+                    telegram_id,
+                    message["id"],
+                    message_send_time,
+                    message["content"],
+                    message["url"],
+                    message_type,
+                    id_survey=id_survey if id_survey else -1,
+                    appointment_id=appointment["id"],
+                    procedure_id=procedure_id,
                 )
         await mark_appointment_as_processed(appointment["id"])
     else:
         await mark_appointment_as_processed(appointment["id"])
-        logging.info(f"No messages found for procedure {procedure_id}")
+        logger.debug("No messages found for procedure %s", procedure_id)
+
+
+async def plan_appointment(ctx, appointment_id):
+    """
+    Планирование сценария по одной записи сразу после её синхронизации из CRM
+    """
+    appointment = await get_appointment(appointment_id)
+    if not appointment:
+        logger.info(f"Запись {appointment_id} уже обработана")
+        return
+    await handle_new_appointment(ctx, appointment)
 
 
 async def check_new_appointments(ctx):
     """
-    Промежуточкая функция для проверки на наличие сценария на отправку
+    Страховочная проверка на наличие необработанных записей, для которых
+    планирование не было запущено сразу после синхронизации. Записи
+    захватываются пачками, поэтому проверку можно запускать на нескольких воркерах
     """
-    logging.info("Checking for new appointments...")
-    new_appointments = await get_new_appointments()
-    for appointment in new_appointments:
-        await handle_new_appointment(ctx, appointment)
+    planned = 0
+    while new_appointments := await claim_new_appointments():
+        for appointment in new_appointments:
+            await handle_new_appointment(ctx, appointment)
+        planned += len(new_appointments)
+    if planned:
+        logger.info(f"Запланировано пропущенных записей: {planned}")
 
 
 async def update_appointments(ctx):
     """
-    Проверка и обновление расписания в бд
+    Проверка и обновление расписания в бд для клиентов, у которых наступило
+    время синхронизации.
+
+    Ошибка CRM на одном клиенте не прерывает синхронизацию остальных: клиент
+    остается захваченным и синхронизируется снова через CLAIM_LEASE. Если
+    circuit breaker CRM открылся, синхронизация останавливается, необработанные
+    клиенты пачки возвращаются в очередь, а ошибка передается вызывающему,
+    чтобы конвейер пропустил зависящие от синхронизации этапы.
     """
+    started = time.monotonic()
+    synced = changed_count = crm_errors = 0
     try:
-        clients = await list_clients()
-
-        for client in clients:
-            crm_id = client["crm_id"]
-            tg_id = client["tg_id"]
-
-            logging.info(f"Обновление расписания для CRM ID: {crm_id}, TG ID: {tg_id}")
-            await set_appointments(crm_id, tg_id)
-
-        logging.info("Обновление расписаний завершено.")
-
+        while clients := await claim_clients_for_sync():
+            for index, client in enumerate(clients):
+                crm_id = client["crm_id"]
+                tg_id = client["tg_id"]
+
+                logger.debug("Обновление расписания для CRM ID: %s, TG ID: %s", crm_id, tg_id)
+                try:
+                    changed = await set_appointments(crm_id, tg_id)
+                except CrmUnavailableError as e:
+                    if crm_client.breaker.state != "closed":
+                        await release_sync_claims([rest["tg_id"] for rest in clients[index:]])
+                        logger.warning(
+                            f"Синхронизация остановлена, CRM недоступна: {e}. "
+                            f"Синхронизировано клиентов {synced}"
+                        )
+                        raise
+                    crm_errors += 1
+                    logger.warning(f"Расписание клиента {crm_id} не получено из CRM: {e}")
+                    continue
+                await schedule_next_sync(tg_id, changed)
+                synced += 1
+                changed_count += changed
+
+        logger.info(
+            f"Обновление расписаний завершено: клиентов {synced}, "
+            f"с изменениями {changed_count}, ошибок CRM {crm_errors}, "
+            f"{time.monotonic() - started:.1f} с"
+        )
+
+    except CrmUnavailableError:
+        raise
     except Exception as e:
-        logging.exception(f"Ошибка при обновлении расписаний: {e}")
+        logger.exception(f"Ошибка при обновлении расписаний: {e}")
+        raise
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from configuration.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Ожидаемая пропускная способность отправки в Telegram, сообщений в секунду
+TELEGRAM_SEND_RATE = settings.telegram_send_rate
+# Окно, на которое растягиваются одновременные отправки, в секундах
+DELIVERY_WINDOW = settings.delivery_window
+# Через сколько отправок выводить сводку по задержке доставки
+LAG_REPORT_EVERY = 100
+
+# Попытки отправки одного сообщения, после которых оно попадает в недоставленные
+MAX_DELIVERY_TRIES = 6
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 300
+
+# Счетчик отправок, запланированных на одну минуту
+MINUTE_COUNTER_KEY = "delivery:minute:{minute}"
+
+
+def slot_delay(slot, rate=TELEGRAM_SEND_RATE, window=DELIVERY_WINDOW):
+    """
+    Смещение отправки для слота в минуте.
+
+    Соседние слоты отстоят на 1 / rate секунд, после заполнения окна
+    слоты начинаются сначала.
+    """
+    capacity = max(int(window * rate), 1)
+    return timedelta(seconds=(slot % capacity) / rate)
+
+
+async def minute_slot(redis, send_time):
+    """
+    Номер отправки среди запланированных на ту же минуту, общий для всех воркеров.
+
+    Счетчик минуты живет до конца окна доставки после нее, поэтому ключи
+    прошедших минут не копятся в Redis.
+    """
+    key = MINUTE_COUNTER_KEY.format(minute=send_time.strftime("%Y%m%d%H%M"))
+    minute_end = send_time.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    ttl = max(int((minute_end - datetime.now()).total_seconds()), 0) + DELIVERY_WINDOW
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        count, _ = await pipe.execute()
+    return count - 1
+
+
+async def delivery_delay(redis, send_time):
+    """
+    Сдвиг времени отправки для сглаживания пиков. Первая отправка минуты
+    не сдвигается, следующие расходятся по окну доставки. Ошибка Redis не должна
+    мешать планированию, поэтому в этом случае сообщение не сдвигается.
+
+    :param send_time: Запланированное время отправки.
+    """
+    try:
+        return slot_delay(await minute_slot(redis, send_time))
+    except Exception as e:
+        logger.exception(f"Ошибка при получении слота доставки на {send_time}: {e}")
+        return timedelta(0)
+
+
+def retry_delay(error, job_try):
+    """
+    Классификация ошибки отправки.
+
+    :param error: Исключение, возникшее при отправке.
+    :param job_try: Номер текущей попытки (с 1).
+    :return: Через сколько секунд повторить отправку или None, если ошибка
+             постоянная (пользователь заблокировал бота, неверный запрос и т.п.).
+    """
+    # aiogram к этому моменту уже загружен ботом воркера, импорт не стоит времени
+    from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+    if isinstance(error, TelegramRetryAfter):
+        # Flood control: Telegram сам сообщает, сколько ждать
+        return error.retry_after + random.uniform(0, 1)
+    if isinstance(error, (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)):
+        backoff = min(RETRY_BASE_DELAY * 2 ** (job_try - 1), RETRY_MAX_DELAY)
+        return random.uniform(backoff / 2, backoff)
+    return None
+
+
+def is_unreachable(error):
+    """
+    Пациент заблокировал бота или чат больше не существует.
+    """
+    from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower()
+
+
+class DeliveryLag:
+    """
+    Фактическая задержка доставки относительно запланированного времени
+    (с учетом сглаживания) по последним отправкам воркера.
+    """
+
+    def __init__(self, size=1000):
+        self._lags = deque(maxlen=size)
+        self._count = 0
+
+    def record(self, planned_ms):
+        lag = max(time.time() - planned_ms / 1000, 0)
+        self._lags.append(lag)
+        self._count += 1
+        if self._count % LAG_REPORT_EVERY == 0:
+            logger.info(self.summary())
+        return lag
+
+    def snapshot(self):
+        """Задержки последних отправок в секундах."""
+        return list(self._lags)
+
+    def summary(self):
+        if not self._lags:
+            return "Задержка доставки: нет данных"
+        lags = sorted(self._lags)
+        p50 = lags[len(lags) // 2]
+        p95 = lags[min(int(len(lags) * 0.95), len(lags) - 1)]
+        return (
+            f"Задержка доставки за последние {len(lags)} отправок: "
+            f"p50={p50:.1f} с, p95={p95:.1f} с, max={lags[-1]:.1f} с"
+        )
+
+
+delivery_lag = DeliveryLag()
@@ -1,31 +1,113 @@
+import asyncio
 import logging
-import os
+import time
 from typing import Callable, Awaitable, Any
 
-from aiogram import Bot
-from arq import cron
-from arq.connections import RedisSettings
-
-from scheduler.appointment_scheduler import check_new_appointments
+# Начало импорта воркера: от него считается время запуска
+PROCESS_STARTED = time.monotonic()
+
+from arq import cron, func
+
+from configuration.config_crm import crm_client
+from configuration.config_db import engine
+from configuration.config_redis import ensure_pool_size, get_arq_redis
+from configuration.db_instrumentation import slow_query_summary, traced_job
+from configuration.logging_setup import setup_logging
+from configuration.loop_monitor import start_loop_monitor
+from configuration.metrics import (
+    WORKER_METRICS_PORT,
+    queue_depth,
+    registry,
+    start_metrics_server,
+    timed_job,
+)
+from configuration.profiler import MAX_PROFILE_SECONDS, profile_session, profiled_job
+from configuration.settings import settings
+from configuration.startup import StartupTimer, prewarm, warm_crm, warm_postgres, warm_redis
+from database.scenario_cache import listen_for_invalidation
+from scheduler.appointment_scheduler import check_new_appointments, plan_appointment
 from scheduler.appointment_scheduler import update_appointments
+from scheduler.delivery import MAX_DELIVERY_TRIES
+from scheduler.pipeline import (
+    PIPELINE_PERIOD,
+    PIPELINE_TIMEOUT,
+    run_sync_pipeline,
+    schedule_sync_pipeline,
+)
 from scheduler.sched_tasks import send_scenario_message, check_and_send_4331_scenario, check_after_4331_procedure, \
     check_for_delete
 
 logger = logging.getLogger(__name__)
 
+QUEUE = "arq:queue"
+
+
+def create_bot():
+    """
+    Бот воркера. aiogram при импорте загружает все типы Bot API (~2 с),
+    поэтому импортируется здесь, а не при импорте scheduler.main.
+    """
+    from aiogram import Bot
+
+    from configuration.bot_session import bot_session
+
+    return Bot(token=settings.token, session=bot_session())
+
+
+def job(coroutine):
+    """Задача воркера с метриками времени, привязкой запросов к бд и выборочным профилированием."""
+    return timed_job(traced_job(profiled_job(coroutine)))
+
 
 async def startup(ctx):
+    setup_logging()
     logger.info("Запуск воркера arq")
-    ctx["bot"] = Bot(token=os.getenv("TOKEN"))
+    startup_timer = StartupTimer("worker", PROCESS_STARTED)
+    startup_timer.mark("импорт и подключение arq")
+
+    # aiogram импортируется в потоке, пока event loop ждет подключений к сервисам
+    ctx["bot"], warmed = await asyncio.gather(
+        asyncio.to_thread(create_bot),
+        prewarm(
+            postgres=warm_postgres(engine),
+            redis=warm_redis(ctx["redis"]),
+            crm=warm_crm(crm_client),
+        ),
+    )
+    startup_timer.mark("бот и пулы")
+    logger.info(f"Прогрев соединений: {warmed}")
+
+    ctx["scenario_listener"] = asyncio.create_task(listen_for_invalidation())
+    ctx["metrics_runner"] = await start_metrics_server(port=WORKER_METRICS_PORT)
+    ctx["loop_monitor"] = start_loop_monitor()
+    startup_timer.mark("мониторинг")
+    logger.info(startup_timer.summary())
+
+    async def collect_queue_depth():
+        queue_depth.set(value=await ctx["redis"].zcard(QUEUE))
+
+    registry.add_collector(collect_queue_depth)
 
 
 async def shutdown(ctx):
     logger.info("Завершение работы воркера arq")
+    ctx["scenario_listener"].cancel()
+    ctx["loop_monitor"].stop()
+    if ctx["metrics_runner"]:
+        await ctx["metrics_runner"].cleanup()
+    logger.info(f"Запросы к бд за время работы воркера:\n{slow_query_summary()}")
+    await crm_client.close()
     await ctx["bot"].session.close()
 
 
+async def profile_worker(ctx, seconds: int, percent: float, chat_id: int):
+    """Сессия профилирования задач воркера по команде /profile, отчет уходит админу."""
+    report = await profile_session(seconds, percent, "worker")
+    await ctx["bot"].send_message(chat_id, f"Воркер.\n{report}"[:4096])
+
+
 async def test_send_message(ctx, chat_id: int, text: str):
-    bot: Bot = ctx["bot"]
+    bot = ctx["bot"]
     try:
         await bot.send_message(chat_id, text)
         logger.info(f"Сообщение '{text}' успешно отправлено в чат {chat_id}")
@@ -41,45 +123,37 @@ async def test_message_every_minute(ctx):
         logger.error(e)
 
 
+# Максимальное количество одновременно выполняемых задач
+MAX_JOBS = 100
+
+
 class WorkerSettings:
-    redis_settings = RedisSettings(
-        host=os.getenv("REDIS_HOST", "redis://redis:6379"),
-        port=int(os.getenv("REDIS_PORT", 6379)),
-        database=0,
-    )
+    # Общий пул соединений процесса: очередь arq, хранилище состояний и кэши.
+    # Каждой задаче по соединению, иначе под нагрузкой задачи ждут свободное
+    redis_pool = get_arq_redis()
+    ensure_pool_size(MAX_JOBS)
 
     functions: list[Callable[..., Awaitable[Any]]] = [
-        check_new_appointments,
-        send_scenario_message,
-        update_appointments,
-        check_and_send_4331_scenario,
-        check_after_4331_procedure,
-        check_for_delete,
+        job(check_new_appointments),
+        job(plan_appointment),
+        func(job(send_scenario_message), max_tries=MAX_DELIVERY_TRIES),
+        job(update_appointments),
+        job(check_and_send_4331_scenario),
+        job(check_after_4331_procedure),
+        job(check_for_delete),
+        func(job(run_sync_pipeline), timeout=PIPELINE_TIMEOUT),
+        func(profile_worker, timeout=MAX_PROFILE_SECONDS + 60),
     ]
 
     on_startup = startup
     on_shutdown = shutdown
 
     poll_delay = 1.0  # Интервал опроса в секундах
-    max_jobs = 100  # Максимальное количество одновременно выполняемых задач
+    max_jobs = MAX_JOBS
     job_timeout = 300  # Таймаут выполнения задачи в секундах
     keep_result = 3600  # Время хранения результата задачи в секундах
     cron_jobs = [
-        cron(
-            "scheduler.appointment_scheduler.check_new_appointments",
-            minute={0, 30},
-            second=0,
-        ),
-        cron(
-            "scheduler.appointment_scheduler.update_appointments",
-            minute={0, 30},
-            second=0,
-        ),
-        cron(
-            "scheduler.sched_tasks.check_for_delete",
-            minute={0, 30},
-            second=0,
-        ),
+        cron(job(schedule_sync_pipeline), minute=set(range(0, 60, PIPELINE_PERIOD)), second=0),
     ]
 
     log_level = logging.INFO  # Уровень логирования
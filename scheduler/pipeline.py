@@ -0,0 +1,92 @@
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from configuration.config_crm import crm_client
+from configuration.settings import settings
+from scheduler.appointment_scheduler import check_new_appointments, update_appointments
+from scheduler.sched_tasks import check_for_delete
+
+logger = logging.getLogger(__name__)
+
+# Конвейер запускается каждые PIPELINE_PERIOD минут; синхронизируются только
+# клиенты, у которых наступило время next_sync_at
+PIPELINE_PERIOD = 5
+# Разброс старта конвейера внутри окна, в секундах
+PIPELINE_JITTER = settings.pipeline_jitter
+# Ограничение на весь конвейер. Пересекающиеся запуски не мешают друг другу:
+# клиенты и записи захватываются через SKIP LOCKED
+PIPELINE_TIMEOUT = 20 * 60
+# Удаление старых данных выполняется, как и до конвейера, раз в полчаса
+RETENTION_MINUTES = frozenset({0, 30})
+
+
+class PipelineStage(NamedTuple):
+    name: str
+    func: Callable[[dict], Awaitable[Any]]
+    requires: tuple[str, ...] = ()
+    # Минуты окна конвейера, в которые выполняется этап; None - в каждом запуске
+    minutes: frozenset[int] | None = None
+
+
+# Синхронизация с CRM -> планирование сценариев -> удаление старых данных
+PIPELINE_STAGES = (
+    PipelineStage("sync", update_appointments),
+    PipelineStage("plan", check_new_appointments, requires=("sync",)),
+    PipelineStage("retention", check_for_delete, minutes=RETENTION_MINUTES),
+)
+
+
+async def schedule_sync_pipeline(ctx):
+    """
+    Cron-задача: ставит конвейер в очередь со случайной задержкой, чтобы
+    нагрузка на бд и CRM не приходилась на начало окна.
+    """
+    now = datetime.now()
+    window = now.strftime("%Y%m%d%H%M")
+    delay = random.uniform(0, PIPELINE_JITTER)
+    job = await ctx["redis"].enqueue_job(
+        "run_sync_pipeline",
+        now.minute,
+        _job_id=f"sync_pipeline:{window}",
+        _defer_by=delay,
+    )
+    if job:
+        logger.info(f"Конвейер синхронизации запланирован через {delay:.0f} с")
+
+
+async def run_sync_pipeline(ctx, minute=None):
+    """
+    Последовательный запуск этапов: каждый этап стартует после завершения
+    предыдущего. Этап пропускается, если упал этап, от которого он зависит.
+
+    :param minute: Минута окна cron, в которое запланирован запуск. Этапы
+        с minutes выполняются только в свои минуты; без minute - все этапы.
+    """
+    failed = set()
+    timings = {}
+
+    for stage in PIPELINE_STAGES:
+        if minute is not None and stage.minutes is not None and minute not in stage.minutes:
+            logger.debug("Этап %s пропущен в окне %s", stage.name, minute)
+            continue
+        if failed.intersection(stage.requires):
+            logger.warning(f"Этап {stage.name} пропущен: не выполнены {stage.requires}")
+            failed.add(stage.name)
+            continue
+
+        started = time.monotonic()
+        try:
+            await stage.func(ctx)
+        except Exception as e:
+            failed.add(stage.name)
+            logger.exception(f"Ошибка на этапе {stage.name}: {e}")
+        timings[stage.name] = time.monotonic() - started
+        logger.info(f"Этап {stage.name} завершен за {timings[stage.name]:.2f} с")
+
+    summary = ", ".join(f"{name}={seconds:.2f} с" for name, seconds in timings.items())
+    logger.info(f"Конвейер синхронизации завершен: {summary}")
+    logger.info(f"Запросы к CRM: {crm_client.summary()}")
+    return timings
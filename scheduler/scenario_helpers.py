@@ -1,35 +1,132 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
 from sqlalchemy.future import select
 
 from configuration.config_db import SessionLocal
 from database.constants_db import logger
 from database.models import Client, UserScenario, Appointment
+from scheduler.sync_policy import next_sync_time, sync_interval
+
+# Размер пачки, которую воркер захватывает за одну транзакцию
+CLAIM_BATCH_SIZE = 100
+# Через сколько захваченная, но не обработанная запись (или клиент) снова доступна другим воркерам
+CLAIM_LEASE = timedelta(minutes=10)
+
+# Записи недоступных пациентов не планируются, пока пациент снова не напишет боту
+ACTIVE_CLIENT_IDS = select(Client.id).where(Client.is_active.is_(True))
+
+APPOINTMENT_FIELDS = (
+    Appointment.id,
+    Appointment.client_id,
+    Appointment.doctor_id,
+    Appointment.procedure_id,
+    Appointment.start_time,
+    Appointment.end_time,
+    Appointment.room_name,
+)
 
 
-async def list_clients():
+async def claim_clients_for_sync(batch_size=CLAIM_BATCH_SIZE):
     """
-    Получение всего списка клиентов из бд
+    Захват пачки клиентов для синхронизации расписания с CRM.
+
+    Выдаются только клиенты, у которых наступило время next_sync_at. Строки
+    блокируются через FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+    получают непересекающиеся пачки. До завершения синхронизации next_sync_at
+    сдвигается на CLAIM_LEASE, после неё - по schedule_next_sync.
+
+    :param batch_size - максимальный размер пачки
+    :return - список словарей {"crm_id", "tg_id"}
     """
     async with SessionLocal() as session:
         async with session.begin():
             try:
-                stmt = select(Client)
+                now = datetime.now()
+                candidates = (
+                    select(Client.id)
+                    .where(
+                        Client.is_active.is_(True),
+                        or_(
+                            Client.next_sync_at.is_(None),
+                            Client.next_sync_at <= now,
+                        ),
+                    )
+                    .order_by(Client.next_sync_at.nulls_first())
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                stmt = (
+                    update(Client)
+                    .where(Client.id.in_(candidates))
+                    .values(synced_at=now, next_sync_at=now + CLAIM_LEASE)
+                    .returning(Client.id_crm.label("crm_id"), Client.tg_id)
+                    .execution_options(synchronize_session=False)
+                )
                 result = await session.execute(stmt)
-                clients = result.scalars().all()
+                clients = [dict(row) for row in result.mappings().all()]
+
+                logger.debug("Захвачено клиентов для синхронизации: %d", len(clients))
+                return clients
 
-                client_schedules = []
-                for client in clients:
-                    crm_id = client.id_crm
-                    tg_id = client.tg_id
+            except Exception as e:
+                logger.exception(f"Ошибка при получении нового расписание из crm: {e}")
+                return []
 
-                    client_schedule = {"crm_id": crm_id, "tg_id": tg_id}
 
-                    client_schedules.append(client_schedule)
+async def schedule_next_sync(tg_id, changed):
+    """
+    Выставление времени следующей синхронизации клиента с CRM
 
-                logger.info(f"Составлен список клиентов: {client_schedules}")
-                return client_schedules
+    :param tg_id - тг-id клиента
+    :param changed - изменились ли записи клиента при синхронизации
+    :return - время следующей синхронизации
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                now = datetime.now()
+                result = await session.execute(
+                    select(Appointment.start_time)
+                    .join(Client, Appointment.client_id == Client.id)
+                    .where(Client.tg_id == tg_id)
+                )
+                interval = sync_interval(result.scalars().all(), changed, now)
+                next_sync_at = next_sync_time(tg_id, interval, now)
+
+                await session.execute(
+                    update(Client)
+                    .where(Client.tg_id == tg_id)
+                    .values(next_sync_at=next_sync_at)
+                    .execution_options(synchronize_session=False)
+                )
+                return next_sync_at
 
             except Exception as e:
-                logger.exception(f"Ошибка при получении нового расписание из crm: {e}")
+                logger.exception(f"Ошибка при планировании синхронизации клиента {tg_id}: {e}")
+                return None
+
+
+async def release_sync_claims(tg_ids):
+    """
+    Возврат захваченных клиентов в очередь синхронизации без ожидания CLAIM_LEASE,
+    например если синхронизация остановлена из-за недоступной CRM.
+
+    :param tg_ids - тг-id клиентов
+    """
+    if not tg_ids:
+        return
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                await session.execute(
+                    update(Client)
+                    .where(Client.tg_id.in_(tg_ids))
+                    .values(next_sync_at=datetime.now())
+                    .execution_options(synchronize_session=False)
+                )
+            except Exception as e:
+                logger.exception(f"Ошибка при освобождении клиентов для синхронизации: {e}")
 
 
 async def get_users_scenarios(tg_id):
@@ -74,10 +171,7 @@ async def get_telegram_id(client_id):
                 if not client:
                     return None
 
-                items = {"tg_id": client.tg_id}
-                logger.exception(f"Пользователь с id найден: {client.tg_id}")
-
-                return items
+                return {"tg_id": client.tg_id}
 
             except Exception as e:
                 logger.exception(
@@ -86,39 +180,88 @@ async def get_telegram_id(client_id):
                 return None
 
 
-async def get_new_appointments():
+def _claim_appointments_stmt(candidates, now):
+    return (
+        update(Appointment)
+        .where(Appointment.id.in_(candidates))
+        .values(claimed_at=now)
+        .returning(*APPOINTMENT_FIELDS)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def claim_new_appointments(batch_size=CLAIM_BATCH_SIZE):
     """
-    Проверка на наличие сценариев, которые необходимо отправить в бд
+    Захват пачки необработанных записей для планирования сценариев.
+
+    Записи блокируются через FOR UPDATE SKIP LOCKED и помечаются claimed_at,
+    поэтому параллельные воркеры не планируют одну запись дважды. Если воркер
+    упал, не успев обработать запись, она снова становится доступной
+    через CLAIM_LEASE.
+
+    :param batch_size - максимальный размер пачки
+    :return - список записей (id, client_id, doctor_id, procedure_id, ...)
     """
     async with SessionLocal() as session:
         async with session.begin():
             try:
-                stmt = select(Appointment).where(Appointment.processed == False)
-                result = await session.execute(stmt)
-                appointment = result.scalars().all()
+                now = datetime.now()
+                candidates = (
+                    select(Appointment.id)
+                    .where(
+                        Appointment.processed == False,
+                        Appointment.client_id.in_(ACTIVE_CLIENT_IDS),
+                        or_(
+                            Appointment.claimed_at.is_(None),
+                            Appointment.claimed_at < now - CLAIM_LEASE,
+                        ),
+                    )
+                    .order_by(Appointment.id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                result = await session.execute(_claim_appointments_stmt(candidates, now))
+                appointments = [dict(row) for row in result.mappings().all()]
 
-                if not appointment:
-                    logger.info("Сценарии для отправки не найдены")
-                    return []
-
-                logger.info(f"Найдены сценарии для отправки")
-                result = [
-                    {
-                        "id": appointments.id,
-                        "client_id": appointments.client_id,
-                        "doctor_id": appointments.doctor_id,
-                        "procedure_id": appointments.procedure_id,
-                        "start_time": appointments.start_time,
-                        "end_time": appointments.end_time,
-                        "room_name": appointments.room_name,
-                    }
-                    for appointments in appointment
-                ]
-
-                return result
+                logger.debug("Захвачено записей для планирования: %d", len(appointments))
+                return appointments
 
             except Exception as e:
                 logger.exception(f"Ошибка при получении новых записей: {e}")
+                return []
+
+
+async def get_appointment(appointment_id):
+    """
+    Захват одной записи для планирования по её id
+
+    :return - запись в формате claim_new_appointments или None, если запись
+              уже обработана или взята другим воркером
+    """
+    async with SessionLocal() as session:
+        async with session.begin():
+            try:
+                now = datetime.now()
+                candidates = (
+                    select(Appointment.id)
+                    .where(
+                        Appointment.id == appointment_id,
+                        Appointment.processed == False,
+                        Appointment.client_id.in_(ACTIVE_CLIENT_IDS),
+                        or_(
+                            Appointment.claimed_at.is_(None),
+                            Appointment.claimed_at < now - CLAIM_LEASE,
+                        ),
+                    )
+                    .with_for_update(skip_locked=True)
+                )
+                result = await session.execute(_claim_appointments_stmt(candidates, now))
+                appointment = result.mappings().first()
+
+                return dict(appointment) if appointment else None
+
+            except Exception as e:
+                logger.exception(f"Ошибка при получении записи {appointment_id}: {e}")
                 return None
 
 
@@ -138,8 +281,8 @@ async def mark_appointment_as_processed(appointment_id):
                     return False
 
                 appointment.processed = True
-                await session.commit()
-                logger.info(f"Appointment {appointment_id} marked as processed")
+                appointment.claimed_at = None
+                logger.debug("Appointment %s marked as processed", appointment_id)
                 return True
 
             except Exception as e:
@@ -2,17 +2,29 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 
-from aiogram import Bot
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.base import StorageKey
+from arq import Retry
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 
-from configuration.config_bot import dp
 from configuration.config_db import SessionLocal
-from database.models import Appointment, Scenario, Client, UserScenario
-from handlers.functions.auth_crm_fun import replace_content
-from handlers.patient import switch_survey
+from configuration.config_redis import get_fsm_storage
+from configuration.metrics import delivery_lag_seconds
+from database.delivery_db import (
+    is_client_inactive,
+    save_failed_delivery,
+    set_client_active,
+)
+from database.models import Appointment, Client, UserScenario
+from database.scenario_cache import scenario_cache
+from handlers.functions.scenario_templates import placeholder_values, render_message
+from scheduler.delivery import (
+    MAX_DELIVERY_TRIES,
+    delivery_lag,
+    is_unreachable,
+    retry_delay,
+)
+
+logger = logging.getLogger(__name__)
 
 send_lock = asyncio.Lock()
 
@@ -66,13 +78,12 @@ async def send_scenario_message(
     """
     Отправка очереди сообщений из redis.
     """
-    async with send_lock:
-        bot: Bot = ctx["bot"]
+    if await is_client_inactive(telegram_id):
+        logger.debug("Skip message %s: patient %s is inactive", message_id, telegram_id)
+        return
 
-        state_with = FSMContext(
-            storage=dp.storage,
-            key=StorageKey(chat_id=telegram_id, user_id=telegram_id, bot_id=bot.id),
-        )
+    async with send_lock:
+        bot = ctx["bot"]
 
         try:
             parts = split_message_to_two_parts(
@@ -89,21 +100,74 @@ async def send_scenario_message(
             elif message_type == "audio":
                 await bot.send_video(chat_id=telegram_id, video=url, caption=parts[0], parse_mode='HTML')
             elif message_type == "survey":
-                await switch_survey(state_with, telegram_id, id_survey)
+                # Опросы тянут клавиатуры и состояния бота, воркер загружает их при первом опросе
+                from aiogram.fsm.context import FSMContext
+                from aiogram.fsm.storage.base import StorageKey
+
+                from handlers.functions.survey_start import switch_survey
+
+                state_with = FSMContext(
+                    storage=get_fsm_storage(),
+                    key=StorageKey(chat_id=telegram_id, user_id=telegram_id, bot_id=bot.id),
+                )
+                await switch_survey(bot, state_with, telegram_id, id_survey)
             else:
-                logging.error(f"Unknown message type: {message_type}")
+                logger.error(f"Unknown message type: {message_type}")
 
             if len(parts) > 1 and message_type == "text":
                 await bot.send_message(chat_id=telegram_id, text=parts[1])
 
+            if ctx.get("score"):
+                delivery_lag_seconds.observe(value=delivery_lag.record(ctx["score"]))
+
         except Exception as e:
-            logging.error(
+            if is_unreachable(e):
+                logger.info(f"Patient {telegram_id} is unreachable: {e}")
+                await set_client_active(telegram_id, False)
+                return
+
+            job_try = ctx.get("job_try", 1)
+            delay = retry_delay(e, job_try)
+            if delay is not None and job_try < MAX_DELIVERY_TRIES:
+                logger.warning(
+                    f"Retry {job_try} for message {message_id} to {telegram_id} "
+                    f"in {delay:.0f} s: {e}"
+                )
+                raise Retry(defer=delay)
+
+            logger.error(
                 f"Error while sending message {message_id} to {telegram_id}: {e}"
             )
+            await save_failed_delivery(
+                telegram_id, message_id, content, url, message_type, id_survey,
+                f"{type(e).__name__}: {e}", job_try,
+            )
+
+
+def _scenario_job_id(appointment_id, procedure_id, message_id, part_number):
+    """
+    id задачи отправки части сообщения. Без записи возвращает None,
+    и arq генерирует случайный id.
+
+    Запись пациента одна на все этапы, а номера сообщений у каждого сценария
+    начинаются заново, поэтому в id входит процедура: иначе сообщения нового
+    этапа совпали бы с задачами (или сохраненными результатами) прошлого.
+    """
+    if appointment_id is None:
+        return None
+    return f"scenario:{appointment_id}:{procedure_id}:{message_id}:{part_number}"
+
+
+async def _enqueue_scenario_part(ctx, job_id, **kwargs):
+    job = await ctx["redis"].enqueue_job("send_scenario_message", _job_id=job_id, **kwargs)
+    if job is None:
+        logger.warning(f"Задача {job_id} уже в очереди или выполнена, сообщение не поставлено повторно")
+    return job
 
 
 async def schedule_scenario_message(
-        ctx, telegram_id, message_id, send_time, content, url, message_type, id_survey
+        ctx, telegram_id, message_id, send_time, content, url, message_type, id_survey,
+        appointment_id=None, procedure_id=None,
 ):
     """
     Загрузка очереди сообщений в redis из сценария
@@ -115,6 +179,9 @@ async def schedule_scenario_message(
     :param url - ссылка/id контента
     :param message_type - тип сообщения
     :param id_survey - id опроса (если есть)
+    :param appointment_id - id записи; задает id задач, чтобы повторное
+                            планирование той же записи не дублировало сообщения
+    :param procedure_id - id процедуры записи, входит в id задач
     """
     try:
         parts = split_message_to_two_parts(
@@ -123,8 +190,9 @@ async def schedule_scenario_message(
         first_part = parts.pop(0)
 
         # Добавляем задачу для отправки первой части сообщения
-        await ctx["redis"].enqueue_job(
-            "send_scenario_message",
+        await _enqueue_scenario_part(
+            ctx,
+            _scenario_job_id(appointment_id, procedure_id, message_id, 0),
             telegram_id=telegram_id,
             message_id=message_id,
             content=first_part,
@@ -137,9 +205,10 @@ async def schedule_scenario_message(
         # Добавляем задачи для оставшихся частей
         if parts:
             send_time = send_time + timedelta(seconds=5)
-            for part in parts:
-                await ctx["redis"].enqueue_job(
-                    "send_scenario_message",
+            for part_number, part in enumerate(parts, start=1):
+                await _enqueue_scenario_part(
+                    ctx,
+                    _scenario_job_id(appointment_id, procedure_id, message_id, part_number),
                     telegram_id=telegram_id,
                     message_id=message_id,
                     content=part,
@@ -150,7 +219,7 @@ async def schedule_scenario_message(
                 )
                 send_time += timedelta(seconds=5)
     except Exception as e:
-        logging.error(f"Error send message {message_id}: {e}")
+        logger.error(f"Error send message {message_id}: {e}")
         return
 
 
@@ -164,12 +233,13 @@ async def check_after_4331_procedure(ctx, tg_id, client_id, appointment_time):
     """
     # Вычисляем время проверки через 8 дней
     check_time = appointment_time + timedelta(days=8)
-    logging.info(f"schedule_check_for_procedure_4331 at {check_time}")
+    logger.info(f"schedule_check_for_procedure_4331 at {check_time}")
     # Добавляем задачу в планировщик
     await ctx["redis"].enqueue_job(
         "check_and_send_4331_scenario",
         tg_id=tg_id,
         client_id=client_id,
+        _job_id=f"check_4331:{client_id}:{check_time:%Y%m%d%H%M}",
         _defer_until=check_time,
     )
 
@@ -190,14 +260,12 @@ async def check_and_send_4331_scenario(ctx, tg_id, client_id):
                 appointment = result.scalar_one_or_none()
 
                 if not appointment:
-                    logging.warning(f"No appointment found for client_id {client_id}")
+                    logger.warning(f"No appointment found for client_id {client_id}")
                     return
 
                 procedure_to_check = {4332, 4333, 4334}
                 if appointment.procedure_id in procedure_to_check:
-                    scenario_stmt = select(Scenario).where(Scenario.stage == 6)
-                    scenario_result = await session.execute(scenario_stmt)
-                    scenarios = scenario_result.scalars().all()
+                    scenarios = await scenario_cache.get_by_stage(6)
 
                     client = appointment.client
                     doctor = appointment.doctor
@@ -206,18 +274,18 @@ async def check_and_send_4331_scenario(ctx, tg_id, client_id):
                     doctor_first_name = doctor.first_name if doctor else ""
                     doctor_last_name = doctor.last_name if doctor else ""
 
+                    values = placeholder_values(
+                        appointment.start_time,
+                        client_first_name,
+                        doctor_first_name,
+                        doctor_last_name,
+                    )
+
                     for scenario in scenarios:
                         updated_messages = [
-                            await replace_content(
-                                appointment.start_time,
-                                message,
-                                client_first_name,
-                                doctor_first_name,
-                                doctor_last_name,
-                            )
+                            render_message(message, values)
                             for message in scenario.scenarios_msg.get("messages", [])
                         ]
-                        scenario.scenarios_msg["messages"] = updated_messages
 
                         for message in updated_messages:
                             send_time = datetime.now() + timedelta(seconds=10)
@@ -233,9 +301,9 @@ async def check_and_send_4331_scenario(ctx, tg_id, client_id):
                                 None,
                             )
                     else:
-                        logging.warning(f"No messages found for scenario 6")
+                        logger.warning(f"No messages found for scenario 6")
             except Exception as e:
-                logging.error(f"Error for check procedure 4331: {e}")
+                logger.error(f"Error for check procedure 4331: {e}")
 
 
 async def check_for_delete(ctx):
@@ -255,7 +323,7 @@ async def check_for_delete(ctx):
                 old_appointments = result.scalars().all()
 
                 if not old_appointments:
-                    logging.info("Записей для удаления не найдено")
+                    logger.info("Записей для удаления не найдено")
                     return
 
                 # Сбор client_id для удаления
@@ -286,8 +354,8 @@ async def check_for_delete(ctx):
                 )
 
                 await session.commit()
-                logging.info("Старые записи, клиенты и сценарии успешно удалены")
+                logger.info("Старые записи, клиенты и сценарии успешно удалены")
 
             except Exception as e:
                 await session.rollback()
-                logging.error(f"Ошибка при удалении старых записей: {e}")
+                logger.error(f"Ошибка при удалении старых записей: {e}")
@@ -0,0 +1,49 @@
+import zlib
+from datetime import datetime, timedelta
+
+# Интервалы синхронизации расписания пациента с CRM
+SYNC_INTERVAL_ACTIVE = timedelta(minutes=15)  # запись в ближайшие сутки или смена этапа
+SYNC_INTERVAL_SOON = timedelta(hours=1)  # запись в окне get_book_data (-2/+4 дня)
+SYNC_INTERVAL_DORMANT = timedelta(hours=6)  # ничего не запланировано
+
+SOON_BEFORE = timedelta(days=4)
+SOON_AFTER = timedelta(days=2)
+
+
+def sync_interval(start_times, changed, now=None):
+    """
+    Интервал до следующей синхронизации пациента.
+
+    :param start_times: Время начала записей пациента из бд.
+    :param changed: Изменилась ли запись или этап при последней синхронизации.
+    :param now: Текущее время.
+    """
+    now = now or datetime.now()
+    if changed:
+        return SYNC_INTERVAL_ACTIVE
+
+    interval = SYNC_INTERVAL_DORMANT
+    for start_time in start_times:
+        if now <= start_time <= now + timedelta(days=1):
+            return SYNC_INTERVAL_ACTIVE
+        if now - SOON_AFTER <= start_time <= now + SOON_BEFORE:
+            interval = SYNC_INTERVAL_SOON
+    return interval
+
+
+def next_sync_time(key, interval, now=None):
+    """
+    Следующее время синхронизации на сетке с фазой, зависящей от пациента.
+
+    Фаза берется из хэша ключа, поэтому синхронизации разных пациентов
+    равномерно распределены по интервалу, а не приходятся на начало часа.
+
+    :param key: Постоянный ключ пациента (tg_id).
+    :param interval: Интервал синхронизации (timedelta).
+    :return: Время в полуинтервале (now, now + interval].
+    """
+    now = now or datetime.now()
+    period = int(interval.total_seconds())
+    phase = zlib.crc32(str(key).encode()) % period
+    elapsed = (int(now.timestamp()) - phase) // period + 1
+    return datetime.fromtimestamp(phase + elapsed * period)
@@ -0,0 +1,135 @@
+import re
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+# Время в сценарии хранится в часах относительно начала процедуры:
+# "+24", "-24 10:00", "0 10:00" и "0" (отправка сразу после планирования)
+TIME_EXPRESSION_PATTERN = re.compile(r"^([+-]?\d+)(?:\s+(\d{1,2}):(\d{2}))?$")
+
+IMMEDIATE_DELAY = timedelta(seconds=5)
+
+
+class TimeOffset(NamedTuple):
+    hours: int
+    clock: time | None
+    immediate: bool
+
+    @property
+    def sort_key(self):
+        """Порядок сообщений в сценарии, в секундах от начала процедуры."""
+        if self.immediate:
+            return 0
+        seconds = self.hours * 3600
+        if self.clock:
+            seconds += self.clock.hour * 3600 + self.clock.minute * 60
+        return seconds
+
+
+@lru_cache(maxsize=1024)
+def compile_time_expression(expression):
+    """
+    Разбор времени отправки из сценария.
+
+    :param expression: Строка вида "+24", "-24 10:00", "0 10:00" или "0".
+    :return: TimeOffset.
+    :raises ValueError: Если строка не соответствует формату.
+    """
+    expression = expression.strip()
+    match = TIME_EXPRESSION_PATTERN.match(expression)
+    if not match:
+        raise ValueError(f"Некорректный формат времени: {expression}")
+
+    hours = int(match.group(1))
+    clock = None
+    if match.group(2) is not None:
+        clock = time(int(match.group(2)), int(match.group(3)))
+
+    return TimeOffset(hours=hours, clock=clock, immediate=expression == "0")
+
+
+def offset_to_dict(expression):
+    """
+    Скомпилированное время для хранения вместе с сообщением сценария.
+    """
+    offset = compile_time_expression(expression)
+    return {
+        "expr": expression,
+        "hours": offset.hours,
+        "clock": offset.clock.strftime("%H:%M") if offset.clock else None,
+        "immediate": offset.immediate,
+    }
+
+
+def message_offset(message):
+    """
+    Время отправки сообщения сценария. Использует сохраненное значение,
+    если оно соответствует текущему полю time, иначе компилирует заново.
+
+    :raises ValueError: Если время сообщения некорректно.
+    """
+    expression = message["time"]
+    stored = message.get("offset")
+    if stored and stored.get("expr") == expression:
+        clock = stored.get("clock")
+        return TimeOffset(
+            hours=stored["hours"],
+            clock=time.fromisoformat(clock) if clock else None,
+            immediate=stored["immediate"],
+        )
+    return compile_time_expression(expression)
+
+
+def parse_start_time(start_time):
+    """
+    Время начала процедуры из записи: datetime из бд или строка ISO 8601.
+
+    :raises ValueError: Если строка не в формате ISO 8601.
+    :raises TypeError: Если значение не datetime и не строка.
+    """
+    if isinstance(start_time, datetime):
+        return start_time
+    if isinstance(start_time, str):
+        return datetime.fromisoformat(start_time)
+    raise TypeError(f"Некорректный тип времени начала процедуры: {type(start_time).__name__}")
+
+
+def send_time(offset, start_time, now=None):
+    """
+    Время отправки сообщения для одной записи.
+
+    :param offset: TimeOffset сообщения.
+    :param start_time: Время начала процедуры.
+    :param now: Текущее время (для сообщений "0").
+    """
+    if offset.immediate:
+        return (now or datetime.now()) + IMMEDIATE_DELAY
+
+    moment = start_time + timedelta(hours=offset.hours)
+    if offset.clock:
+        return datetime.combine(moment.date(), offset.clock)
+    return moment
+
+
+def admin_time_to_expression(text):
+    """
+    Перевод времени, введенного админом в сутках ("+2 10:00"), в формат сценария
+    в часах ("+48 10:00") с проверкой корректности.
+
+    :raises ValueError: Если строка не соответствует формату.
+    """
+    match = TIME_EXPRESSION_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Некорректный формат времени: {text}")
+
+    days = match.group(1)
+    sign = days[0] if days[0] in ("+", "-") else ""
+    hours = f"{sign}{int(days.lstrip('+-')) * 24}"
+
+    if match.group(2) is None:
+        expression = hours
+    else:
+        expression = f"{hours} {match.group(2)}:{match.group(3)}"
+
+    compile_time_expression(expression)
+    return expression
@@ -0,0 +1,131 @@
+"""
+Общие фикстуры тестов.
+
+Тесты с базой данных и Redis запускаются, только если заданы
+TEST_DATABASE_URL (postgresql+asyncpg://...) и TEST_REDIS_URL (redis://...),
+иначе пропускаются. Каждый тест работает в своей схеме Postgres, которая
+удаляется после теста, и в пустой базе Redis.
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Модули обработчиков импортируют configuration.config_bot, который создает Bot с токеном
+# из окружения. Тесты не обращаются к настоящему Telegram, достаточно токена правильного формата
+os.environ.setdefault("TOKEN", "123456:test")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+
+@pytest.fixture
+async def db_engine():
+    """
+    Движок SQLAlchemy с пустой схемой, созданной так же, как при запуске бота.
+    SessionLocal приложения на время теста привязывается к нему.
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+
+    from configuration import config_db
+    from configuration.db_instrumentation import instrument_engine
+    from database import models  # noqa: F401 - регистрация моделей в Base.metadata
+    from database.scenario_cache import scenario_cache
+    from database.schema import ensure_schema
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin_engine = create_async_engine(TEST_DATABASE_URL)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+    instrument_engine(engine)
+    async with engine.begin() as conn:
+        await ensure_schema(conn, config_db.Base.metadata)
+
+    config_db.SessionLocal.configure(bind=engine)
+    # Кэш сценариев живет в процессе и не должен переносить данные между схемами тестов
+    scenario_cache.invalidate()
+    try:
+        yield engine
+    finally:
+        scenario_cache.invalidate()
+        config_db.SessionLocal.configure(bind=config_db.engine)
+        await engine.dispose()
+        async with admin_engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin_engine.dispose()
+
+
+@pytest.fixture
+async def session(db_engine):
+    from configuration.config_db import SessionLocal
+
+    async with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def redis():
+    """
+    Пустая база Redis; пул соединений приложения на время теста указывает на нее.
+    """
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL не задан")
+
+    import redis.asyncio as aioredis
+
+    from configuration import config_redis
+
+    pool = aioredis.BlockingConnectionPool.from_url(TEST_REDIS_URL)
+    config_redis._pool = pool
+    config_redis._fsm_storage = None
+    client = config_redis.get_arq_redis()
+    await client.flushdb()
+    try:
+        yield client
+    finally:
+        await client.flushdb()
+        config_redis._pool = None
+        config_redis._fsm_storage = None
+        await pool.aclose()
+
+
+@pytest.fixture
+async def fake_telegram(unused_tcp_port):
+    """Замена Bot API из benchmarks/fake_telegram.py без ограничения частоты."""
+    from benchmarks.fake_telegram import FakeTelegram, start_fake_telegram
+
+    fake = FakeTelegram(global_rate=10 ** 6, chat_rate=10 ** 6, chat_burst=10 ** 6)
+    runner = await start_fake_telegram(fake, port=unused_tcp_port)
+    try:
+        yield fake
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+async def bot(fake_telegram, unused_tcp_port, monkeypatch):
+    """Bot, подключенный к замене Bot API; им же заменяется общий бот обработчиков."""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from handlers import patient
+    from handlers.functions import admins_fun
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{unused_tcp_port}"))
+    test_bot = Bot(token="123456:test", session=session)
+    for module in (admins_fun, patient):
+        monkeypatch.setattr(module, "bot", test_bot)
+    monkeypatch.setattr(patient, "support_group_id", -100)
+    try:
+        yield test_bot
+    finally:
+        await test_bot.session.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from handlers.functions.admin_send_fun import replace_placeholders
+from handlers.functions.admins_fun import format_patient_info, parse_time
+
+
+@pytest.mark.parametrize(
+    "time_str, expected",
+    [
+        ("0", 0),
+        ("+2", 2 * 3600),
+        ("-24", -24 * 3600),
+        ("0 10:00", 10 * 3600),
+        ("-24 10:00", -24 * 3600 + 10 * 3600),
+        ("+48 18:30", 48 * 3600 + 18 * 3600 + 30 * 60),
+        ("через два дня", 0),
+    ],
+)
+def test_parse_time(time_str, expected):
+    assert parse_time(time_str) == expected
+
+
+def test_parse_time_orders_scenario_messages():
+    times = ["+48", "0", "-24 10:00", "+24", "0 10:00"]
+
+    assert sorted(times, key=parse_time) == ["-24 10:00", "0", "0 10:00", "+24", "+48"]
+
+
+def test_replace_placeholders():
+    content = "Здравствуйте, {first_name} {last_name}!/nДо встречи, {first_name}."
+
+    assert replace_placeholders(content, "Анна", "Иванова") == "Здравствуйте, Анна Иванова!\nДо встречи, Анна."
+    assert replace_placeholders("Без подстановок", "Анна", "Иванова") == "Без подстановок"
+
+
+def test_format_patient_info():
+    info = {
+        "patient_name": "Иванова Анна Сергеевна",
+        "patient_phone": "+79001234567",
+        "stage": 3,
+        "doctor_name": "Орлов Сергей Иванович",
+    }
+
+    assert format_patient_info(info) == (
+        "Имя пациента: Иванова Анна Сергеевна \n"
+        "Номер телефона пациента: +79001234567\n"
+        "Этап лечения пациента: Пункция фолликулов\n"
+        "Имя врача: Орлов Сергей Иванович\n"
+    )
+
+
+@pytest.mark.parametrize("doctor", [{}, {"doctor_name": None}, {"doctor_name": ""}])
+def test_format_patient_info_without_doctor(doctor):
+    info = {"patient_name": "Иванова Анна", "patient_phone": "+79001234567", "stage": 1, **doctor}
+
+    assert "Имя врача" not in format_patient_info(info)
+    assert "Начало лечебной программы" in format_patient_info(info)
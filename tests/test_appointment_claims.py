@@ -0,0 +1,114 @@
+"""
+Несколько воркеров планируют записи одновременно: каждая запись захватывается
+одним воркером, и в очередь arq не попадает ни одной лишней задачи.
+"""
+import asyncio
+import functools
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from configuration.config_redis import get_arq_redis
+from database.models import Appointment, Client, Doctor, Procedure, UserScenario
+from scheduler import appointment_scheduler, scenario_helpers
+
+PATIENTS = 60
+WORKERS = 4
+QUEUE = "arq:queue"
+
+
+def scenario(stage):
+    return {
+        "messages": [
+            {"id": index, "time": time, "type": "text", "url": "", "content": f"Этап {stage}, сообщение {index}"}
+            for index, time in enumerate(["+24", "+48"])
+        ]
+    }
+
+
+async def seed(session, patients, procedure_id=1560):
+    session.add_all([
+        Procedure(id=1560, name="Процедура 1560", id_group=1),
+        Procedure(id=1490, name="Процедура 1490", id_group=1),
+    ])
+    doctor = Doctor(first_name="Иван", last_name="Петров", middle_name="Сергеевич", specialty="Врач")
+    session.add(doctor)
+    await session.flush()
+
+    start_time = datetime.now() + timedelta(days=3)
+    for index in range(patients):
+        client = Client(tg_id=10 ** 9 + index, first_name=f"Пациент {index}", stage=2)
+        session.add(client)
+        await session.flush()
+        session.add(UserScenario(clients_id=client.tg_id, scenarios=scenario(2)))
+        session.add(
+            Appointment(
+                client_id=client.id,
+                doctor_id=doctor.id,
+                procedure_id=procedure_id,
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=1),
+                room_name="Кабинет 1",
+                processed=False,
+            )
+        )
+    await session.commit()
+
+
+def record_planned(monkeypatch):
+    planned = []
+    handle = appointment_scheduler.handle_new_appointment
+
+    async def recording(ctx, appointment):
+        planned.append(appointment["id"])
+        await handle(ctx, appointment)
+
+    monkeypatch.setattr(appointment_scheduler, "handle_new_appointment", recording)
+    # Маленькие пачки, чтобы воркеры чередовались
+    monkeypatch.setattr(
+        appointment_scheduler,
+        "claim_new_appointments",
+        functools.partial(scenario_helpers.claim_new_appointments, batch_size=5),
+    )
+    return planned
+
+
+async def run_workers(count):
+    await asyncio.gather(
+        *(appointment_scheduler.check_new_appointments({"redis": get_arq_redis()}) for _ in range(count))
+    )
+
+
+async def test_parallel_workers_plan_each_appointment_once(session, redis, monkeypatch, caplog):
+    await seed(session, PATIENTS)
+    planned = record_planned(monkeypatch)
+
+    with caplog.at_level(logging.WARNING):
+        await run_workers(WORKERS)
+
+    assert len(planned) == PATIENTS
+    assert max(Counter(planned).values()) == 1
+    assert await redis.zcard(QUEUE) == PATIENTS * 2
+    assert "уже в очереди" not in caplog.text
+    unprocessed = await session.scalar(
+        select(func.count()).select_from(Appointment).where(Appointment.processed.is_(False))
+    )
+    assert unprocessed == 0
+
+
+async def test_next_stage_messages_are_not_dropped(session, redis, monkeypatch):
+    await seed(session, 1)
+    record_planned(monkeypatch)
+    await run_workers(1)
+
+    # CRM сообщила о следующей процедуре: запись та же, номера сообщений нового сценария те же
+    await session.execute(
+        update(Appointment).values(procedure_id=1490, processed=False, claimed_at=None)
+    )
+    await session.execute(update(UserScenario).values(scenarios=scenario(3)))
+    await session.commit()
+    await run_workers(WORKERS)
+
+    assert await redis.zcard(QUEUE) == 4
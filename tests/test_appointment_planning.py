@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from scheduler import appointment_scheduler
+
+MESSAGES = [
+    {"id": 1, "time": "0", "content": "Сразу", "url": None, "type": "text"},
+    {"id": 2, "time": "+24", "content": "Через сутки", "url": None, "type": "text"},
+]
+
+
+@pytest.fixture
+def planned(monkeypatch):
+    """Запланированные сообщения вместо постановки задач в очередь arq."""
+    scheduled = []
+    processed = []
+
+    async def get_telegram_id(client_id):
+        return {"tg_id": 1000 + client_id}
+
+    async def get_users_scenarios(telegram_id):
+        return {"messages": MESSAGES}
+
+    async def delivery_delay(redis, send_time):
+        return timedelta(0)
+
+    async def schedule_scenario_message(ctx, telegram_id, message_id, send_time, *args, **kwargs):
+        scheduled.append((message_id, send_time))
+
+    async def mark_appointment_as_processed(appointment_id):
+        processed.append(appointment_id)
+
+    for name, replacement in {
+        "get_telegram_id": get_telegram_id,
+        "get_users_scenarios": get_users_scenarios,
+        "delivery_delay": delivery_delay,
+        "schedule_scenario_message": schedule_scenario_message,
+        "mark_appointment_as_processed": mark_appointment_as_processed,
+    }.items():
+        monkeypatch.setattr(appointment_scheduler, name, replacement)
+    return scheduled, processed
+
+
+def appointment(start_time):
+    return {"id": 7, "client_id": 1, "procedure_id": 1560, "start_time": start_time}
+
+
+async def test_string_start_time_is_parsed(planned):
+    scheduled, processed = planned
+
+    await appointment_scheduler.handle_new_appointment({"redis": None}, appointment("2024-05-06T09:30:00"))
+
+    assert dict(scheduled)[2] == datetime(2024, 5, 7, 9, 30)
+    assert processed == [7]
+
+
+@pytest.mark.parametrize("start_time", [None, "не дата", 1714987800])
+async def test_invalid_start_time_skips_only_timed_messages(planned, start_time):
+    scheduled, processed = planned
+
+    await appointment_scheduler.handle_new_appointment({"redis": None}, appointment(start_time))
+
+    assert [message_id for message_id, _ in scheduled] == [1]
+    assert processed == [7]
+
+
+@pytest.mark.parametrize(
+    "offset_time, expected",
+    [
+        ("+24", datetime(2024, 5, 7, 9, 30)),
+        ("-24 10:00", datetime(2024, 5, 5, 10, 0)),
+        ("0 18:30", datetime(2024, 5, 6, 18, 30)),
+        ("+48 09:00", datetime(2024, 5, 8, 9, 0)),
+    ],
+)
+async def test_calculate_send_time(offset_time, expected):
+    start_time = datetime(2024, 5, 6, 9, 30)
+
+    assert await appointment_scheduler.calculate_send_time(start_time, offset_time) == expected
+    assert await appointment_scheduler.calculate_send_time(start_time.isoformat(), offset_time) == expected
+
+
+async def test_calculate_send_time_immediate_message_is_sent_now():
+    send_time = await appointment_scheduler.calculate_send_time(datetime(2024, 5, 6, 9, 30), "0")
+
+    assert timedelta(0) < send_time - datetime.now() <= timedelta(seconds=5)
+
+
+@pytest.mark.parametrize("start_time, offset_time", [(None, "+24"), ("не дата", "+24"), (datetime.now(), "завтра")])
+async def test_calculate_send_time_invalid_input_returns_none(start_time, offset_time):
+    assert await appointment_scheduler.calculate_send_time(start_time, offset_time) is None
@@ -0,0 +1,42 @@
+from aiogram.types import Update, User
+from sqlalchemy import select
+
+from database.delivery_db import INACTIVE_CLIENTS_KEY, is_client_inactive, set_client_active
+from database.models import Client
+from middlewares.middlewares import ActivityMiddleware
+
+TG_ID = 10 ** 9
+
+
+async def add_client(session, is_active):
+    session.add(Client(tg_id=TG_ID, first_name="Анна", is_active=is_active))
+    await session.commit()
+
+
+async def test_inactive_client_is_reactivated_after_redis_lost_the_set(session, redis):
+    # Пациент недоступен по бд, а множество в Redis пропало вместе с перезапуском
+    await add_client(session, is_active=False)
+    assert not await redis.exists(INACTIVE_CLIENTS_KEY)
+
+    async def handler(event, data):
+        return "handled"
+
+    result = await ActivityMiddleware()(
+        handler,
+        Update(update_id=1),
+        {"event_from_user": User(id=TG_ID, is_bot=False, first_name="Анна")},
+    )
+
+    assert result == "handled"
+    assert await session.scalar(select(Client.is_active).where(Client.tg_id == TG_ID)) is True
+    assert not await is_client_inactive(TG_ID)
+
+
+async def test_set_is_rebuilt_from_database(session, redis):
+    await add_client(session, is_active=False)
+
+    assert await is_client_inactive(TG_ID)
+    assert await redis.sismember(INACTIVE_CLIENTS_KEY, TG_ID)
+
+    await set_client_active(TG_ID, True)
+    assert not await is_client_inactive(TG_ID)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from configuration.config_crm import CircuitBreaker, CrmClient, CrmUnavailableError
+
+GET_BOOK = {"command": "get_book", "user": 1}
+
+
+@pytest.fixture
+async def crm():
+    """Сервер CRM, ответ которого задается тестом, и клиент к нему."""
+    responses = []
+
+    async def handle(request):
+        return responses.pop(0) if responses else web.json_response({"result": {"items": []}})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    server = TestServer(app)
+    await server.start_server()
+    client = CrmClient(str(server.make_url("/")), "login", "secret")
+    try:
+        yield client, responses
+    finally:
+        await client.close()
+        await server.close()
+
+
+def half_open(breaker):
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+async def test_unparsable_probe_response_does_not_block_crm(crm):
+    client, responses = crm
+    half_open(client.breaker)
+    responses.append(web.Response(status=403, text="<html>Forbidden</html>", content_type="text/html"))
+
+    with pytest.raises(CrmUnavailableError):
+        await client.request(GET_BOOK)
+    assert client.breaker.state == "open"
+    assert client.stats["get_book"].errors == 1
+
+    half_open(client.breaker)
+    assert await client.request(GET_BOOK) == {"result": {"items": []}}
+    assert client.breaker.state == "closed"
+
+
+async def test_cancelled_probe_releases_breaker(crm):
+    client, responses = crm
+    half_open(client.breaker)
+
+    probe = asyncio.ensure_future(client._send(GET_BOOK))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert client.breaker.allow()
+
+
+def test_breaker_lets_one_probe_through_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    half_open(breaker)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
@@ -0,0 +1,81 @@
+"""
+Синхронизация расписаний с CRM, которая отвечает ошибками части клиентов
+или отключена circuit breaker'ом.
+"""
+import time
+from datetime import datetime
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy import func, select
+
+from benchmarks.fake_crm import FakeCrmData
+from benchmarks.seed import seed
+from configuration import config_crm
+from configuration.config_crm import CircuitBreaker, CrmUnavailableError, crm_client
+from database.models import Appointment, Client
+from scheduler.appointment_scheduler import update_appointments
+from scheduler.pipeline import run_sync_pipeline
+
+PATIENTS = 10
+
+
+@pytest.fixture
+async def crm(session, redis, monkeypatch):
+    """
+    Замена CRM на данных FakeCrmData: на get_book пациентов из failing отвечает 500.
+
+    :return: (данные CRM, множество id пациентов с ошибкой)
+    """
+    data = FakeCrmData(PATIENTS, doctors=2)
+    await seed(data, messages=2)
+    failing = set()
+
+    async def handle(request):
+        payload = await request.json()
+        if payload.get("id") in failing:
+            return web.json_response({"error": "injected"}, status=500)
+        return web.json_response(data.get_book(payload))
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(crm_client, "base_url", str(server.make_url("/")))
+    monkeypatch.setattr(crm_client, "breaker", CircuitBreaker())
+    monkeypatch.setattr(config_crm, "CRM_RETRY_DELAY", 0)
+    try:
+        yield data, failing
+    finally:
+        await crm_client.close()
+        await server.close()
+
+
+async def test_crm_error_for_one_client_does_not_stop_sync(crm, session):
+    data, failing = crm
+    failed_id = data.patients[3]["id"]
+    failing.add(failed_id)
+
+    await update_appointments({})
+
+    synced = await session.scalar(select(func.count(func.distinct(Appointment.client_id))))
+    assert synced == PATIENTS - 1
+    # Клиент с ошибкой остается захваченным до конца CLAIM_LEASE
+    next_sync_at = await session.scalar(select(Client.next_sync_at).where(Client.id_crm == failed_id))
+    assert next_sync_at > datetime.now()
+
+
+async def test_open_breaker_releases_claims_and_skips_planning(crm, session):
+    crm_client.breaker.failures = crm_client.breaker.failure_threshold
+    crm_client.breaker.opened_at = time.monotonic()
+
+    with pytest.raises(CrmUnavailableError):
+        await update_appointments({})
+    timings = await run_sync_pipeline({})
+
+    assert "sync" in timings and "plan" not in timings
+    assert not await session.scalar(select(func.count(Appointment.id)))
+    next_sync_at = (await session.scalars(select(Client.next_sync_at))).all()
+    assert len(next_sync_at) == PATIENTS
+    assert all(value <= datetime.now() for value in next_sync_at)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from scheduler.appointment_scheduler import plan_send_times
+from scheduler.delivery import (
+    DELIVERY_WINDOW,
+    MINUTE_COUNTER_KEY,
+    TELEGRAM_SEND_RATE,
+    delivery_delay,
+)
+
+SEND_TIME = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+
+async def test_only_sends_in_the_same_minute_are_spread(redis):
+    assert await delivery_delay(redis, SEND_TIME) == timedelta(0)
+    assert await delivery_delay(redis, SEND_TIME + timedelta(seconds=30)) == timedelta(seconds=1 / TELEGRAM_SEND_RATE)
+    assert await delivery_delay(redis, SEND_TIME + timedelta(minutes=1)) == timedelta(0)
+
+
+async def test_minute_counter_expires_after_the_window(redis):
+    # До вызова: TTL считается позже и не может превысить это значение
+    until_send = (SEND_TIME - datetime.now()).total_seconds()
+    await delivery_delay(redis, SEND_TIME)
+
+    ttl = await redis.ttl(MINUTE_COUNTER_KEY.format(minute=SEND_TIME.strftime("%Y%m%d%H%M")))
+    assert until_send + DELIVERY_WINDOW < ttl <= until_send + 60 + DELIVERY_WINDOW
+
+
+async def test_spread_keeps_patient_messages_in_order(redis):
+    start_time = SEND_TIME - timedelta(hours=24)
+    # 10:00 уже занято другими пациентами, сообщению достанется сдвиг на минуты
+    key = MINUTE_COUNTER_KEY.format(minute=SEND_TIME.strftime("%Y%m%d%H%M"))
+    await redis.set(key, int(TELEGRAM_SEND_RATE * 600))
+    messages = [
+        {"id": 1, "time": "+24 10:05"},
+        {"id": 0, "time": "+24 10:00"},
+        {"id": 2, "time": "0"},
+    ]
+
+    planned = await plan_send_times(redis, messages, start_time)
+
+    assert [message["id"] for message, _ in planned] == [2, 0, 1]
+    send_times = [send_time for _, send_time in planned]
+    assert send_times == sorted(send_times)
+    assert send_times[1] > SEND_TIME + timedelta(minutes=5)
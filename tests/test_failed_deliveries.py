@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+from sqlalchemy import select
+
+from database.models import FailedDelivery
+from handlers import admin_general
+
+DELIVERIES = 5
+
+
+class FlakyQueue:
+    """Очередь arq, которая падает на fail_on-й постановке задачи."""
+
+    def __init__(self, redis, fail_on):
+        self.redis = redis
+        self.fail_on = fail_on
+        self.calls = 0
+
+    async def enqueue_job(self, function, *args, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError("Redis недоступен")
+        return await self.redis.enqueue_job(function, *args, **kwargs)
+
+
+async def add_failed_deliveries(session):
+    for index in range(DELIVERIES):
+        session.add(
+            FailedDelivery(
+                telegram_id=1000 + index,
+                message_id=index,
+                content=f"Сообщение {index}",
+                message_type="text",
+                error="Forbidden: bot was blocked by the user",
+                created_at=datetime.now(),
+            )
+        )
+    await session.commit()
+
+
+async def replay(bot, queue):
+    message = Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=42, type="private"),
+        from_user=User(id=42, is_bot=False, first_name="Админ"),
+        text="/replay_failed",
+    ).as_(bot)
+    await admin_general.replay_failed_deliveries(message, queue)
+
+
+async def queued_jobs(redis):
+    return sorted(key.decode() for key in await redis.keys("arq:job:replay:*"))
+
+
+async def test_replay_failure_keeps_the_rest_in_failed(bot, session, redis):
+    await add_failed_deliveries(session)
+
+    await replay(bot, FlakyQueue(redis, fail_on=3))
+
+    pending = (
+        await session.scalars(select(FailedDelivery.id).where(FailedDelivery.replayed_at.is_(None)))
+    ).all()
+    assert len(pending) == DELIVERIES - 2
+    assert len(await queued_jobs(redis)) == 2
+
+    await replay(bot, redis)
+
+    assert len(await queued_jobs(redis)) == DELIVERIES
+    assert not await session.scalar(
+        select(FailedDelivery.id).where(FailedDelivery.replayed_at.is_(None)).limit(1)
+    )
+
+
+async def test_repeated_replay_does_not_duplicate_jobs(bot, session, redis):
+    await add_failed_deliveries(session)
+    await replay(bot, redis)
+    # Сбой после постановки в очередь, но до отметки в бд
+    await session.execute(FailedDelivery.__table__.update().values(replayed_at=None))
+    await session.commit()
+
+    await replay(bot, redis)
+
+    assert await redis.zcard("arq:queue") == DELIVERIES
@@ -0,0 +1,19 @@
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def test_request_rejected_by_global_limit_keeps_chat_tokens():
+    fake = FakeTelegram(global_rate=1, chat_rate=1, chat_burst=3)
+
+    assert fake.limit(1) == 0
+    # Общий лимит исчерпан: чату 2 отказано, его токены не потрачены
+    assert fake.limit(2) > 0
+    assert fake.limit(2) > 0
+    assert fake.chat_buckets[2].tokens >= 2.99
+
+
+def test_chat_limit_does_not_spend_global_tokens():
+    fake = FakeTelegram(global_rate=30, chat_rate=1, chat_burst=1)
+
+    assert fake.limit(1) == 0
+    assert fake.limit(1) > 0
+    assert fake.global_bucket.tokens >= 28.99
@@ -0,0 +1,22 @@
+import aiohttp
+
+from configuration.metrics import start_metrics_server
+
+
+async def test_metrics_server_binds_to_given_host(unused_tcp_port):
+    runner = await start_metrics_server(host="127.0.0.1", port=unused_tcp_port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{unused_tcp_port}/metrics") as response:
+                assert response.status == 200
+    finally:
+        await runner.cleanup()
+
+
+async def test_busy_port_does_not_abort_startup(unused_tcp_port, caplog):
+    runner = await start_metrics_server(host="127.0.0.1", port=unused_tcp_port)
+    try:
+        assert await start_metrics_server(host="127.0.0.1", port=unused_tcp_port) is None
+        assert "Сервер метрик не запущен" in caplog.text
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,54 @@
+from arq.jobs import Job
+
+from scheduler import pipeline
+from scheduler.pipeline import PipelineStage, run_sync_pipeline, schedule_sync_pipeline
+
+
+def recording_stages(monkeypatch):
+    calls = []
+
+    def stage(name):
+        async def func(ctx):
+            calls.append(name)
+
+        return func
+
+    monkeypatch.setattr(
+        pipeline,
+        "PIPELINE_STAGES",
+        (
+            PipelineStage("sync", stage("sync")),
+            PipelineStage("retention", stage("retention"), minutes=pipeline.RETENTION_MINUTES),
+        ),
+    )
+    return calls
+
+
+async def test_retention_runs_only_in_half_hour_windows(monkeypatch):
+    calls = recording_stages(monkeypatch)
+
+    for minute in range(0, 60, pipeline.PIPELINE_PERIOD):
+        await run_sync_pipeline({}, minute)
+
+    assert calls.count("sync") == 60 // pipeline.PIPELINE_PERIOD
+    assert calls.count("retention") == 2
+
+
+async def test_manual_run_executes_all_stages(monkeypatch):
+    calls = recording_stages(monkeypatch)
+
+    await run_sync_pipeline({})
+
+    assert calls == ["sync", "retention"]
+
+
+async def test_schedule_passes_window_minute(redis, monkeypatch):
+    monkeypatch.setattr(pipeline, "PIPELINE_JITTER", 0)
+
+    await schedule_sync_pipeline({"redis": redis})
+
+    job_ids = [key.decode().removeprefix("arq:job:") for key in await redis.keys("arq:job:sync_pipeline:*")]
+    assert len(job_ids) == 1
+    info = await Job(job_ids[0], redis).info()
+    assert info.function == "run_sync_pipeline"
+    assert info.args == (int(job_ids[0][-2:]),)
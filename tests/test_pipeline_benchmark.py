@@ -0,0 +1,31 @@
+"""
+Сквозной бенчмарк планировщика с порогами: синхронизация, планирование и доставка
+на пустой схеме Postgres и базе Redis. Пороги и размер прогона хранятся в
+benchmarks/pipeline_thresholds.json, отчет выводится при pytest -s.
+"""
+import json
+import os
+
+import pytest
+
+from benchmarks.bench_pipeline import print_report, run_pipeline
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "pipeline_thresholds.json")
+
+
+@pytest.mark.benchmark
+async def test_pipeline_throughput_and_delivery_lag(db_engine, redis):
+    with open(THRESHOLDS_FILE, encoding="utf-8") as file:
+        thresholds = json.load(file)
+
+    result = await run_pipeline(redis, **thresholds["run"])
+    print_report(result)
+
+    assert result.finished
+    assert result.unprocessed == 0
+    # Процедура 4331 вместо сообщений сценария ставит одну проверку через 8 дней
+    assert result.send_jobs > result.deferred_jobs
+    assert result.delivered == result.send_jobs - result.deferred_jobs
+    assert result.planning_jobs_per_second >= thresholds["min_planning_jobs_per_second"]
+    assert result.delivery_jobs_per_second >= thresholds["min_delivery_jobs_per_second"]
+    assert result.lag_p95 <= thresholds["max_lag_p95_seconds"]
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from aiogram.filters import CommandObject
+from aiogram.types import Chat, Message, User
+
+from configuration import profiler as profiler_module
+from configuration.profiler import SamplingProfiler
+from handlers import admin_general
+
+
+def busy(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+async def test_stopped_profiler_returns_final_samples():
+    profiler = SamplingProfiler()
+    profiler.start(100)
+
+    async def job():
+        with profiler.track("job"):
+            busy(0.1)
+
+    await asyncio.create_task(job())
+    thread = profiler._thread
+    samples = profiler.stop()
+    snapshot = {label: dict(stacks) for label, stacks in samples.items()}
+
+    assert not thread.is_alive()
+    await asyncio.sleep(profiler_module.PROFILE_INTERVAL_MS / 1000 * 5)
+    assert {label: dict(stacks) for label, stacks in samples.items()} == snapshot
+    assert sum(snapshot["job"].values()) > 0
+
+
+@pytest.mark.parametrize(
+    "args", ["0 10", "-5 10", "0.5 10", "601 10", "inf 10", "nan 10", "30 -1", "30 150", "30 nan", "30 inf"]
+)
+async def test_profile_command_rejects_invalid_arguments(bot, fake_telegram, args):
+    message = Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=42, type="private"),
+        from_user=User(id=42, is_bot=False, first_name="Админ"),
+        text=f"/profile {args}",
+    ).as_(bot)
+
+    # arqredis=None: задача воркеру не ставится, иначе тест упадет на enqueue_job
+    await admin_general.start_profiling(message, CommandObject(command="profile", args=args), None)
+
+    assert not profiler_module.profiler.active
+    assert fake_telegram.counters["sendMessage:200"] == 1
@@ -0,0 +1,169 @@
+"""
+Число SQL-запросов в обработчиках и задачах планировщика.
+
+Обработчики вызываются так же, как их вызывает диспетчер, на данных из PATIENTS
+пациентов; ответы бота уходят в замену Bot API из benchmarks/fake_telegram.py.
+Бюджет не зависит от числа строк, поэтому запрос внутри цикла по пациентам
+или записям его превышает.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User
+from sqlalchemy import select
+
+from benchmarks.fake_crm import FakeCrmData
+from benchmarks.seed import TG_ID_BASE, phone_to_int, seed
+from configuration.db_instrumentation import count_queries
+from database.auth_db import set_scenario
+from database.models import Appointment, Client, Doctor
+from handlers import admin_changes, admin_general, patient
+from scheduler.appointment_scheduler import plan_appointment
+
+PATIENTS = 50
+ADMIN_ID = 42
+START = datetime.now() + timedelta(days=1)
+
+
+@pytest.fixture
+async def data(session, monkeypatch):
+    """Врачи, пациенты, записи и персональные сценарии; кэши обработчиков сброшены."""
+    crm_data = FakeCrmData(PATIENTS, doctors=5)
+    await seed(crm_data, messages=10)
+
+    doctors = (await session.execute(select(Doctor))).scalars().all()
+    for doctor in doctors:
+        # Врачи авторизованы в боте и получают тревожные ответы опросов
+        doctor.tg_id = 2 * 10 ** 9 + doctor.id
+    clients = (await session.execute(select(Client))).scalars().all()
+    for index, client in enumerate(clients):
+        session.add(
+            Appointment(
+                client_id=client.id,
+                doctor_id=doctors[index % len(doctors)].id,
+                procedure_id=1490,
+                start_time=START,
+                end_time=START + timedelta(minutes=30),
+                room_name="Кабинет 1",
+                processed=True,
+            )
+        )
+    await session.commit()
+    for index in range(PATIENTS):
+        await set_scenario(3, TG_ID_BASE + index, "Анна", doctors[index % len(doctors)].id, START)
+
+    monkeypatch.setattr(admin_general, "all_doctors", None)
+    monkeypatch.setattr(admin_general, "all_patients", None)
+    monkeypatch.setattr(admin_changes, "scenarios", None)
+    return crm_data
+
+
+def user(user_id):
+    return User(id=user_id, is_bot=False, first_name="Анна")
+
+
+def message(bot, text, user_id=ADMIN_ID):
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=user(user_id),
+        text=text,
+    ).as_(bot)
+
+
+def state(bot, user_id=ADMIN_ID):
+    return FSMContext(
+        storage=MemoryStorage(),
+        key=StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id),
+    )
+
+
+def assert_within_budget(log, budget):
+    statements = "\n".join(" ".join(statement.split())[:200] for statement in log.statements)
+    assert log.count <= budget, f"{log.count} запросов при бюджете {budget}:\n{statements}"
+
+
+async def test_admin_find_patient_by_last_name(bot, data):
+    last_name = data.patients[1]["name"].split()[0]
+
+    with count_queries() as log:
+        await admin_general.information_by_last_name(message(bot, last_name), state(bot))
+
+    assert_within_budget(log, 1)
+
+
+async def test_admin_find_patient_by_phone(bot, data):
+    phone = str(phone_to_int(data.patients[1]["phone"]))
+
+    with count_queries() as log:
+        await admin_general.information_by_phone(message(bot, phone), state(bot))
+
+    assert_within_budget(log, 1)
+
+
+async def test_admin_doctors_and_their_patients(bot, data, session):
+    with count_queries() as log:
+        await admin_general.find_by_doctor(message(bot, "Найти по врачу"), state(bot))
+    assert_within_budget(log, 1)
+
+    doctor_id = await session.scalar(select(Doctor.id).limit(1))
+    query = CallbackQuery(
+        id="1",
+        from_user=user(ADMIN_ID),
+        chat_instance="1",
+        message=message(bot, "Пациент какого врача вас интересует?"),
+        data=str(doctor_id),
+    ).as_(bot)
+    with count_queries() as log:
+        await admin_general.information_by_doctor(query, state(bot))
+    assert_within_budget(log, 1)
+
+
+async def test_admin_patient_scenarios(bot, data):
+    phone = str(phone_to_int(data.patients[1]["phone"]))
+
+    with count_queries() as log:
+        await admin_changes.find_patient_now_scenarios(message(bot, phone), state(bot))
+
+    assert_within_budget(log, 2)
+
+
+async def test_survey_reports_to_call_center(bot, data):
+    tg_id = TG_ID_BASE + 1
+
+    with count_queries() as log:
+        await patient.survey_all_good_no_yes(message(bot, "Да", tg_id), state(bot, tg_id))
+
+    assert_within_budget(log, 1)
+
+
+async def test_survey_bad_answers_are_sent_to_doctors(bot, data, monkeypatch):
+    monkeypatch.setattr(patient, "patient_tg_id", TG_ID_BASE + 1)
+    answers = {"title": "Самочувствие", "answers": [{"question": "Боль?", "answer": "Да"}]}
+
+    with count_queries() as log:
+        await patient.send_bad_answers_to_doctor(answers)
+
+    assert_within_budget(log, 6)
+
+
+async def test_scheduler_plans_appointment(data, redis, session):
+    appointment_id = await session.scalar(select(Appointment.id).limit(1))
+    await session.execute(Appointment.__table__.update().values(processed=False))
+    await session.commit()
+
+    with count_queries() as log:
+        await plan_appointment({"redis": redis}, appointment_id)
+
+    assert_within_budget(log, 5)
+
+
+async def test_sync_set_scenario(data):
+    with count_queries() as log:
+        await set_scenario(3, TG_ID_BASE + 1, "Анна", 1, START)
+
+    assert_within_budget(log, 4)
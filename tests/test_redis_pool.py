@@ -0,0 +1,31 @@
+from configuration import config_redis
+from configuration.config_redis import RESERVED_CONNECTIONS, ensure_pool_size, get_redis_client
+from configuration.metrics import registry
+from scheduler.main import MAX_JOBS
+
+
+async def test_worker_pool_serves_every_job_with_listener_connected(redis):
+    pool = config_redis.get_redis_pool()
+    assert ensure_pool_size(MAX_JOBS) == MAX_JOBS + RESERVED_CONNECTIONS
+
+    async with get_redis_client().pubsub() as pubsub:
+        # Подписка занимает соединение на все время работы, как listen_for_invalidation
+        await pubsub.subscribe("scenarios:test")
+        # Все задачи воркера одновременно держат по соединению (без подключения к серверу)
+        connections = [pool.get_available_connection() for _ in range(MAX_JOBS)]
+        try:
+            # Остается соединение для опроса очереди arq
+            assert pool.can_get_connection()
+        finally:
+            for connection in connections:
+                await pool.release(connection)
+
+
+async def test_pool_connections_are_exported(redis):
+    await redis.ping()
+
+    metrics = await registry.render()
+
+    assert 'redis_pool_connections{state="in_use"} 0' in metrics
+    assert 'redis_pool_connections{state="available"} 1' in metrics
+    assert 'redis_pool_connections{state="max"}' in metrics
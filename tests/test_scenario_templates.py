@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from handlers.functions.scenario_templates import placeholder_values, render_message
+
+VALUES = placeholder_values(datetime(2024, 5, 6, 9, 30), "Анна", "Иван", "Петров")
+
+
+def test_render_message_substitutes_placeholders():
+    message = {"id": 1, "content": "{first_name}, прием {start_time}", "time": "{start_time}"}
+
+    rendered = render_message(message, VALUES)
+
+    assert rendered["content"] == "Анна, прием 06.05 в 09:30"
+    assert rendered["time"] == "06.05 в 09:30"
+    assert message["content"] == "{first_name}, прием {start_time}"
+
+
+def test_render_message_keeps_placeholder_without_value():
+    values = placeholder_values(None, "Анна", None, None)
+
+    rendered = render_message({"content": "{first_name} и {first_name_doctor}"}, values)
+
+    assert rendered["content"] == "Анна и {first_name_doctor}"
+
+
+def test_render_message_with_empty_content():
+    message = {"id": 1, "type": "video", "content": None, "time": None}
+
+    rendered = render_message(message, VALUES)
+
+    assert rendered["content"] == ""
+    assert rendered["time"] == ""
+
@@ -0,0 +1,50 @@
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from configuration.config_redis import get_fsm_storage
+from scheduler.sched_tasks import send_scenario_message, split_message_to_two_parts
+from states.states_patient import PatientStates
+
+
+def test_short_message_is_not_split():
+    assert split_message_to_two_parts("Короткое сообщение.", 4096) == ["Короткое сообщение."]
+    assert split_message_to_two_parts("а" * 10, 10) == ["а" * 10]
+
+
+def test_split_after_last_sentence_before_middle():
+    message = "Первое предложение. Второе предложение. Третье предложение и еще немного текста"
+
+    first, second = split_message_to_two_parts(message, 40)
+
+    assert first == "Первое предложение. Второе предложение."
+    assert second == "Третье предложение и еще немного текста"
+
+
+def test_split_on_space_without_sentences():
+    message = "слово " * 20
+
+    first, second = split_message_to_two_parts(message, 50)
+
+    assert first.split() + second.split() == message.split()
+    assert not first.endswith(" ") and not second.startswith(" ")
+
+
+@pytest.mark.parametrize("message", ["а" * 101, "б" * 5000])
+def test_split_in_the_middle_without_separators(message):
+    first, second = split_message_to_two_parts(message, 100)
+
+    assert first + second == message
+    assert len(first) == len(message) // 2 + 1
+
+
+async def test_worker_starts_survey(session, redis, bot, fake_telegram):
+    tg_id = 10 ** 9
+    await send_scenario_message({"bot": bot}, tg_id, 1, "", "", "survey", 7)
+
+    state = FSMContext(
+        storage=get_fsm_storage(),
+        key=StorageKey(chat_id=tg_id, user_id=tg_id, bot_id=bot.id),
+    )
+    assert fake_telegram.counters["sendMessage:200"] == 1
+    assert await state.get_state() == PatientStates.survey_all_good.state
@@ -0,0 +1,47 @@
+from sqlalchemy import text
+
+from configuration.config_db import Base
+from database.auth_db import get_videos_doctors
+from database.models import Video
+from database.schema import ensure_schema
+
+
+async def test_video_added_with_for_scenarios_only_is_found(session):
+    # Так видео добавляются вне бота: структурированные колонки не заполнены
+    await session.execute(
+        text("INSERT INTO video (video_link, for_scenarios) VALUES ('https://v/1', '3.2.555')")
+    )
+    await session.commit()
+
+    assert await get_videos_doctors(session, 555, 3) == {2: "https://v/1"}
+    assert await get_videos_doctors(session, 555, 4) == {}
+
+
+async def test_video_key_change_moves_video(session):
+    video = Video(video_link="https://v/2", for_scenarios="3.2.555")
+    session.add(video)
+    await session.commit()
+
+    await session.execute(
+        text("UPDATE video SET for_scenarios = '4.7.555' WHERE id = :id"), {"id": video.id}
+    )
+    await session.commit()
+
+    assert await get_videos_doctors(session, 555, 3) == {}
+    assert await get_videos_doctors(session, 555, 4) == {7: "https://v/2"}
+
+
+async def test_videos_restored_without_trigger_are_filled_on_start(db_engine, session):
+    # Восстановление дампа идет с отключенными триггерами, версия схемы при этом актуальна
+    await session.execute(text("ALTER TABLE video DISABLE TRIGGER video_split_for_scenarios"))
+    await session.execute(
+        text("INSERT INTO video (video_link, for_scenarios) VALUES ('https://v/3', '5.1.777')")
+    )
+    await session.execute(text("ALTER TABLE video ENABLE TRIGGER video_split_for_scenarios"))
+    await session.commit()
+    assert await get_videos_doctors(session, 777, 5) == {}
+
+    async with db_engine.begin() as conn:
+        assert not await ensure_schema(conn, Base.metadata)
+
+    assert await get_videos_doctors(session, 777, 5) == {1: "https://v/3"}
@@ -0,0 +1,21 @@
+"""
+Импорт воркера arq в отдельном процессе: без модулей бота и в пределах бюджета времени.
+"""
+import pytest
+
+from benchmarks.bench_import import FORBIDDEN_MODULES, IMPORT_BUDGET, probe
+
+REPEAT = 3
+
+
+def test_worker_does_not_import_bot_modules():
+    modules = set(probe("scheduler.main")["modules"])
+
+    assert [name for name in FORBIDDEN_MODULES if name in modules] == []
+
+
+@pytest.mark.benchmark
+def test_worker_import_time_within_budget():
+    seconds = min(probe("scheduler.main")["seconds"] for _ in range(REPEAT))
+
+    assert seconds <= IMPORT_BUDGET